@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import importlib.util
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from django.core.exceptions import ImproperlyConfigured
@@ -31,16 +33,37 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro, para que os tempos medidos incluam os restantes middlewares.
+    "backend.core.middleware.InstrumentacaoMiddleware",
+    # Antes dos restantes, para comprimir as respostas já completas (ver core/compressao.py).
+    "backend.core.middleware.CompressaoMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    # Sessões e mensagens, exceto nos pedidos à API sem sessão (ver API_SESSIONLESS).
+    "backend.core.middleware.SessaoOpcionalMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
+    "backend.core.middleware.MensagensOpcionalMiddleware",
+    "backend.core.middleware.PrimariaAposEscritaMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Pedidos à API que não carregam a sessão nem as mensagens: os que trazem um JWT
+# e os que não têm a cookie de sessão (ver core/middleware.py).
+API_SESSIONLESS = os.environ.get("API_SESSIONLESS", "1") in ("1", "true", "True")
+API_SESSIONLESS_PREFIXES = ("/api/",)
+
+# As sessões (só o admin e a API navegável as usam) ficam na base de dados, que
+# permite terminá-las no servidor; os pedidos à API não as carregam (ver
+# `API_SESSIONLESS`). `signed_cookies` evita a query, mas a sessão fica legível
+# pelo cliente, limitada ao tamanho de uma cookie e válida até expirar, mesmo
+# após o logout: só deve ser ativada explicitamente, com `SESSION_ENGINE`.
+# `cached_db` só deve ser usado com uma cache partilhada entre os processos: com
+# a cache `default` (`locmem`, por processo), uma sessão terminada num worker
+# continuaria válida nos outros.
+SESSION_ENGINE = os.environ.get("SESSION_ENGINE", "django.contrib.sessions.backends.db")
+
 ROOT_URLCONF = "backend.config.urls"
 
 WSGI_APPLICATION = "backend.config.wsgi.application"
@@ -85,25 +108,95 @@ MEDIA_ROOT = BASE_DIR.parent / "media"
 
 USE_POSTGRES = os.environ.get("USE_POSTGRES", "1") in ("1", "true", "True")
 
-if USE_POSTGRES:
-    DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.postgresql",
-            "NAME": os.environ.get("DB_NAME", "cinemix"),
-            "USER": os.environ.get("DB_USER", "cinemix"),
-            "PASSWORD": os.environ.get("DB_PASS", "cinemix"),
-            "HOST": os.environ.get("DB_HOST", "db"),
-            "PORT": os.environ.get("DB_PORT", "5432"),
+# Ligações ao PostgreSQL: com DB_POOL, um pool de ligações do psycopg por processo
+# (`psycopg[pool]`, o indicado sob ASGI); sem ele, ligações persistentes reutilizadas
+# durante DB_CONN_MAX_AGE segundos. Nos dois casos, as ligações são verificadas
+# antes de serem reutilizadas (CONN_HEALTH_CHECKS).
+DB_POOL = os.environ.get("DB_POOL", "1") in ("1", "true", "True")
+
+# Réplicas de leitura (ver core/replicas.py): anfitriões PostgreSQL com a mesma
+# base de dados e credenciais ou, com SQLite, caminhos de ficheiros (ex: uma
+# cópia de db.sqlite3, para experimentar o encaminhamento localmente).
+DB_REPLICAS = [r.strip() for r in os.environ.get("DB_REPLICAS", "").split(",") if r.strip()]
+
+
+def _base_de_dados(destino=None) -> dict:
+    if not USE_POSTGRES:
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": destino or BASE_DIR.parent / "db.sqlite3",
         }
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DB_NAME", "cinemix"),
+        "USER": os.environ.get("DB_USER", "cinemix"),
+        "PASSWORD": os.environ.get("DB_PASS", "cinemix"),
+        "HOST": destino or os.environ.get("DB_HOST", "db"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+        "CONN_HEALTH_CHECKS": True,
     }
-else:
-    DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR.parent / "db.sqlite3",
+    if DB_POOL:
+        config["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            },
         }
+    else:
+        config["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+    return config
+
+
+DATABASES = {"default": _base_de_dados()}
+for _n, _destino in enumerate(DB_REPLICAS, start=1):
+    # Nos testes, as réplicas usam a base de dados de teste da `default`.
+    DATABASES[f"replica_{_n}"] = {**_base_de_dados(_destino), "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["backend.core.replicas.ReplicaRouter"]
+
+# Depois de uma escrita, as leituras do mesmo cliente ficam na primária durante
+# estes segundos (o atraso máximo esperado das réplicas).
+REPLICA_STICKY_COOKIE = "cinemix_primaria"
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+# Tempo máximo na cache de respostas (ver core/caching.py) das lidas de uma réplica.
+REPLICA_RESPONSE_CACHE_TIMEOUT = int(os.environ.get("REPLICA_RESPONSE_CACHE_TIMEOUT", "30"))
+
+if USE_POSTGRES:
+    # Lookups de trigramas usados pela pesquisa (core/search.py).
+    INSTALLED_APPS.append("django.contrib.postgres")
+
+# --- Cache ---
+# A cache `respostas` guarda as respostas de leitura do catálogo (ver core/caching.py).
+# Pode usar ficheiros (`file`, partilhada entre os processos do mesmo host) ou memória
+# local (`locmem`). Com `locmem`, cada processo tem os seus contadores de versão e
+# uma escrita num worker não invalida as respostas em cache dos outros: só serve
+# com um único processo. Os testes usam `locmem`, para não partilharem a cache
+# com o servidor de desenvolvimento nem com execuções anteriores.
+TESTING = sys.argv[1:2] == ["test"]
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "locmem" if TESTING else "file")
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "1") in ("1", "true", "True")
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", "300"))
+RESPONSE_CACHE_ALIAS = "respostas"
+
+if RESPONSE_CACHE_BACKEND == "file":
+    _response_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("RESPONSE_CACHE_LOCATION", str(BASE_DIR.parent / ".cache" / "respostas")),
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+else:
+    _response_cache = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cinemix-respostas",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
     }
 
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    RESPONSE_CACHE_ALIAS: _response_cache,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', 'OPTIONS': {'min_length': 8}},
@@ -113,14 +206,56 @@ AUTH_PASSWORD_VALIDATORS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Instrumentação por pedido (ver core/middleware.py): queries, tempos, cabeçalho
+# `Server-Timing` e perfis cProfile de uma fração dos pedidos.
+INSTRUMENTATION_ENABLED = os.environ.get("INSTRUMENTATION_ENABLED", "1" if DEBUG else "0") in ("1", "true", "True")
+INSTRUMENTATION_SERVER_TIMING = os.environ.get("INSTRUMENTATION_SERVER_TIMING", "1") in ("1", "true", "True")
+INSTRUMENTATION_PROFILE_RATE = float(os.environ.get("INSTRUMENTATION_PROFILE_RATE", "0"))
+INSTRUMENTATION_PROFILE_DIR = os.environ.get("INSTRUMENTATION_PROFILE_DIR", str(BASE_DIR.parent / ".cache" / "perfis"))
+# Número de execuções do mesmo SQL num pedido a partir do qual é registado um aviso (N+1).
+INSTRUMENTATION_REPEATED_THRESHOLD = int(os.environ.get("INSTRUMENTATION_REPEATED_THRESHOLD", "5"))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {"verbose": {"format": "{levelname} {asctime} {module} {message}", "style": "{"}},
     "handlers": {"console": {"class": "logging.StreamHandler"}},
     "root": {"handlers": ["console"], "level": "INFO"},
+    "loggers": {
+        # Uma linha JSON por pedido (INFO), ou só para suspeitas de N+1 (WARNING),
+        # emitida por InstrumentacaoMiddleware.
+        "backend.core.middleware": {
+            "handlers": ["console"],
+            "level": os.environ.get("INSTRUMENTATION_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
 }
 
+# Renderização das respostas da API (ver core/renderers.py): JSON com o orjson
+# (com a biblioteca padrão se não estiver instalado) e, com o pacote `msgpack`,
+# MessagePack para os clientes que peçam `application/msgpack`.
+FAST_JSON_RENDERER = os.environ.get("FAST_JSON_RENDERER", "1") in ("1", "true", "True")
+API_MSGPACK = (
+    os.environ.get("API_MSGPACK", "1") in ("1", "true", "True")
+    and importlib.util.find_spec("msgpack") is not None
+)
+_renderers = [
+    "backend.core.renderers.JSONRapidoRenderer" if FAST_JSON_RENDERER else "rest_framework.renderers.JSONRenderer",
+    "rest_framework.renderers.BrowsableAPIRenderer",
+]
+if API_MSGPACK:
+    _renderers.append("backend.core.renderers.MessagePackRenderer")
+
+# Compressão das respostas (ver core/compressao.py): as codificações por ordem de
+# preferência (as que não tiverem a biblioteca instalada são ignoradas) e o
+# tamanho mínimo, em bytes, das respostas comprimidas.
+RESPONSE_COMPRESSION_ENABLED = os.environ.get("RESPONSE_COMPRESSION_ENABLED", "1") in ("1", "true", "True")
+RESPONSE_COMPRESSION_ENCODINGS = [
+    c.strip() for c in os.environ.get("RESPONSE_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if c.strip()
+]
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+
 REST_FRAMEWORK = {
     # CORREÇÃO: Usar a nossa classe de autenticação personalizada
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -131,8 +266,21 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    "DEFAULT_RENDERER_CLASSES": _renderers,
 }
 
+# Serialização rápida da listagem de filmes (`.values()` + géneros numa só query),
+# com o mesmo JSON que `FilmeListSerializer`.
+FAST_LIST_SERIALIZATION = os.environ.get("FAST_LIST_SERIALIZATION", "1") in ("1", "true", "True")
+
+# Ranking de tendências (ver core/tendencias.py): meia-vida dos eventos (reviews,
+# favoritos, watchlist) e a média bayesiana das avaliações (uma média a priori
+# com o peso de N reviews, para que um filme com uma só review de 5 estrelas
+# não fique à frente de todos).
+TRENDING_HALF_LIFE_DAYS = float(os.environ.get("TRENDING_HALF_LIFE_DAYS", "7"))
+TRENDING_PRIOR_RATING = float(os.environ.get("TRENDING_PRIOR_RATING", "3"))
+TRENDING_PRIOR_REVIEWS = int(os.environ.get("TRENDING_PRIOR_REVIEWS", "5"))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -142,6 +290,22 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Cookie HttpOnly com o token de acesso, lida por JWTCookieAuthentication (ver
+# core/authentication.py) quando o pedido não tem o cabeçalho `Authorization`.
+JWT_AUTH_COOKIE = os.environ.get("JWT_AUTH_COOKIE", "cinemix_access")
+JWT_AUTH_COOKIE_SECURE = os.environ.get("JWT_AUTH_COOKIE_SECURE", "0" if DEBUG else "1") in ("1", "true", "True")
+JWT_AUTH_COOKIE_SAMESITE = os.environ.get("JWT_AUTH_COOKIE_SAMESITE", "Lax")
+# Cache, em memória de cada processo, dos utilizadores resolvidos a partir dos
+# tokens: segundos de vida de cada entrada (0 desativa) e número máximo de entradas.
+JWT_USER_CACHE_TIMEOUT = float(os.environ.get("JWT_USER_CACHE_TIMEOUT", "30"))
+JWT_USER_CACHE_SIZE = int(os.environ.get("JWT_USER_CACHE_SIZE", "1024"))
+
+# Esquema OpenAPI pré-gerado pelo comando `build_openapi_schema` e servido em
+# /api/schema/ (ver core/esquema.py). A verificação `check --deploy` falha se o
+# ficheiro não corresponder às rotas e, com OPENAPI_SCHEMA_REQUIRED, se não existir.
+OPENAPI_SCHEMA_DIR = os.environ.get("OPENAPI_SCHEMA_DIR", str(BASE_DIR / "openapi"))
+OPENAPI_SCHEMA_REQUIRED = os.environ.get("OPENAPI_SCHEMA_REQUIRED", "0" if DEBUG else "1") in ("1", "true", "True")
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Cinemix API',
     'DESCRIPTION': 'Documentação para a API do projeto Cinemix.',
@@ -3,18 +3,22 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
 
 # Importar as views de autenticação diretamente
-from backend.core.views import UserRegistrationView, UserMeView
+from backend.core.esquema import esquema_view
+from backend.core.views import (
+    LogoutView, TokenCookieObtainView, TokenCookieRefreshView, UserRegistrationView, UserMeView,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
 
     # --- Rotas de Autenticação ---
-    path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    # Os tokens são devolvidos no corpo e o de acesso também numa cookie HttpOnly.
+    path("api/auth/token/", TokenCookieObtainView.as_view(), name="token_obtain_pair"),
+    path("api/auth/token/refresh/", TokenCookieRefreshView.as_view(), name="token_refresh"),
+    path("api/auth/logout/", LogoutView.as_view(), name="logout"),
     path("api/auth/register/", UserRegistrationView.as_view(), name="register"),
     path("api/auth/me/", UserMeView.as_view(), name="me"),
 
@@ -22,7 +26,8 @@ urlpatterns = [
     path("api/", include("backend.core.urls")),
 
     # --- Rotas de Documentação da API ---
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    # O esquema pré-gerado por `build_openapi_schema` (ou gerado no momento, se não existir).
+    path("api/schema/", esquema_view, name="schema"),
     path(
         "api/schema/swagger/",
         SpectacularSwaggerView.as_view(url_name="schema"),
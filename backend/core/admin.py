@@ -7,6 +7,10 @@ from .models.elenco import Elenco
 from .models.video import Video
 from .models.review import Review
 from .models.listas import Watchlist, Favorito
+from .models.faceta import FacetaFilme
+from .models.recomendacao import FilmeSemelhante
+from .models.tendencia import TendenciaFilme
+from .models.utilizador import ContadoresUtilizador
 
 class ElencoInline(admin.TabularInline):
     model = Elenco
@@ -67,6 +71,7 @@ class FilmeAdmin(admin.ModelAdmin):
     list_display = ("id", "titulo", "ano_lancamento", "media_rating", "imdb_id")
     list_filter = ("ano_lancamento", "generos")
     search_fields = ("titulo", "descricao", "imdb_id")
+    readonly_fields = ("rating_sum", "reviews_count", "media_rating")
     prepopulated_fields = {"slug": ("titulo",)}
     filter_horizontal = ("generos",)
 
@@ -94,3 +99,25 @@ class WatchlistAdmin(admin.ModelAdmin):
 class FavoritoAdmin(admin.ModelAdmin):
     list_display = ("utilizador", "filme")
     search_fields = ("utilizador__username", "filme__titulo")
+
+@admin.register(FacetaFilme)
+class FacetaFilmeAdmin(admin.ModelAdmin):
+    list_display = ("tipo", "chave", "total")
+    list_filter = ("tipo",)
+    readonly_fields = ("tipo", "chave", "total")
+
+@admin.register(FilmeSemelhante)
+class FilmeSemelhanteAdmin(admin.ModelAdmin):
+    list_display = ("filme", "semelhante", "score", "calculado_em")
+    search_fields = ("filme__titulo",)
+    raw_id_fields = ("filme", "semelhante")
+
+@admin.register(TendenciaFilme)
+class TendenciaFilmeAdmin(admin.ModelAdmin):
+    list_display = ("filme", "score", "popularidade")
+    raw_id_fields = ("filme",)
+
+@admin.register(ContadoresUtilizador)
+class ContadoresUtilizadorAdmin(admin.ModelAdmin):
+    list_display = ("utilizador", "watchlist_count", "favoritos_count", "reviews_count")
+    raw_id_fields = ("utilizador",)
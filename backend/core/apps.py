@@ -39,6 +39,8 @@ class CoreConfig(AppConfig):
             # de "módulo importado mas não utilizado", pois a importação é
             # necessária para que os sinais sejam registados.
             from . import signals  # noqa: F401
+            # Regista a verificação do esquema OpenAPI pré-gerado e a extensão de autenticação.
+            from . import esquema  # noqa: F401
             logger.debug("Sinais da aplicação 'core' carregados com sucesso.")
         except Exception as e:
             # Regista uma exceção detalhada se a importação dos sinais falhar.
@@ -1,6 +1,95 @@
 # backend/core/authentication.py
+"""
+Autenticação por JWT, no cabeçalho `Authorization: Bearer ...` ou numa cookie HttpOnly.
+
+O token de acesso é aceite no cabeçalho (clientes da API) ou na cookie
+`settings.JWT_AUTH_COOKIE` (o frontend), definida pelas views de login e de
+refresh (ver `definir_cookie`). Como qualquer cookie, esta é enviada pelo
+navegador em pedidos de outros sites: as escritas autenticadas por cookie
+exigem o token CSRF, como na `SessionAuthentication`.
+
+Resolver o utilizador de um token custa uma query (`User` pela chave
+primária) por pedido. Os utilizadores resolvidos ficam numa cache LRU em
+memória do processo (`utilizadores`), por `settings.JWT_USER_CACHE_TIMEOUT`
+segundos, pelo que as leituras autenticadas não fazem essa query. A entrada é
+invalidada quando o utilizador é gravado (incluindo a alteração da palavra-passe
+e a desativação) ou apagado, pelos sinais de `signals.py`; nos outros processos,
+e nas escritas sem sinais (`QuerySet.update`), a desatualização é limitada ao
+tempo de vida da entrada.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class CacheUtilizadores:
+    """
+    Cache LRU, com tempo de vida, dos utilizadores resolvidos a partir dos tokens.
+
+    Partilhada pelas threads do processo; devolve cópias, para que um pedido
+    não altere o objeto visto pelos outros. As chaves são os ids em texto, como
+    no claim dos tokens.
+    """
+
+    def __init__(self, maximo: int, duracao: float):
+        self.maximo, self.duracao = maximo, duracao
+        self._entradas: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, user_id):
+        """O utilizador em cache (uma cópia), ou None se não existir ou tiver expirado."""
+        chave = str(user_id)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            user, expira = entrada
+            if expira <= time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+        return copy.copy(user)
+
+    def guardar(self, user_id, user) -> None:
+        if self.duracao <= 0 or self.maximo <= 0:
+            return
+        chave = str(user_id)
+        with self._lock:
+            self._entradas[chave] = (copy.copy(user), time.monotonic() + self.duracao)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, user_id) -> None:
+        with self._lock:
+            self._entradas.pop(str(user_id), None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+utilizadores = CacheUtilizadores(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TIMEOUT)
+
+
+class _CSRFCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        # Devolve o motivo em vez de uma resposta HTTP (como o `CSRFCheck` do DRF).
+        return reason
+
 
 class JWTCookieAuthentication(JWTAuthentication):
     """
@@ -9,9 +98,109 @@ class JWTCookieAuthentication(JWTAuthentication):
     ela simplesmente retorna `None`, tratando o utilizador como anónimo.
     Isto permite que as páginas públicas continuem a funcionar mesmo
     se um utilizador tiver um token expirado no seu navegador.
+
+    O token é lido do cabeçalho `Authorization` ou, na sua falta, da cookie
+    `settings.JWT_AUTH_COOKIE`; o utilizador vem da cache `utilizadores`.
     """
     def authenticate(self, request):
+        raw_token, da_cookie = self.token_bruto(request)
+        if raw_token is None:
+            return None
+        try:
+            validated_token = self.get_validated_token(raw_token)
+            user = self.get_user(validated_token)
+        except InvalidToken:
+            return None
+        if da_cookie:
+            self.enforce_csrf(request)
+        return user, validated_token
+
+    async def aauthenticate(self, request):
+        """
+        Versão assíncrona de `authenticate`, para as views de `views_async.py`.
+
+        A validação do token e a cache de utilizadores não acedem à base de
+        dados; só a leitura de um utilizador que não esteja em cache é
+        executada numa thread. Com o token na cookie, exige o token CSRF nos
+        métodos inseguros, como `authenticate`.
+        """
+        raw_token, da_cookie = self.token_bruto(request)
+        if raw_token is None:
+            return None
         try:
-            return super().authenticate(request)
+            validated_token = self.get_validated_token(raw_token)
+            user = self._utilizador_em_cache(validated_token)
+            if user is None:
+                user = await sync_to_async(self.get_user)(validated_token)
         except InvalidToken:
             return None
+        if da_cookie:
+            self.enforce_csrf(request)
+        return user, validated_token
+
+    def token_bruto(self, request):
+        """
+        O token do pedido, sem validação, e se veio da cookie.
+
+        Returns:
+            `(token, da_cookie)`, ou `(None, False)` se o pedido não tiver token.
+        """
+        header = self.get_header(request)
+        if header is not None:
+            return self.get_raw_token(header), False
+        raw_token = request.COOKIES.get(settings.JWT_AUTH_COOKIE)
+        if raw_token:
+            return raw_token.encode(), True
+        return None, False
+
+    def enforce_csrf(self, request):
+        """Exige o token CSRF nos métodos inseguros, como `SessionAuthentication`."""
+        def dummy_get_response(request):  # pragma: no cover
+            return None
+
+        check = _CSRFCheck(dummy_get_response)
+        check.process_request(request)
+        motivo = check.process_view(request, None, (), {})
+        if motivo:
+            raise PermissionDenied(f"CSRF Failed: {motivo}")
+
+    def get_user(self, validated_token):
+        """O utilizador do token, da cache ou (uma query) da base de dados."""
+        user = self._utilizador_em_cache(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            utilizadores.guardar(getattr(user, api_settings.USER_ID_FIELD), user)
+        return user
+
+    def _utilizador_em_cache(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user = utilizadores.obter(user_id)
+        if user is None:
+            return None
+        # As mesmas verificações de `JWTAuthentication.get_user`, sobre a cópia em cache.
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+def definir_cookie(response, access_token: str) -> None:
+    """Guarda o token de acesso na cookie HttpOnly lida por `JWTCookieAuthentication`."""
+    response.set_cookie(
+        settings.JWT_AUTH_COOKIE,
+        access_token,
+        max_age=int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+        secure=settings.JWT_AUTH_COOKIE_SECURE,
+        httponly=True,
+        samesite=settings.JWT_AUTH_COOKIE_SAMESITE,
+    )
+
+
+def apagar_cookie(response) -> None:
+    response.delete_cookie(settings.JWT_AUTH_COOKIE, samesite=settings.JWT_AUTH_COOKIE_SAMESITE)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da API REST: número de queries e latência por endpoint.
+
+O módulo tem duas partes:
+
+- `gerar_dados`, que cria um catálogo sintético (géneros, pessoas, créditos,
+  filmes, utilizadores, reviews e listas pessoais) com inserções em massa;
+- `executar`, que pede cada cenário de `CENARIOS` através do cliente de testes
+  do Django e mede o número de queries do primeiro pedido e os percentis de
+  latência (p50/p95) de todos.
+
+O resultado é um dicionário serializável em JSON, com chaves ordenadas, para
+que os relatórios de dois commits possam ser comparados com um `diff`. É usado
+pelo comando `benchmark_api` e pelos testes (`BenchmarkTests`), que verificam o
+limite de queries de cada cenário.
+"""
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from dataclasses import dataclass
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from . import biblioteca, facetas, tendencias
+from .models.elenco import Elenco
+from .models.filme import Filme
+from .models.listas import Favorito, Watchlist
+from .models.pessoa import Pessoa
+from .models.review import Review
+from .models.taxonomia import Genero
+
+User = get_user_model()
+
+# Prefixo dos objetos sintéticos (slugs, nomes de utilizador).
+PREFIXO = "bench"
+
+
+@dataclass(frozen=True)
+class Cenario:
+    """Um pedido medido pelo benchmark e o número máximo de queries que pode fazer."""
+    nome: str
+    url: str
+    max_queries: int
+    autenticado: bool = False
+
+
+# `{filme}` é substituído pelo slug de um filme com reviews e créditos,
+# `{pessoa}` pelo de uma pessoa com créditos e `{genero}` pelo de um género.
+# Os limites contam a query dos validadores (ETag) dos endpoints com GET condicional.
+CENARIOS = (
+    Cenario("generos.list", "/api/generos/", 3),
+    Cenario("filmes.list", "/api/filmes/", 3),
+    Cenario("filmes.list.status", "/api/filmes/?include=status", 2, autenticado=True),
+    Cenario("filmes.list.filtros", "/api/filmes/?genero={genero}&ano_min=1980&com_poster=1", 3),
+    Cenario("filmes.list.facets", "/api/filmes/?include=facets", 5),
+    Cenario("filmes.retrieve", "/api/filmes/{filme}/", 4),
+    Cenario("filmes.trending", "/api/filmes/trending/", 2),
+    Cenario("filmes.reviews", "/api/filmes/{filme}/reviews/", 3),
+    Cenario("filmes.bulk_status", "/api/filmes/bulk-status/?slugs={filme}", 2, autenticado=True),
+    Cenario("pessoas.list", "/api/pessoas/", 1),
+    Cenario("pessoas.filmografia", "/api/pessoas/{pessoa}/filmografia/", 1),
+    Cenario("reviews.list", "/api/reviews/", 2),
+    Cenario("watchlist.list", "/api/watchlist/", 2, autenticado=True),
+    Cenario("favoritos.list", "/api/favoritos/", 2, autenticado=True),
+    Cenario("me.library", "/api/me/library/", 4, autenticado=True),
+    # Em SQLite: uma query ao índice FTS5 e outra por tipo encontrado.
+    Cenario("search", "/api/search/?q=filme", 4),
+    # As mesmas leituras pelas views assíncronas (ver views_async.py).
+    Cenario("async.filmes.list", "/api/async/filmes/", 3),
+    Cenario("async.filmes.retrieve", "/api/async/filmes/{filme}/", 4),
+    Cenario("async.filmes.reviews", "/api/async/filmes/{filme}/reviews/", 3),
+)
+
+
+def gerar_dados(
+    filmes: int = 200,
+    generos: int = 12,
+    pessoas: int = 300,
+    creditos: int = 8,
+    utilizadores: int = 50,
+    reviews: int = 10,
+    seed: int = 42,
+    prefixo: str = PREFIXO,
+) -> dict:
+    """
+    Cria um catálogo sintético com inserções em massa.
+
+    Args:
+        filmes: Número de filmes.
+        generos: Número de géneros (cada filme tem até três).
+        pessoas: Número de pessoas.
+        creditos: Créditos (elenco/equipa) por filme.
+        utilizadores: Número de utilizadores; cada um tem alguns filmes na
+            watchlist e nos favoritos.
+        reviews: Reviews por filme (limitadas ao número de utilizadores).
+        seed: Semente do gerador aleatório, para dados reprodutíveis.
+        prefixo: Prefixo dos slugs e nomes, para gerar mais dados sobre os existentes.
+
+    Returns:
+        O número de objetos criados por tipo.
+    """
+    rnd = random.Random(seed)
+    lista_generos = Genero.objects.bulk_create(
+        [Genero(nome=f"{prefixo.title()} Género {i}", slug=f"{prefixo}-genero-{i}") for i in range(generos)]
+    )
+    lista_pessoas = Pessoa.objects.bulk_create([
+        Pessoa(nome=f"{prefixo.title()} Pessoa {i}", slug=f"{prefixo}-pessoa-{i}", bio=f"Biografia {i}")
+        for i in range(pessoas)
+    ])
+    lista_filmes = Filme.objects.bulk_create([
+        Filme(
+            titulo=f"{prefixo.title()} Filme {i}",
+            slug=f"{prefixo}-filme-{i}",
+            ano_lancamento=1950 + rnd.randrange(75),
+            descricao=f"Sinopse do filme {i}.",
+            poster=f"https://exemplo.org/posters/{i}.jpg",
+        )
+        for i in range(filmes)
+    ])
+    lista_utilizadores = User.objects.bulk_create(
+        [User(username=f"{prefixo}-user-{i}") for i in range(utilizadores)]
+    )
+
+    Ligacao = Filme.generos.through
+    ligacoes = [
+        Ligacao(filme_id=f.id, genero_id=g.id)
+        for f in lista_filmes
+        for g in rnd.sample(lista_generos, min(3, len(lista_generos)))
+    ]
+    Ligacao.objects.bulk_create(ligacoes)
+
+    lista_creditos = [
+        Elenco(filme=f, pessoa=p, papel="Ator" if ordem else "Realizador", ordem_credito=ordem)
+        for f in lista_filmes
+        for ordem, p in enumerate(rnd.sample(lista_pessoas, min(creditos, len(lista_pessoas))))
+    ]
+    Elenco.objects.bulk_create(lista_creditos)
+
+    lista_reviews = [
+        Review(filme=f, autor=u, titulo=f"Review de {u.username}", texto="Texto da review.", rating=rnd.randint(1, 5))
+        for f in lista_filmes
+        for u in rnd.sample(lista_utilizadores, min(reviews, len(lista_utilizadores)))
+    ]
+    Review.objects.bulk_create(lista_reviews)
+
+    # As inserções em massa não emitem sinais: os agregados são calculados aqui.
+    for f in lista_filmes:
+        f.rating_sum = f.reviews_count = 0
+    por_id = {f.id: f for f in lista_filmes}
+    for r in lista_reviews:
+        por_id[r.filme_id].rating_sum += r.rating
+        por_id[r.filme_id].reviews_count += 1
+    for f in lista_filmes:
+        f.media_rating = f.rating_sum / f.reviews_count if f.reviews_count else 0.0
+    Filme.objects.bulk_update(lista_filmes, ["rating_sum", "reviews_count", "media_rating"], batch_size=500)
+    facetas.reconstruir()
+
+    listas = {Watchlist: [], Favorito: []}
+    for u in lista_utilizadores:
+        for modelo, destino in listas.items():
+            destino.extend(modelo(utilizador=u, filme=f) for f in rnd.sample(lista_filmes, min(5, len(lista_filmes))))
+    for modelo, objetos in listas.items():
+        modelo.objects.bulk_create(objetos)
+    tendencias.compactar()
+    biblioteca.reconstruir()
+
+    return {
+        "filmes": len(lista_filmes),
+        "generos": len(lista_generos),
+        "pessoas": len(lista_pessoas),
+        "creditos": len(lista_creditos),
+        "utilizadores": len(lista_utilizadores),
+        "reviews": len(lista_reviews),
+        "watchlist": len(listas[Watchlist]),
+        "favoritos": len(listas[Favorito]),
+    }
+
+
+def _percentil(amostras: list[float], p: int) -> float:
+    if len(amostras) == 1:
+        return amostras[0]
+    return statistics.quantiles(amostras, n=100, method="inclusive")[p - 1]
+
+
+def executar(cenarios=CENARIOS, repeticoes: int = 20, com_cache: bool = False) -> dict:
+    """
+    Mede cada cenário sobre os dados existentes (ver `gerar_dados`).
+
+    Args:
+        cenarios: Os cenários a medir.
+        repeticoes: Pedidos por cenário usados nos percentis de latência.
+        com_cache: Mantém a cache de respostas ativa (por defeito é desligada,
+            para que a latência medida seja a da view e não a da cache).
+
+    Returns:
+        Um relatório com os metadados da execução e, por cenário, o código de
+        estado, o número de queries, o limite e os tempos (em milissegundos).
+    """
+    filme = Filme.objects.filter(reviews_count__gt=0, creditos__isnull=False).values_list("slug", flat=True).first()
+    pessoa = Pessoa.objects.filter(creditos__isnull=False).values_list("slug", flat=True).first()
+    genero = Genero.objects.filter(filmes__isnull=False).values_list("slug", flat=True).first()
+    utilizador = User.objects.filter(username__startswith=PREFIXO).first() or User.objects.first()
+    anonimo, autenticado = APIClient(), APIClient()
+    if utilizador is not None:
+        autenticado.force_authenticate(utilizador)
+
+    resultados = {}
+    definicoes = {"ALLOWED_HOSTS": ["testserver"]}
+    if not com_cache:
+        definicoes["RESPONSE_CACHE_ENABLED"] = False
+    with override_settings(**definicoes):
+        for cenario in cenarios:
+            cliente = autenticado if cenario.autenticado else anonimo
+            url = cenario.url.format(filme=filme or "", pessoa=pessoa or "", genero=genero or "")
+            # Cada pedido limpa o registo de queries (sinal `request_started`);
+            # limpá-lo antes garante que a contagem começa do zero.
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                resposta = cliente.get(url)
+            # Lido já: os pedidos seguintes voltam a limpar o registo.
+            total_queries = len(queries)
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                cliente.get(url)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[cenario.nome] = {
+                "url": url,
+                "status": resposta.status_code,
+                "queries": total_queries,
+                "max_queries": cenario.max_queries,
+                "p50_ms": round(_percentil(tempos, 50), 3) if tempos else None,
+                "p95_ms": round(_percentil(tempos, 95), 3) if tempos else None,
+            }
+
+    return {
+        "meta": {
+            "vendor": connection.vendor,
+            "django": django.get_version(),
+            "repeticoes": repeticoes,
+            "com_cache": com_cache,
+        },
+        "cenarios": resultados,
+    }
+
+
+def excedidos(relatorio: dict) -> list[str]:
+    """Devolve os nomes dos cenários que falharam ou excederam o limite de queries."""
+    return [
+        nome for nome, r in relatorio["cenarios"].items()
+        if r["status"] != 200 or r["queries"] > r["max_queries"]
+    ]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Contadores desnormalizados da biblioteca de cada utilizador.
+
+O número de filmes na watchlist, de favoritos e de reviews escritas de cada
+utilizador fica numa linha de `ContadoresUtilizador`, atualizada com
+incrementos `F()` a cada escrita: pelos sinais de `Watchlist`, `Favorito` e
+`Review` (ver `signals.py`) e, para as escritas em SQL de `listas.py`, depois
+do commit (`agendar`), como os eventos do ranking de tendências. Mostrar os
+contadores no perfil é assim a leitura de uma linha pela chave primária, em vez
+de três `COUNT(*)`.
+
+As escritas que não emitem sinais (`bulk_create`, `QuerySet.update`, SQL
+direto) devem chamar `reconstruir` no fim, como faz o comando `recompute_aggregates`.
+"""
+from __future__ import annotations
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models.listas import Favorito, Watchlist
+from .models.review import Review
+from .models.utilizador import ContadoresUtilizador
+
+# Contador de cada modelo e o campo com o dono da linha.
+CAMPOS = {
+    Watchlist: ("watchlist_count", "utilizador_id"),
+    Favorito: ("favoritos_count", "utilizador_id"),
+    Review: ("reviews_count", "autor_id"),
+}
+
+
+def contadores(utilizador_id: int) -> dict:
+    """Os contadores de um utilizador, com uma query (a zero se ainda não tiver linha)."""
+    linha = (
+        ContadoresUtilizador.objects.filter(pk=utilizador_id)
+        .values("watchlist_count", "favoritos_count", "reviews_count").first()
+    )
+    linha = linha or {"watchlist_count": 0, "favoritos_count": 0, "reviews_count": 0}
+    return {
+        "watchlist": linha["watchlist_count"],
+        "favoritos": linha["favoritos_count"],
+        "reviews": linha["reviews_count"],
+    }
+
+
+def ajustar(modelo, utilizador_id: int, delta: int) -> None:
+    """
+    Soma `delta` ao contador de `modelo` do utilizador, com um `UPDATE`.
+
+    Se o utilizador ainda não tiver linha, esta é calculada a partir das
+    tabelas (que já incluem a escrita que originou o ajuste). Nas remoções não:
+    ao apagar um utilizador, as suas listas são apagadas em cascata depois da
+    linha dos contadores, que não deve ser recriada.
+    """
+    if not delta:
+        return
+    campo = CAMPOS[modelo][0]
+    if not ContadoresUtilizador.objects.filter(pk=utilizador_id).update(**{campo: F(campo) + delta}) and delta > 0:
+        reconstruir([utilizador_id])
+
+
+def agendar(modelo, utilizador_id: int, delta: int) -> None:
+    """Ajusta o contador depois do commit da transação atual (ou já, fora de uma)."""
+    if delta:
+        transaction.on_commit(partial(ajustar, modelo, utilizador_id, delta))
+
+
+def reconstruir(utilizadores=None) -> int:
+    """
+    Recalcula os contadores a partir das tabelas, com uma query de agregação por contador.
+
+    Args:
+        utilizadores: Os ids dos utilizadores a recalcular (por defeito, todos:
+            as linhas existentes são substituídas).
+
+    Returns:
+        O número de linhas gravadas.
+    """
+    valores: dict[int, dict[str, int]] = {}
+    if utilizadores is not None:
+        valores = {u: {} for u in utilizadores}
+    for modelo, (campo, dono) in CAMPOS.items():
+        linhas = modelo.objects.all()
+        if utilizadores is not None:
+            linhas = linhas.filter(**{f"{dono}__in": list(valores)})
+        for utilizador_id, total in linhas.values(dono).annotate(n=Count("pk")).values_list(dono, "n").order_by():
+            valores.setdefault(utilizador_id, {})[campo] = total
+
+    objetos = [
+        ContadoresUtilizador(utilizador_id=u, **{campo: v.get(campo, 0) for campo, _ in CAMPOS.values()})
+        for u, v in valores.items()
+    ]
+    with transaction.atomic():
+        if utilizadores is None:
+            ContadoresUtilizador.objects.all().delete()
+        ContadoresUtilizador.objects.bulk_create(
+            objetos,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["utilizador"],
+            update_fields=[campo for campo, _ in CAMPOS.values()],
+        )
+    return len(objetos)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Cache versionada das respostas de leitura do catálogo.
+
+As respostas de `list`/`retrieve` dos pedidos anónimos são guardadas na cache
+`respostas` (ver `settings.CACHES`), já serializadas. Em vez de apagar entradas
+quando os dados mudam, cada resposta fica associada a um conjunto de contadores
+de versão (ex: `filme:<slug>`, `catalogo`, `generos`) que entram na chave:
+quando os sinais incrementam um contador, as chaves antigas deixam
+simplesmente de ser usadas e acabam por expirar.
+
+O backend é configurável (memória local ou ficheiros), pelo que funciona sem Redis.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .replicas import replica_atual
+
+# Cabeçalhos guardados com a resposta e repostos quando esta é servida da cache.
+CABECALHOS_GUARDADOS = ("ETag", "Last-Modified")
+
+# Nomes dos contadores de versão partilhados.
+VERSAO_CATALOGO = "catalogo"
+VERSAO_GENEROS = "generos"
+VERSAO_PESSOAS = "pessoas"
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _chave_versao(nome: str) -> str:
+    return f"versao:{nome}"
+
+
+def versao_filme(slug: str) -> str:
+    return f"filme:{slug}"
+
+
+def versao_genero(pk) -> str:
+    return f"genero:{pk}"
+
+
+def obter_versoes(nomes) -> list[int]:
+    """
+    Lê os contadores de versão indicados numa única operação na cache.
+
+    Um contador inexistente (nunca criado ou removido por falta de espaço) é
+    inicializado com o instante atual em nanossegundos, para que nunca coincida
+    com uma versão usada anteriormente.
+    """
+    cache = _cache()
+    chaves = [_chave_versao(n) for n in nomes]
+    atuais = cache.get_many(chaves)
+    versoes = []
+    for chave in chaves:
+        if chave not in atuais:
+            cache.add(chave, time.time_ns(), None)
+            atuais[chave] = cache.get(chave)
+        versoes.append(atuais[chave])
+    return versoes
+
+
+async def aobter_versoes(nomes) -> list[int]:
+    """Versão assíncrona de `obter_versoes`, com a API assíncrona da cache."""
+    cache = _cache()
+    chaves = [_chave_versao(n) for n in nomes]
+    atuais = await cache.aget_many(chaves)
+    versoes = []
+    for chave in chaves:
+        if chave not in atuais:
+            await cache.aadd(chave, time.time_ns(), None)
+            atuais[chave] = await cache.aget(chave)
+        versoes.append(atuais[chave])
+    return versoes
+
+
+def chave_resposta(basename: str, action: str, kwargs: dict, query_params, versoes, formato: str) -> str:
+    """
+    A chave de uma resposta em cache: a view, os argumentos do URL, a query
+    string, o formato negociado (os validadores guardados dependem dele) e as
+    versões dos contadores de que depende.
+    """
+    parametros = sorted(query_params.lists())
+    digest = hashlib.md5(repr((sorted(kwargs.items()), parametros, formato)).encode("utf-8")).hexdigest()
+    return f"resposta:{basename}:{action}:{digest}:{'.'.join(str(v) for v in versoes)}"
+
+
+def incrementar_versoes(*nomes: str) -> None:
+    """
+    Invalida todas as respostas que dependem dos contadores indicados.
+
+    Os contadores são incrementados já, para as leituras feitas na mesma
+    transação, e outra vez depois do commit: um pedido concorrente que tenha
+    lido os dados antigos entre os dois momentos guarda-os com uma versão que
+    deixa de ser usada.
+    """
+    _incrementar(nomes)
+    transaction.on_commit(partial(_incrementar, nomes))
+
+
+def _incrementar(nomes) -> None:
+    """
+    Dá a cada contador um valor novo: o instante atual em nanossegundos, ou o
+    valor lido mais um, se for maior (o contador nunca recua).
+
+    Não usa `cache.incr`, que nos ficheiros (`FileBasedCache`) também é uma
+    leitura seguida de uma escrita: dois incrementos simultâneos podiam gravar
+    o mesmo valor. Assim, cada incremento grava um valor que nenhum outro usou
+    e, se dois se sobrepuserem, o que fica é igualmente novo.
+    """
+    cache = _cache()
+    chaves = [_chave_versao(n) for n in nomes]
+    atuais = cache.get_many(chaves)
+    cache.set_many({chave: max(atuais.get(chave, 0) + 1, time.time_ns()) for chave in chaves}, None)
+
+
+class VersionedCacheMixin:
+    """
+    Mixin para ViewSets que guarda em cache as respostas de `list` e `retrieve`.
+
+    Só são guardados os pedidos anónimos com resposta 200; os utilizadores
+    autenticados recebem sempre dados atuais (que podem ser personalizados).
+    As subclasses indicam de que contadores depende cada ação através de
+    `get_cache_versions`.
+
+    Os validadores (`ETag`/`Last-Modified`) são guardados com os dados, pelo que
+    um pedido condicional servido da cache pode receber um 304 sem nenhuma query.
+    Deve por isso vir antes de `ConditionalGetMixin` na lista de bases.
+
+    Com réplicas de leitura (ver `replicas.py`), uma resposta lida de uma réplica
+    atrasada pode não ter a última escrita, que já mudou a versão: é guardada só
+    por `REPLICA_RESPONSE_CACHE_TIMEOUT` segundos, e os clientes que acabaram de
+    escrever não usam a cache.
+
+    As ações assíncronas (`alist`/`aretrieve`, ver `views_async.py`) usam as
+    mesmas chaves, versões e regras, com a API assíncrona da cache.
+    """
+
+    def get_cache_versions(self) -> list[str]:
+        raise ImproperlyConfigured(
+            f"{type(self).__name__} tem de definir `get_cache_versions` (os contadores de que cada ação depende)."
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self._resposta_em_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._resposta_em_cache(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._aresposta_em_cache(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._aresposta_em_cache(super().aretrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request, versoes) -> str:
+        return chave_resposta(
+            self.basename, self.action, self.kwargs, request.query_params, versoes, request.accepted_renderer.format
+        )
+
+    def _usa_cache(self, request) -> bool:
+        if not settings.RESPONSE_CACHE_ENABLED or request.user.is_authenticated:
+            return False
+        return not (settings.DATABASE_REPLICAS and settings.REPLICA_STICKY_COOKIE in request.COOKIES)
+
+    def _resposta_em_cache(self, handler, request, *args, **kwargs):
+        if not self._usa_cache(request):
+            return handler(request, *args, **kwargs)
+
+        cache = _cache()
+        chave = self.get_cache_key(request, obter_versoes(self.get_cache_versions()))
+        entrada = cache.get(chave)
+        if entrada is not None:
+            return _resposta_da_cache(request, entrada)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(chave, _entrada(response), _duracao())
+            response["X-Cache"] = "MISS"
+        return response
+
+    async def _aresposta_em_cache(self, handler, request, *args, **kwargs):
+        """Versão assíncrona de `_resposta_em_cache`, para as views de `views_async.py`."""
+        if not self._usa_cache(request):
+            return await handler(request, *args, **kwargs)
+
+        cache = _cache()
+        chave = self.get_cache_key(request, await aobter_versoes(self.get_cache_versions()))
+        entrada = await cache.aget(chave)
+        if entrada is not None:
+            return _resposta_da_cache(request, entrada)
+
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(chave, _entrada(response), _duracao())
+            response["X-Cache"] = "MISS"
+        return response
+
+
+def _resposta_da_cache(request, entrada):
+    dados, cabecalhos = entrada
+    nao_modificado = get_conditional_response(
+        request,
+        etag=cabecalhos.get("ETag"),
+        last_modified=parse_http_date_safe(cabecalhos.get("Last-Modified", "")),
+    )
+    if nao_modificado is not None:
+        return nao_modificado
+    return Response(dados, headers={**cabecalhos, "X-Cache": "HIT"})
+
+
+def _entrada(response) -> tuple:
+    return response.data, {h: response[h] for h in CABECALHOS_GUARDADOS if response.has_header(h)}
+
+
+def _duracao() -> int:
+    duracao = settings.RESPONSE_CACHE_TIMEOUT
+    if replica_atual() is not None:
+        duracao = min(duracao, settings.REPLICA_RESPONSE_CACHE_TIMEOUT)
+    return duracao
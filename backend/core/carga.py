@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de carga HTTP: débito e latência de um servidor com muitos pedidos concorrentes.
+
+Ao contrário de `benchmark.py`, que chama as views no próprio processo, este
+módulo faz pedidos reais a um servidor já em execução, para comparar formas de
+o servir (ex: gunicorn/WSGI com as views síncronas e uvicorn/ASGI com as views
+de `views_async.py`). O cliente usa apenas a biblioteca padrão: `concorrencia`
+tarefas `asyncio`, cada uma com a sua ligação HTTP/1.1 persistente, pedem os
+caminhos à vez até ao fim da duração indicada. É usado pelo comando `loadtest_api`.
+"""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urljoin, urlsplit
+
+
+class ErroHTTP(Exception):
+    """Resposta HTTP que não foi possível ler."""
+
+
+@dataclass
+class Resultado:
+    """Os pedidos concluídos por um teste de carga."""
+    duracao: float = 0.0
+    latencias: list[float] = field(default_factory=list)
+    codigos: dict[int, int] = field(default_factory=dict)
+    falhas: int = 0
+
+    def resumo(self) -> dict:
+        """Débito e percentis de latência (em milissegundos), serializáveis em JSON."""
+        total = len(self.latencias)
+        ordenadas = sorted(self.latencias)
+
+        def percentil(p: float) -> float:
+            if not ordenadas:
+                return 0.0
+            return round(ordenadas[min(int(p * total), total - 1)] * 1000, 2)
+
+        return {
+            "pedidos": total,
+            "falhas": self.falhas,
+            "codigos": {str(c): n for c, n in sorted(self.codigos.items())},
+            "pedidos_s": round(total / self.duracao, 1) if self.duracao else 0.0,
+            "media_ms": round(statistics.fmean(ordenadas) * 1000, 2) if ordenadas else 0.0,
+            "p50_ms": percentil(0.50),
+            "p95_ms": percentil(0.95),
+            "p99_ms": percentil(0.99),
+        }
+
+
+class _Ligacao:
+    """Uma ligação HTTP/1.1 persistente (keep-alive) a um servidor."""
+
+    def __init__(self, host: str, porta: int):
+        self.host, self.porta = host, porta
+        self.leitor = self.escritor = None
+
+    async def pedir(self, caminho: str) -> int:
+        """Faz um `GET` e lê a resposta inteira; devolve o código HTTP."""
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+        pedido = f"GET {caminho} HTTP/1.1\r\nHost: {self.host}:{self.porta}\r\nAccept: application/json\r\n\r\n"
+        self.escritor.write(pedido.encode("latin-1"))
+        await self.escritor.drain()
+
+        linha = await self.leitor.readline()
+        if not linha:
+            raise ErroHTTP("Ligação fechada pelo servidor.")
+        try:
+            codigo = int(linha.split()[1])
+        except (IndexError, ValueError):
+            raise ErroHTTP(f"Linha de estado inválida: {linha!r}") from None
+
+        cabecalhos = {}
+        while (linha := await self.leitor.readline()) not in (b"\r\n", b"\n", b""):
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            cabecalhos[nome.strip().lower()] = valor.strip().lower()
+
+        if cabecalhos.get("transfer-encoding") == "chunked":
+            while tamanho := int((await self.leitor.readline()).split(b";")[0], 16):
+                await self.leitor.readexactly(tamanho + 2)
+            await self.leitor.readline()
+        elif "content-length" in cabecalhos:
+            await self.leitor.readexactly(int(cabecalhos["content-length"]))
+        if cabecalhos.get("connection") == "close":
+            self.fechar()
+        return codigo
+
+    def fechar(self) -> None:
+        if self.escritor is not None:
+            self.escritor.close()
+        self.leitor = self.escritor = None
+
+
+async def _trabalhador(ligacao: _Ligacao, caminhos: list[str], inicio: int, fim: float, resultado: Resultado | None):
+    i = inicio
+    while time.perf_counter() < fim:
+        caminho = caminhos[i % len(caminhos)]
+        i += 1
+        comeco = time.perf_counter()
+        try:
+            codigo = await ligacao.pedir(caminho)
+        except (OSError, ErroHTTP, asyncio.IncompleteReadError, ValueError):
+            ligacao.fechar()
+            if resultado is not None:
+                resultado.falhas += 1
+            continue
+        if resultado is not None:
+            resultado.latencias.append(time.perf_counter() - comeco)
+            resultado.codigos[codigo] = resultado.codigos.get(codigo, 0) + 1
+
+
+async def _executar(base: str, caminhos: list[str], concorrencia: int, duracao: float, aquecimento: float) -> Resultado:
+    url = urlsplit(base)
+    ligacoes = [_Ligacao(url.hostname, url.port or 80) for _ in range(concorrencia)]
+    caminhos = [urlsplit(urljoin(base, c))._replace(scheme="", netloc="").geturl() for c in caminhos]
+    try:
+        # O aquecimento abre as ligações e enche as caches (do servidor e da base de dados).
+        if aquecimento > 0:
+            fim = time.perf_counter() + aquecimento
+            await asyncio.gather(*(_trabalhador(l, caminhos, n, fim, None) for n, l in enumerate(ligacoes)))
+        resultado = Resultado()
+        inicio = time.perf_counter()
+        fim = inicio + duracao
+        await asyncio.gather(*(_trabalhador(l, caminhos, n, fim, resultado) for n, l in enumerate(ligacoes)))
+        resultado.duracao = time.perf_counter() - inicio
+        return resultado
+    finally:
+        for ligacao in ligacoes:
+            ligacao.fechar()
+
+
+def executar(base: str, caminhos: list[str], concorrencia: int = 100, duracao: float = 10.0,
+             aquecimento: float = 2.0) -> dict:
+    """
+    Pede os `caminhos` a um servidor com `concorrencia` ligações simultâneas.
+
+    Args:
+        base: O URL base (`http://host:porta/prefixo/`) a que os caminhos são relativos.
+        caminhos: Os caminhos pedidos, à vez, por cada ligação.
+        concorrencia: Número de ligações (e de pedidos) simultâneos.
+        duracao: Segundos de medição.
+        aquecimento: Segundos de pedidos antes da medição, não contados.
+
+    Returns:
+        O resumo do teste (ver `Resultado.resumo`).
+
+    Raises:
+        ValueError: Se o URL base não for HTTP.
+    """
+    if urlsplit(base).scheme != "http":
+        raise ValueError(f"Só são suportados URLs http:// ({base}).")
+    return asyncio.run(_executar(base, caminhos, concorrencia, duracao, aquecimento)).resumo()
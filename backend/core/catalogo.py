@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Importação e exportação do catálogo em JSONL ou CSV, em stream.
+
+Os registos (`genero`, `pessoa`, `filme`, `elenco`, `video`) são lidos e
+escritos um a um e gravados em lotes, pelo que a memória usada não cresce com
+o tamanho do ficheiro:
+
+- JSONL: um ficheiro com um objeto por linha e o tipo no campo `tipo`;
+- CSV: uma pasta com um ficheiro por tipo (`generos.csv`, `pessoas.csv`, ...),
+  com os géneros de cada filme separados por `|`.
+
+Os ficheiros terminados em `.gz` são (des)comprimidos com gzip.
+
+Cada lote é gravado com `bulk_create(..., update_conflicts=True)` sobre a chave
+natural do registo (o slug, ou o filme/pessoa/papel de um crédito), pelo que
+uma importação repetida atualiza em vez de duplicar. As chaves estrangeiras são
+indicadas por slug e resolvidas com mapas slug -> id em memória, preenchidos
+com uma query por lote para os slugs ainda desconhecidos. Os agregados das
+reviews (`rating_sum`, `reviews_count`) não fazem parte do catálogo e a média
+exportada só é usada ao criar um filme.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import facetas
+from .caching import VERSAO_CATALOGO, VERSAO_GENEROS, VERSAO_PESSOAS, incrementar_versoes
+from .models.elenco import Elenco
+from .models.filme import Filme
+from .models.pessoa import Pessoa
+from .models.taxonomia import Genero
+from .models.video import Video
+
+# Ordem de escrita: cada tipo só referencia os anteriores.
+TIPOS = ("genero", "pessoa", "filme", "elenco", "video")
+
+# Ficheiro de cada tipo numa exportação em CSV.
+FICHEIROS_CSV = {
+    "genero": "generos.csv",
+    "pessoa": "pessoas.csv",
+    "filme": "filmes.csv",
+    "elenco": "elenco.csv",
+    "video": "videos.csv",
+}
+
+# Campos exportados de cada tipo (`filme`/`pessoa` nos créditos e vídeos são
+# slugs; o `tipo` de um vídeo chama-se `categoria`, para não colidir com o do registo).
+CAMPOS = {
+    "genero": ["slug", "nome"],
+    "pessoa": ["slug", "nome", "bio", "foto"],
+    "filme": [
+        "slug", "titulo", "descricao", "ano_lancamento", "imdb_id", "media_rating",
+        "poster", "backdrop", "generos",
+    ],
+    "elenco": ["filme", "pessoa", "papel", "ordem_credito"],
+    "video": ["filme", "site", "key", "titulo", "categoria", "url", "idioma"],
+}
+
+SEPARADOR_GENEROS = "|"
+
+
+def _abrir(caminho: Path, modo: str):
+    if caminho.suffix == ".gz":
+        return gzip.open(caminho, modo + "t", encoding="utf-8", newline="")
+    return open(caminho, modo, encoding="utf-8", newline="")
+
+
+# --- Exportação ---
+
+def _por_id(queryset, lote: int):
+    """Percorre um queryset por intervalos de id, um lote de cada vez."""
+    ultimo = 0
+    while True:
+        linhas = list(queryset.filter(id__gt=ultimo).order_by("id")[:lote])
+        if not linhas:
+            return
+        yield linhas
+        ultimo = linhas[-1]["id"]
+
+
+def registos(lote: int = 1000):
+    """
+    Gera todos os registos do catálogo, pela ordem de `TIPOS`.
+
+    Cada registo é um dicionário com o `tipo` e os campos de `CAMPOS`.
+    """
+    consultas = {
+        "genero": Genero.objects.values("id", "slug", "nome"),
+        "pessoa": Pessoa.objects.values("id", "slug", "nome", "bio", "foto"),
+        "elenco": Elenco.objects.values(
+            "id", "papel", "ordem_credito", filme_slug=F("filme__slug"), pessoa_slug=F("pessoa__slug"),
+        ),
+        "video": Video.objects.values(
+            "id", "site", "key", "titulo", "url", "idioma", filme_slug=F("filme__slug"), categoria=F("tipo"),
+        ),
+    }
+    for tipo in ("genero", "pessoa"):
+        for linhas in _por_id(consultas[tipo], lote):
+            for linha in linhas:
+                yield {"tipo": tipo, **{c: linha[c] for c in CAMPOS[tipo]}}
+
+    campos_filme = [c for c in CAMPOS["filme"] if c != "generos"]
+    for linhas in _por_id(Filme.objects.values("id", *campos_filme), lote):
+        generos: dict[int, list[str]] = {}
+        ligacoes = Filme.generos.through.objects.filter(filme_id__in=[f["id"] for f in linhas])
+        for filme_id, slug in ligacoes.order_by("genero__slug").values_list("filme_id", "genero__slug"):
+            generos.setdefault(filme_id, []).append(slug)
+        for linha in linhas:
+            yield {"tipo": "filme", **{c: linha[c] for c in campos_filme}, "generos": generos.get(linha["id"], [])}
+
+    for tipo in ("elenco", "video"):
+        for linhas in _por_id(consultas[tipo], lote):
+            for linha in linhas:
+                linha["filme"] = linha.pop("filme_slug")
+                if tipo == "elenco":
+                    linha["pessoa"] = linha.pop("pessoa_slug")
+                yield {"tipo": tipo, **{c: linha[c] for c in CAMPOS[tipo]}}
+
+
+def exportar(destino: Path, formato: str, lote: int = 1000) -> Counter:
+    """
+    Exporta o catálogo para um ficheiro JSONL ou uma pasta de ficheiros CSV.
+
+    Returns:
+        O número de registos exportados por tipo.
+    """
+    total = Counter()
+    if formato == "jsonl":
+        with _abrir(destino, "w") as ficheiro:
+            for registo in registos(lote):
+                ficheiro.write(json.dumps(registo, ensure_ascii=False) + "\n")
+                total[registo["tipo"]] += 1
+        return total
+
+    destino.mkdir(parents=True, exist_ok=True)
+    ficheiros, escritores = {}, {}
+    try:
+        for registo in registos(lote):
+            tipo = registo.pop("tipo")
+            if tipo not in escritores:
+                ficheiros[tipo] = _abrir(destino / FICHEIROS_CSV[tipo], "w")
+                escritores[tipo] = csv.DictWriter(ficheiros[tipo], fieldnames=CAMPOS[tipo])
+                escritores[tipo].writeheader()
+            if tipo == "filme":
+                registo["generos"] = SEPARADOR_GENEROS.join(registo["generos"])
+            escritores[tipo].writerow(registo)
+            total[tipo] += 1
+    finally:
+        for ficheiro in ficheiros.values():
+            ficheiro.close()
+    return total
+
+
+# --- Importação ---
+
+def ler(origem: Path):
+    """
+    Lê os registos de um ficheiro JSONL ou de uma pasta de ficheiros CSV.
+
+    Os CSV são lidos pela ordem de `TIPOS`; os seus valores (texto) são
+    convertidos para os tipos dos campos pelo `Importador`.
+    """
+    if not origem.is_dir():
+        with _abrir(origem, "r") as ficheiro:
+            for numero, linha in enumerate(ficheiro, 1):
+                if linha.strip():
+                    try:
+                        yield json.loads(linha)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Linha {numero}: JSON inválido ({e.msg}).") from None
+        return
+
+    for tipo in TIPOS:
+        caminhos = [origem / FICHEIROS_CSV[tipo], origem / (FICHEIROS_CSV[tipo] + ".gz")]
+        caminho = next((c for c in caminhos if c.exists()), None)
+        if caminho is None:
+            continue
+        with _abrir(caminho, "r") as ficheiro:
+            for linha in csv.DictReader(ficheiro):
+                if tipo == "filme":
+                    linha["generos"] = [g for g in (linha.get("generos") or "").split(SEPARADOR_GENEROS) if g]
+                yield {"tipo": tipo, **linha}
+
+
+def _inteiro(valor):
+    return None if valor in (None, "") else int(valor)
+
+
+def _real(valor):
+    return 0.0 if valor in (None, "") else float(valor)
+
+
+class Importador:
+    """
+    Grava registos do catálogo em lotes, com os mapas slug -> id das chaves estrangeiras.
+
+    Os registos de cada tipo acumulam-se num lote; antes de gravar um lote são
+    gravados os lotes pendentes dos tipos de que depende (ex: os filmes antes
+    dos créditos), para que as chaves estrangeiras já existam.
+    """
+
+    def __init__(self, lote: int = 1000):
+        self.lote = max(1, lote)
+        self.pendentes: dict[str, dict] = {tipo: {} for tipo in TIPOS}
+        self.ids = {"genero": {}, "pessoa": {}, "filme": {}}
+        self.gravados = Counter()
+        self.ignorados = Counter()
+        self.filmes_tocados: set[int] = set()
+
+    def adicionar(self, registo: dict) -> None:
+        tipo = registo.get("tipo")
+        if tipo not in self.pendentes:
+            raise ValueError(f"Tipo de registo desconhecido: {tipo!r}.")
+        pendentes = self.pendentes[tipo]
+        # Registos repetidos no mesmo lote: fica o último (um `ON CONFLICT`
+        # não pode atualizar a mesma linha duas vezes na mesma instrução).
+        pendentes[self._chave(tipo, registo)] = registo
+        if len(pendentes) >= self.lote:
+            self.descarregar(tipo)
+
+    @staticmethod
+    def _chave(tipo: str, registo: dict):
+        if tipo == "elenco":
+            return registo["filme"], registo["pessoa"], registo.get("papel") or ""
+        if tipo == "video":
+            return registo["filme"], registo.get("site") or Video.SiteVideo.YOUTUBE, registo["key"]
+        return registo["slug"]
+
+    def terminar(self) -> None:
+        """Grava os lotes pendentes e atualiza o que as escritas em massa não atualizam."""
+        for tipo in TIPOS:
+            self.descarregar(tipo)
+        # Os créditos e vídeos fazem parte do detalhe (e dos validadores) do filme.
+        tocados = list(self.filmes_tocados)
+        for inicio in range(0, len(tocados), self.lote):
+            Filme.objects.filter(pk__in=tocados[inicio:inicio + self.lote]).update(updated_at=timezone.now())
+        if self.gravados["filme"] or self.gravados["genero"]:
+            facetas.reconstruir()
+        # O detalhe de cada filme depende também do contador `generos`, que
+        # invalida de uma vez todos os detalhes em cache.
+        incrementar_versoes(VERSAO_CATALOGO, VERSAO_GENEROS, VERSAO_PESSOAS)
+
+    def descarregar(self, tipo: str) -> None:
+        for anterior in TIPOS[:TIPOS.index(tipo)]:
+            if self.pendentes[anterior]:
+                self.descarregar(anterior)
+        registos = list(self.pendentes[tipo].values())
+        if not registos:
+            return
+        self.pendentes[tipo] = {}
+        with transaction.atomic():
+            getattr(self, f"_gravar_{tipo}")(registos)
+
+    def _resolver(self, tipo: str, slugs) -> dict[str, int]:
+        """Completa o mapa slug -> id de `tipo` com os slugs ainda desconhecidos (uma query)."""
+        mapa = self.ids[tipo]
+        em_falta = {s for s in slugs if s not in mapa}
+        if em_falta:
+            modelo = {"genero": Genero, "pessoa": Pessoa, "filme": Filme}[tipo]
+            mapa.update(modelo.objects.filter(slug__in=em_falta).values_list("slug", "id"))
+        return mapa
+
+    def _gravar(self, modelo, objetos, unique_fields, update_fields, tipo, chaves=None):
+        # `updated_at` (auto_now) recebe a data atual também nas linhas atualizadas.
+        modelo.objects.bulk_create(
+            objetos, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields,
+        )
+        self.gravados[tipo] += len(objetos)
+        if chaves is not None:
+            # Os ids dos objetos gravados (novos ou já existentes) entram no mapa.
+            self.ids[tipo].update(modelo.objects.filter(slug__in=chaves).values_list("slug", "id"))
+
+    def _gravar_genero(self, registos):
+        objetos = [Genero(slug=r["slug"], nome=r["nome"]) for r in registos]
+        self._gravar(Genero, objetos, ["slug"], ["nome", "updated_at"], "genero", [o.slug for o in objetos])
+
+    def _gravar_pessoa(self, registos):
+        objetos = [
+            Pessoa(slug=r["slug"], nome=r["nome"], bio=r.get("bio") or "", foto=r.get("foto") or "")
+            for r in registos
+        ]
+        self._gravar(Pessoa, objetos, ["slug"], ["nome", "bio", "foto", "updated_at"], "pessoa", [o.slug for o in objetos])
+
+    def _gravar_filme(self, registos):
+        objetos = [
+            Filme(
+                slug=r["slug"],
+                titulo=r["titulo"],
+                descricao=r.get("descricao") or "",
+                ano_lancamento=_inteiro(r.get("ano_lancamento")),
+                imdb_id=r.get("imdb_id") or None,
+                media_rating=_real(r.get("media_rating")),
+                poster=r.get("poster") or "",
+                backdrop=r.get("backdrop") or "",
+            )
+            for r in registos
+        ]
+        # A média só é escrita ao criar o filme: depois é mantida pelas reviews.
+        campos = ["titulo", "descricao", "ano_lancamento", "imdb_id", "poster", "backdrop", "updated_at"]
+        self._gravar(Filme, objetos, ["slug"], campos, "filme", [o.slug for o in objetos])
+
+        generos = self._resolver("genero", {g for r in registos for g in r.get("generos") or []})
+        filmes = self.ids["filme"]
+        Ligacao = Filme.generos.through
+        com_generos = [r for r in registos if "generos" in r]
+        Ligacao.objects.filter(filme_id__in=[filmes[r["slug"]] for r in com_generos]).delete()
+        ligacoes = []
+        for r in com_generos:
+            for slug in r["generos"]:
+                if slug in generos:
+                    ligacoes.append(Ligacao(filme_id=filmes[r["slug"]], genero_id=generos[slug]))
+                else:
+                    self.ignorados["genero"] += 1
+        Ligacao.objects.bulk_create(ligacoes, ignore_conflicts=True)
+
+    def _com_filme(self, tipo: str, registos, pessoas: bool = False):
+        """Os registos cujas chaves estrangeiras existem, com os ids resolvidos."""
+        filmes = self._resolver("filme", {r["filme"] for r in registos})
+        mapa_pessoas = self._resolver("pessoa", {r["pessoa"] for r in registos}) if pessoas else {}
+        validos = []
+        for r in registos:
+            if r["filme"] not in filmes or (pessoas and r["pessoa"] not in mapa_pessoas):
+                self.ignorados[tipo] += 1
+                continue
+            r = {**r, "filme_id": filmes[r["filme"]]}
+            if pessoas:
+                r["pessoa_id"] = mapa_pessoas[r["pessoa"]]
+            self.filmes_tocados.add(r["filme_id"])
+            validos.append(r)
+        return validos
+
+    def _gravar_elenco(self, registos):
+        objetos = [
+            Elenco(
+                filme_id=r["filme_id"],
+                pessoa_id=r["pessoa_id"],
+                papel=r.get("papel") or "",
+                ordem_credito=_inteiro(r.get("ordem_credito")) or 0,
+            )
+            for r in self._com_filme("elenco", registos, pessoas=True)
+        ]
+        self._gravar(Elenco, objetos, ["filme", "pessoa", "papel"], ["ordem_credito"], "elenco")
+
+    def _gravar_video(self, registos):
+        objetos = [
+            Video(
+                filme_id=r["filme_id"],
+                site=r.get("site") or Video.SiteVideo.YOUTUBE,
+                key=r["key"],
+                titulo=r["titulo"],
+                tipo=r.get("categoria") or Video.TipoVideo.TRAILER,
+                url=r.get("url") or "",
+                idioma=r.get("idioma") or "",
+            )
+            for r in self._com_filme("video", registos)
+        ]
+        self._gravar(Video, objetos, ["filme", "site", "key"], ["titulo", "tipo", "url", "idioma", "updated_at"], "video")
+
+
+def importar(origem: Path, lote: int = 1000) -> dict:
+    """
+    Importa o catálogo de um ficheiro JSONL ou de uma pasta de ficheiros CSV.
+
+    Returns:
+        Os registos gravados e ignorados (chaves estrangeiras desconhecidas) por
+        tipo e a duração, em segundos.
+    """
+    inicio = time.perf_counter()
+    importador = Importador(lote)
+    for registo in ler(origem):
+        importador.adicionar(registo)
+    importador.terminar()
+    return {
+        "gravados": dict(importador.gravados),
+        "ignorados": dict(importador.ignorados),
+        "segundos": time.perf_counter() - inicio,
+    }
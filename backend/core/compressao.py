@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Compressão das respostas (`Content-Encoding`), negociada com `Accept-Encoding`.
+
+Os codificadores disponíveis são o gzip (biblioteca padrão) e, se as
+bibliotecas estiverem instaladas, o brotli (`br`, pacote `brotli`) e o zstd
+(pacote `zstandard`). De entre os que o cliente aceita, é usado o primeiro de
+`settings.RESPONSE_COMPRESSION_ENCODINGS` (a ordem de preferência do
+servidor); os valores `q` do cliente só excluem codificações (`q=0`).
+
+O `CompressaoMiddleware` (em `middleware.py`) comprime as respostas com pelo
+menos `RESPONSE_COMPRESSION_MIN_SIZE` bytes: abaixo disso, os cabeçalhos e o
+custo da compressão não compensam.
+"""
+from __future__ import annotations
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - opcional
+    zstandard = None
+
+
+def _gzip(dados: bytes, nivel: int) -> bytes:
+    # `mtime=0`: o mesmo conteúdo dá sempre os mesmos bytes.
+    return gzip.compress(dados, compresslevel=nivel, mtime=0)
+
+
+def _brotli(dados: bytes, nivel: int) -> bytes:
+    return brotli.compress(dados, quality=nivel)
+
+
+def _zstd(dados: bytes, nivel: int) -> bytes:
+    return zstandard.ZstdCompressor(level=nivel).compress(dados)
+
+
+# Codificação -> (função, nível por defeito). O nível por defeito privilegia a
+# velocidade: as respostas são comprimidas a cada pedido.
+CODIFICADORES = {"gzip": (_gzip, 6)}
+if brotli is not None:
+    CODIFICADORES["br"] = (_brotli, 4)
+if zstandard is not None:
+    CODIFICADORES["zstd"] = (_zstd, 3)
+
+
+def aceites(accept_encoding: str) -> dict[str, float]:
+    """
+    As codificações de um cabeçalho `Accept-Encoding`, com os respetivos `q`.
+
+    Ex: `"gzip, br;q=0.8, zstd;q=0"` -> `{"gzip": 1.0, "br": 0.8, "zstd": 0.0}`.
+    """
+    resultado = {}
+    for parte in accept_encoding.split(","):
+        nome, _, parametros = parte.partition(";")
+        nome = nome.strip().lower()
+        if not nome:
+            continue
+        q = 1.0
+        for parametro in parametros.split(";"):
+            chave, _, valor = parametro.partition("=")
+            if chave.strip().lower() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        resultado[nome] = q
+    return resultado
+
+
+def escolher(accept_encoding: str, preferencia) -> str | None:
+    """
+    A codificação a usar, ou None se o cliente não aceitar nenhuma disponível.
+
+    Args:
+        accept_encoding: O cabeçalho `Accept-Encoding` do pedido.
+        preferencia: As codificações por ordem de preferência do servidor;
+            as que não estiverem disponíveis (`CODIFICADORES`) são ignoradas.
+    """
+    cliente = aceites(accept_encoding)
+    for nome in preferencia:
+        if nome not in CODIFICADORES:
+            continue
+        if cliente.get(nome, cliente.get("*", 0.0)) > 0:
+            return nome
+    return None
+
+
+def comprimir(nome: str, dados: bytes, nivel: int | None = None) -> bytes:
+    funcao, por_defeito = CODIFICADORES[nome]
+    return funcao(dados, por_defeito if nivel is None else nivel)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Pedidos GET condicionais (ETag / Last-Modified) para os endpoints de leitura.
+
+Os validadores são calculados a partir de `MAX(updated_at)` e `COUNT(*)` do
+queryset que define a resposta, numa única query de agregação, sem carregar
+nem serializar as linhas. Se o cliente (ou a CDN) já tiver a versão atual,
+recebe `304 Not Modified` sem corpo e a view não chega a ser executada.
+
+O `COUNT` apanha remoções (que não alteram o `MAX(updated_at)` das linhas que
+ficam); criações e alterações mudam o `MAX(updated_at)`. Pela mesma razão, as
+coleções só têm `ETag`: um `Last-Modified` igual a `MAX(updated_at)` não muda
+quando uma linha é removida, e um pedido só com `If-Modified-Since` receberia
+um 304 para uma listagem que mudou.
+
+Nas coleções das views com `VersionedCacheMixin`, o `ETag` vem dos contadores
+de versão da cache (ver `caching.py`), lidos da cache sem nenhuma query: os
+sinais incrementam-nos em todas as escritas de que a resposta depende. Uma
+escrita desfeita em seguida (ex: criar e apagar um filme) também muda o `ETag`,
+o que só custa uma resposta 200 a mais. Quando as leituras vão para uma réplica,
+que pode ainda não ter a escrita que mudou a versão, usa-se a query de agregação,
+calculada sobre os mesmos dados que a resposta.
+"""
+from __future__ import annotations
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .caching import VersionedCacheMixin, aobter_versoes, obter_versoes
+from .replicas import replica_atual
+
+
+def _agregados() -> dict:
+    return {"ultima": Max("updated_at"), "total": Count("pk")}
+
+
+def _validadores(agregados: dict, extra, colecao: bool) -> tuple:
+    ultima = agregados["ultima"]
+    base = repr((ultima.isoformat() if ultima else None, agregados["total"], extra))
+    etag = f'W/"{hashlib.md5(base.encode("utf-8")).hexdigest()}"'
+    return etag, None if colecao else ultima
+
+
+def calcular_validadores(queryset, *extra, colecao: bool = True):
+    """
+    Devolve `(etag, last_modified)` para o conteúdo descrito por `queryset`.
+
+    Args:
+        queryset: O queryset (já filtrado) cujas linhas definem a resposta.
+        *extra: Outros valores que distinguem a resposta (ex: parâmetros, formato).
+        colecao: Se a resposta é uma coleção, sem `Last-Modified` (ver acima);
+            False para um único objeto (ex: `retrieve`).
+
+    Returns:
+        Um ETag fraco e o instante da última alteração (None para as coleções
+        e se não houver linhas).
+    """
+    return _validadores(queryset.order_by().aggregate(**_agregados()), extra, colecao)
+
+
+async def acalcular_validadores(queryset, *extra, colecao: bool = True):
+    """Versão assíncrona de `calcular_validadores` (os mesmos validadores)."""
+    return _validadores(await queryset.order_by().aaggregate(**_agregados()), extra, colecao)
+
+
+def validadores_objeto(obj, *extra):
+    """
+    Devolve `(etag, last_modified)` para um único objeto já carregado.
+
+    Equivalente a `calcular_validadores` sobre um queryset com essa linha, mas
+    sem uma query de agregação: usa o `updated_at` do próprio objeto.
+    """
+    ultima = obj.updated_at
+    base = repr((ultima.isoformat() if ultima else None, 1, extra))
+    etag = f'W/"{hashlib.md5(base.encode("utf-8")).hexdigest()}"'
+    return etag, ultima
+
+
+def validadores_versoes(versoes, *extra):
+    """
+    Devolve `(etag, None)` para uma coleção a partir das versões dos contadores
+    de que depende (ver `caching.obter_versoes`), sem nenhuma query.
+    """
+    base = repr((tuple(versoes), extra))
+    return f'W/"{hashlib.md5(base.encode("utf-8")).hexdigest()}"', None
+
+
+def resposta_condicional(request, etag, ultima):
+    """Devolve uma resposta 304 se os validadores do pedido coincidirem, ou None."""
+    last_modified = int(ultima.timestamp()) if ultima else None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def aplicar_validadores(response, etag, ultima):
+    """Acrescenta os cabeçalhos `ETag` e `Last-Modified` a uma resposta 200."""
+    if response.status_code == 200:
+        response["ETag"] = etag
+        if ultima:
+            response["Last-Modified"] = http_date(ultima.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para ViewSets que responde a GETs condicionais em `list` e `retrieve`.
+
+    As subclasses indicam, em `get_conditional_queryset`, o queryset cujas linhas
+    definem a resposta da ação atual (ou None para a servir sempre por inteiro,
+    ex: respostas personalizadas para o utilizador). Podem também redefinir
+    `get_conditional_validators` (e `aget_conditional_validators`, usado pelas
+    ações assíncronas de `views_async.py`) para calcular os validadores de outra forma.
+
+    Com `VersionedCacheMixin`, o `ETag` das coleções vem de `get_cache_versions`
+    (ver acima); o queryset só é usado para decidir se há validadores.
+    """
+
+    def get_conditional_queryset(self):
+        if self.action == "retrieve":
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            return self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.filter_queryset(self.get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        return self._resposta_condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._resposta_condicional(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._aresposta_condicional(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._aresposta_condicional(super().aretrieve, request, *args, **kwargs)
+
+    def get_conditional_validators(self, *extra):
+        """Devolve `(etag, last_modified)` da resposta atual, ou None para a servir sempre."""
+        queryset = self.get_conditional_queryset()
+        if queryset is None:
+            return None
+        if self._validadores_por_versoes():
+            return validadores_versoes(obter_versoes(self.get_cache_versions()), *extra)
+        return calcular_validadores(queryset, *extra, colecao=self.action != "retrieve")
+
+    async def aget_conditional_validators(self, *extra):
+        """Versão assíncrona de `get_conditional_validators`."""
+        queryset = self.get_conditional_queryset()
+        if queryset is None:
+            return None
+        if self._validadores_por_versoes():
+            return validadores_versoes(await aobter_versoes(self.get_cache_versions()), *extra)
+        return await acalcular_validadores(queryset, *extra, colecao=self.action != "retrieve")
+
+    def _validadores_por_versoes(self) -> bool:
+        return self.action != "retrieve" and isinstance(self, VersionedCacheMixin) and replica_atual() is None
+
+    def _extra(self, request) -> tuple:
+        return self.action, sorted(request.query_params.lists()), request.accepted_renderer.format
+
+    def _resposta_condicional(self, handler, request, *args, **kwargs):
+        validadores = self.get_conditional_validators(*self._extra(request))
+        if validadores is None:
+            return handler(request, *args, **kwargs)
+
+        etag, ultima = validadores
+        nao_modificado = resposta_condicional(request, etag, ultima)
+        if nao_modificado is not None:
+            return nao_modificado
+        return aplicar_validadores(handler(request, *args, **kwargs), etag, ultima)
+
+    async def _aresposta_condicional(self, handler, request, *args, **kwargs):
+        """Versão assíncrona de `_resposta_condicional`, para as views de `views_async.py`."""
+        validadores = await self.aget_conditional_validators(*self._extra(request))
+        if validadores is None:
+            return await handler(request, *args, **kwargs)
+
+        etag, ultima = validadores
+        nao_modificado = resposta_condicional(request, etag, ultima)
+        if nao_modificado is not None:
+            return nao_modificado
+        return aplicar_validadores(await handler(request, *args, **kwargs), etag, ultima)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Esquema OpenAPI pré-gerado, em vez de gerado a cada pedido.
+
+O `SpectacularAPIView` percorre todas as views e serializers a cada pedido a
+`/api/schema/`, o que é lento e pesado quando a documentação ou os geradores de
+clientes o pedem repetidamente. O comando `build_openapi_schema` gera-o uma vez
+(no build ou no arranque) para `settings.OPENAPI_SCHEMA_DIR`:
+
+- `openapi-<versão>.json` e `openapi-<versão>.json.gz` (já comprimido);
+- `openapi-<versão>.meta.json`, com o ETag do conteúdo e a impressão digital
+  das rotas (`impressao_rotas`) no momento da geração.
+
+`esquema_view` serve o ficheiro com ETag (304 sem corpo) e sem introspeção; se
+não houver artefacto, ou o pedido tiver parâmetros (ex: `?format=yaml`), o
+esquema é gerado como antes. A verificação `verificar_artefacto` (em
+`manage.py check --deploy`) falha se o artefacto não corresponder às rotas
+atuais. Só corre com `--deploy`: os outros comandos (ex: `migrate`, executado
+antes de o esquema ser gerado) não dependem do artefacto.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core import checks
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.urls import URLResolver, get_resolver
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.timezone import now
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+CONTENT_TYPE = "application/vnd.oai.openapi+json"
+
+_aceita_gzip = re.compile(r"\bgzip\b")
+
+# O artefacto lido do disco: ((ficheiro de metadados, mtime), metadados, json, json.gz).
+_carregado: tuple | None = None
+
+
+class JWTCookieScheme(SimpleJWTScheme):
+    """Documenta `JWTCookieAuthentication` como a autenticação JWT do simplejwt (Bearer)."""
+    target_class = "backend.core.authentication.JWTCookieAuthentication"
+
+
+def caminhos(pasta=None) -> dict[str, Path]:
+    """Os ficheiros do artefacto da versão atual da API."""
+    pasta = Path(pasta or settings.OPENAPI_SCHEMA_DIR)
+    base = f"openapi-{settings.SPECTACULAR_SETTINGS.get('VERSION', 'v1')}"
+    return {
+        "json": pasta / f"{base}.json",
+        "gzip": pasta / f"{base}.json.gz",
+        "meta": pasta / f"{base}.meta.json",
+    }
+
+
+def _rotas(padroes, prefixo: str = ""):
+    for padrao in padroes:
+        if isinstance(padrao, URLResolver):
+            yield from _rotas(padrao.url_patterns, prefixo + str(padrao.pattern))
+            continue
+        callback = padrao.callback
+        view = getattr(callback, "cls", None) or getattr(callback, "view_class", None) or callback
+        acoes = sorted((getattr(callback, "actions", None) or {}).items())
+        yield prefixo + str(padrao.pattern), f"{view.__module__}.{view.__qualname__}", acoes
+
+
+def impressao_rotas() -> str:
+    """
+    Um hash das rotas atuais (padrão, view e ações de cada URL) e da versão da API.
+
+    Muda quando um endpoint é criado, removido ou passa para outra view; não
+    apanha alterações só nos serializers (o comando gera sempre o esquema completo).
+    """
+    rotas = sorted(_rotas(get_resolver().url_patterns))
+    base = repr((settings.SPECTACULAR_SETTINGS.get("VERSION"), rotas))
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def gerar(pasta=None) -> dict:
+    """
+    Gera o esquema OpenAPI (JSON) e grava o artefacto em `pasta`.
+
+    Returns:
+        Os metadados gravados (`etag`, `rotas`, `gerado_em`, `bytes`, `bytes_gzip`).
+    """
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+
+    esquema = SchemaGenerator().get_schema(request=None, public=True)
+    conteudo = OpenApiJsonRenderer().render(esquema, renderer_context={})
+    # `mtime=0`: o mesmo esquema dá sempre os mesmos bytes comprimidos.
+    comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+    meta = {
+        "etag": f'"{hashlib.sha256(conteudo).hexdigest()[:32]}"',
+        "rotas": impressao_rotas(),
+        "gerado_em": now().isoformat(),
+        "bytes": len(conteudo),
+        "bytes_gzip": len(comprimido),
+    }
+
+    destino = caminhos(pasta)
+    destino["json"].parent.mkdir(parents=True, exist_ok=True)
+    # Os metadados são gravados por último: um artefacto a meio não é servido.
+    for nome, dados in (("json", conteudo), ("gzip", comprimido), ("meta", json.dumps(meta, indent=2).encode())):
+        temporario = destino[nome].with_suffix(destino[nome].suffix + ".tmp")
+        temporario.write_bytes(dados)
+        os.replace(temporario, destino[nome])
+    return meta
+
+
+def carregar():
+    """
+    O artefacto atual, `(metadados, json, json_gzip)`, ou None se não existir.
+
+    Fica em memória; só é lido outra vez do disco se o ficheiro de metadados mudar.
+    """
+    global _carregado
+    ficheiros = caminhos()
+    try:
+        mtime = ficheiros["meta"].stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    chave = (ficheiros["meta"], mtime)
+    if _carregado is None or _carregado[0] != chave:
+        meta = json.loads(ficheiros["meta"].read_bytes())
+        _carregado = (chave, meta, ficheiros["json"].read_bytes(), ficheiros["gzip"].read_bytes())
+    return _carregado[1:]
+
+
+def esquema_view(request):
+    """`GET /api/schema/`: o artefacto, com ETag e gzip, ou o esquema gerado no momento."""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    artefacto = carregar() if not request.GET else None
+    if artefacto is None:
+        from drf_spectacular.views import SpectacularAPIView
+        return SpectacularAPIView.as_view()(request)
+
+    meta, conteudo, comprimido = artefacto
+    nao_modificado = get_conditional_response(request, etag=meta["etag"])
+    if nao_modificado is not None:
+        patch_vary_headers(nao_modificado, ("Accept-Encoding",))
+        return nao_modificado
+    if _aceita_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+        response = HttpResponse(comprimido, content_type=CONTENT_TYPE)
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(conteudo, content_type=CONTENT_TYPE)
+    response["ETag"] = meta["etag"]
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+@checks.register("openapi", deploy=True)
+def verificar_artefacto(app_configs=None, **kwargs):
+    """
+    Falha se o esquema pré-gerado não corresponder às rotas atuais.
+
+    Sem artefacto, só falha com `OPENAPI_SCHEMA_REQUIRED` (por defeito, fora do
+    modo DEBUG); `/api/schema/` gera então o esquema a cada pedido.
+    """
+    ficheiros = caminhos()
+    dica = "Execute `python manage.py build_openapi_schema`."
+    if not ficheiros["meta"].exists():
+        if settings.OPENAPI_SCHEMA_REQUIRED:
+            return [checks.Error(f"Não há esquema OpenAPI pré-gerado em {ficheiros['json']}.", hint=dica, id="core.E001")]
+        return []
+    try:
+        meta = json.loads(ficheiros["meta"].read_bytes())
+    except ValueError:
+        return [checks.Error(f"Os metadados de {ficheiros['json']} são inválidos.", hint=dica, id="core.E002")]
+    if meta.get("rotas") != impressao_rotas():
+        return [checks.Error(
+            f"O esquema OpenAPI em {ficheiros['json']} está desatualizado em relação às rotas (urls.py).",
+            hint=dica, id="core.E003",
+        )]
+    return []
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Contagens de filmes por faceta (género, década e poster), materializadas.
+
+Contar os filmes de cada género ou década a cada pedido é um `GROUP BY` sobre
+`Filme` e a tabela da relação `generos`. Em vez disso, as contagens ficam na
+tabela `FacetaFilme` e são mantidas com incrementos `F()` pelos sinais de
+`Filme` e da relação com `Genero` (ver `signals.py`): cada escrita altera
+apenas as linhas das facetas do filme afetado.
+
+As escritas que não emitem sinais (`bulk_create`, `QuerySet.update`, SQL
+direto) devem chamar `reconstruir` no fim, como faz o comando `rebuild_facets`.
+"""
+from __future__ import annotations
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models.faceta import FacetaFilme
+from .models.filme import Filme
+from .models.taxonomia import Genero
+
+Tipo = FacetaFilme.Tipo
+
+
+def decada(ano: int | None) -> str | None:
+    """A chave da década de um ano (ex: 1994 -> '1990'), ou None sem ano."""
+    return None if ano is None else str(ano // 10 * 10)
+
+
+def chaves_filme(ano: int | None, poster: str | None) -> list[tuple[str, str]]:
+    """As facetas de um filme que não dependem dos géneros."""
+    chaves = [(Tipo.POSTER, "1" if poster else "0")]
+    if ano is not None:
+        chaves.append((Tipo.DECADA, decada(ano)))
+    return chaves
+
+
+def ajustar(deltas: Counter) -> None:
+    """
+    Soma a cada faceta `(tipo, chave)` a variação indicada, com um `UPDATE` por faceta.
+
+    As facetas que ainda não existem são criadas a zero antes de incrementadas,
+    pelo que duas escritas concorrentes não perdem contagens.
+    """
+    for (tipo, chave), delta in deltas.items():
+        if not delta:
+            continue
+        linhas = FacetaFilme.objects.filter(tipo=tipo, chave=chave)
+        if not linhas.update(total=F("total") + delta):
+            FacetaFilme.objects.bulk_create([FacetaFilme(tipo=tipo, chave=chave)], ignore_conflicts=True)
+            linhas.update(total=F("total") + delta)
+
+
+def reconstruir() -> int:
+    """
+    Recalcula todas as contagens a partir dos filmes, numa transação.
+
+    Returns:
+        O número de facetas gravadas.
+    """
+    contagens = Counter()
+    anos = Filme.objects.filter(ano_lancamento__isnull=False).values("ano_lancamento").annotate(n=Count("id"))
+    for linha in anos.order_by():
+        contagens[(Tipo.DECADA, decada(linha["ano_lancamento"]))] += linha["n"]
+    posters = Filme.objects.aggregate(com=Count("id", filter=~Q(poster="")), total=Count("id"))
+    contagens[(Tipo.POSTER, "1")] = posters["com"]
+    contagens[(Tipo.POSTER, "0")] = posters["total"] - posters["com"]
+    por_genero = Filme.generos.through.objects.values("genero_id").annotate(n=Count("filme_id")).order_by()
+    for linha in por_genero:
+        contagens[(Tipo.GENERO, str(linha["genero_id"]))] = linha["n"]
+
+    with transaction.atomic():
+        FacetaFilme.objects.all().delete()
+        FacetaFilme.objects.bulk_create(
+            [FacetaFilme(tipo=tipo, chave=chave, total=total) for (tipo, chave), total in contagens.items()]
+        )
+    return len(contagens)
+
+
+def contagens() -> dict:
+    """
+    Devolve as contagens de todo o catálogo, prontas a incluir numa resposta.
+
+    São duas queries: as facetas e os géneros referidos (para o slug e o nome).
+    As facetas a zero são omitidas.
+    """
+    linhas = FacetaFilme.objects.filter(total__gt=0).values_list("tipo", "chave", "total")
+    por_tipo = {tipo: {} for tipo in Tipo.values}
+    for tipo, chave, total in linhas:
+        por_tipo[tipo][chave] = total
+
+    totais_genero = por_tipo[Tipo.GENERO]
+    generos = Genero.objects.filter(pk__in=[int(c) for c in totais_genero]).values_list("pk", "slug", "nome")
+    return {
+        "generos": sorted(
+            ({"slug": slug, "nome": nome, "total": totais_genero[str(pk)]} for pk, slug, nome in generos),
+            key=lambda g: (-g["total"], g["slug"]),
+        ),
+        "decadas": [
+            {"decada": int(chave), "total": total}
+            for chave, total in sorted(por_tipo[Tipo.DECADA].items(), key=lambda item: int(item[0]))
+        ],
+        "com_poster": {
+            "true": por_tipo[Tipo.POSTER].get("1", 0),
+            "false": por_tipo[Tipo.POSTER].get("0", 0),
+        },
+    }
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Escritas nas listas pessoais (watchlist e favoritos) com uma única instrução SQL.
+
+Adicionar filmes é um `INSERT ... SELECT ... ON CONFLICT DO NOTHING` e remover
+é um `DELETE` com os filmes escolhidos por subquery sobre o slug. Cada operação
+é uma só ida à base de dados, não lê o filme antes de escrever e é idempotente:
+dois pedidos simultâneos para o mesmo filme (ex: um duplo clique) não geram um
+`IntegrityError`, porque o conflito com a restrição única é resolvido pela
+própria base de dados.
+
+As linhas inseridas e apagadas são devolvidas com `RETURNING` (PostgreSQL e
+SQLite >= 3.35), para registar os eventos no ranking de tendências depois do
+commit (ver `tendencias.py`), sem queries adicionais na escrita. Os contadores
+da biblioteca do utilizador (ver `biblioteca.py`) são ajustados da mesma forma,
+e as remoções são registadas para as recomendações (ver `recomendacoes.py`).
+"""
+from __future__ import annotations
+
+import datetime
+
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import biblioteca, recomendacoes, tendencias
+from .models.filme import Filme
+
+# Motores com `INSERT ... ON CONFLICT DO NOTHING` (SQLite >= 3.24).
+MOTORES_ON_CONFLICT = ("postgresql", "sqlite")
+
+
+def adicionar(modelo, utilizador_id: int, slugs) -> int:
+    """
+    Adiciona os filmes com os `slugs` indicados à lista `modelo` do utilizador.
+
+    Args:
+        modelo: `Watchlist` ou `Favorito`.
+        utilizador_id: O id do dono da lista.
+        slugs: Os slugs dos filmes; os que não existem são ignorados.
+
+    Returns:
+        O número de filmes efetivamente adicionados (os que já estavam na
+        lista não contam).
+    """
+    slugs = list(dict.fromkeys(slugs))
+    if not slugs:
+        return 0
+    conn = connections[router.db_for_write(modelo)]
+    if conn.vendor not in MOTORES_ON_CONFLICT:
+        return _adicionar_generico(modelo, utilizador_id, slugs)
+
+    qn = conn.ops.quote_name
+    agora = timezone.now()
+    marcadores = ", ".join(["%s"] * len(slugs))
+    sql = (
+        f"INSERT INTO {qn(modelo._meta.db_table)} (utilizador_id, filme_id, created_at) "
+        f"SELECT %s, id, %s FROM {qn(Filme._meta.db_table)} WHERE slug IN ({marcadores}) "
+        f"ON CONFLICT (utilizador_id, filme_id) DO NOTHING"
+    )
+    retorno = conn.features.can_return_rows_from_bulk_insert
+    if retorno:
+        sql += " RETURNING filme_id"
+    parametros = [utilizador_id, modelo._meta.get_field("created_at").get_db_prep_value(agora, conn), *slugs]
+    with conn.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        if not retorno:
+            biblioteca.agendar(modelo, utilizador_id, cursor.rowcount)
+            return cursor.rowcount
+        filmes = [linha[0] for linha in cursor.fetchall()]
+    tendencias.agendar((f, tendencias.PESOS_LISTA[modelo], agora) for f in filmes)
+    biblioteca.agendar(modelo, utilizador_id, len(filmes))
+    return len(filmes)
+
+
+def remover(modelo, utilizador_id: int, slugs) -> int:
+    """
+    Remove os filmes com os `slugs` indicados da lista `modelo` do utilizador.
+
+    Returns:
+        O número de filmes efetivamente removidos.
+    """
+    slugs = list(dict.fromkeys(slugs))
+    if not slugs:
+        return 0
+    conn = connections[router.db_for_write(modelo)]
+    qn = conn.ops.quote_name
+    marcadores = ", ".join(["%s"] * len(slugs))
+    sql = (
+        f"DELETE FROM {qn(modelo._meta.db_table)} WHERE utilizador_id = %s AND filme_id IN "
+        f"(SELECT id FROM {qn(Filme._meta.db_table)} WHERE slug IN ({marcadores}))"
+    )
+    retorno = conn.features.can_return_rows_from_bulk_insert
+    if retorno:
+        sql += " RETURNING filme_id, created_at"
+    with conn.cursor() as cursor:
+        cursor.execute(sql, [utilizador_id, *slugs])
+        if not retorno:
+            biblioteca.agendar(modelo, utilizador_id, -cursor.rowcount)
+            if cursor.rowcount:
+                recomendacoes.agendar_remocoes(Filme.objects.filter(slug__in=slugs).values_list("pk", flat=True))
+            return cursor.rowcount
+        removidos = cursor.fetchall()
+    peso = -tendencias.PESOS_LISTA[modelo]
+    tendencias.agendar((f, peso, _data_hora(quando)) for f, quando in removidos)
+    recomendacoes.agendar_remocoes(f for f, _ in removidos)
+    biblioteca.agendar(modelo, utilizador_id, -len(removidos))
+    return len(removidos)
+
+
+def _data_hora(valor):
+    """Converte um `created_at` lido em SQL direto (texto em SQLite) num datetime com fuso."""
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor, datetime.timezone.utc)
+    return valor
+
+
+def _adicionar_generico(modelo, utilizador_id: int, slugs: list[str]) -> int:
+    """Alternativa (não atómica) para motores sem `ON CONFLICT`."""
+    ids = set(Filme.objects.filter(slug__in=slugs).values_list("id", flat=True))
+    existentes = set(
+        modelo.objects.filter(utilizador_id=utilizador_id, filme_id__in=ids).values_list("filme_id", flat=True)
+    )
+    agora = timezone.now()
+    novos = [modelo(utilizador_id=utilizador_id, filme_id=i) for i in ids - existentes]
+    modelo.objects.bulk_create(novos, ignore_conflicts=True)
+    tendencias.agendar((n.filme_id, tendencias.PESOS_LISTA[modelo], agora) for n in novos)
+    biblioteca.agendar(modelo, utilizador_id, len(novos))
+    return len(novos)
@@ -0,0 +1,110 @@
+# backend/core/management/commands/bench_api_sessions.py
+"""
+Mede o custo por pedido das sessões do Django nos pedidos à API, com todos os
+middlewares (cliente de testes do Django), em três configurações:
+
+- `db`: sessões na base de dados, carregadas em todos os pedidos à API (o
+  comportamento anterior a `API_SESSIONLESS`);
+- `cookie`: sessões numa cookie assinada (`signed_cookies`);
+- `sem_sessao`: sessões na base de dados e `API_SESSIONLESS` (a configuração
+  por defeito).
+
+Cada configuração é medida para pedidos anónimos, anónimos com a cookie de
+sessão do admin, com um JWT e com um JWT e a cookie de sessão. Os dados são
+criados numa transação que é sempre revertida:
+
+    python manage.py bench_api_sessions --repeat 500
+"""
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.core.models.filme import Filme
+
+CONFIGURACOES = {
+    'db': {'API_SESSIONLESS': False, 'SESSION_ENGINE': 'django.contrib.sessions.backends.db'},
+    'cookie': {'API_SESSIONLESS': False, 'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'},
+    'sem_sessao': {'API_SESSIONLESS': True, 'SESSION_ENGINE': 'django.contrib.sessions.backends.db'},
+}
+
+PEDIDOS = ('anonimo', 'anonimo_sessao', 'jwt', 'jwt_sessao')
+
+
+class _Reverter(Exception):
+    """Usada para reverter a transação com os dados sintéticos."""
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo das sessões e das mensagens do Django por pedido à API, com e sem API_SESSIONLESS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/filmes/{filme}/status/', help='Caminho pedido (`{filme}` é um slug).')
+        parser.add_argument('--repeat', type=int, default=200, help='Pedidos por medição.')
+        parser.add_argument('--output', help='Ficheiro onde gravar o relatório JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                relatorio = self._medir(options['path'], max(1, options['repeat']))
+                raise _Reverter
+        except _Reverter:
+            pass
+
+        for nome, pedidos in relatorio.items():
+            for pedido, r in pedidos.items():
+                self.stdout.write(
+                    f"{nome:<11} {pedido:<15} {r['status']} {r['queries']:>2} queries  "
+                    f"p50 {r['p50_ms']:7.3f} ms  p95 {r['p95_ms']:7.3f} ms  vary-cookie {r['vary_cookie']}"
+                )
+        if options['output']:
+            destino = Path(options['output'])
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_text(json.dumps(relatorio, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {destino}.'))
+
+    def _medir(self, caminho: str, repeticoes: int) -> dict:
+        filme = Filme.objects.create(titulo='Bench Sessões', slug='bench-sessoes')
+        admin = get_user_model().objects.create_user(username='bench-sessoes', is_staff=True)
+        token = str(AccessToken.for_user(admin))
+        url = caminho.format(filme=filme.slug)
+
+        relatorio = {}
+        for nome, definicoes in CONFIGURACOES.items():
+            with override_settings(ALLOWED_HOSTS=['testserver'], **definicoes):
+                relatorio[nome] = {}
+                for pedido in PEDIDOS:
+                    # Um cliente por medição: os middlewares são carregados com as definições em vigor.
+                    cliente = Client()
+                    if pedido.endswith('_sessao'):
+                        cliente.force_login(admin)
+                    cabecalhos = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if pedido.startswith('jwt') else {}
+                    relatorio[nome][pedido] = self._pedidos(cliente, url, cabecalhos, repeticoes)
+        return relatorio
+
+    def _pedidos(self, cliente: Client, url: str, cabecalhos: dict, repeticoes: int) -> dict:
+        cliente.get(url, **cabecalhos)  # Aquecimento (middlewares, caches).
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            resposta = cliente.get(url, **cabecalhos)
+        total_queries = len(queries)
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            cliente.get(url, **cabecalhos)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos.sort()
+        return {
+            'status': resposta.status_code,
+            'queries': total_queries,
+            'vary_cookie': 'cookie' in resposta.get('Vary', '').lower(),
+            'p50_ms': round(statistics.median(tempos), 3),
+            'p95_ms': round(tempos[min(int(0.95 * len(tempos)), len(tempos) - 1)], 3),
+        }
@@ -0,0 +1,82 @@
+# backend/core/management/commands/bench_filme_list.py
+"""
+Compara o tempo de serialização da listagem de filmes entre o
+`FilmeListSerializer` (DRF, instâncias + `prefetch_related`) e o
+`FilmeListRapidoSerializer` (`.values()` + géneros numa só query).
+
+Os dados são sintéticos e criados numa transação que é sempre revertida, pelo
+que o comando pode ser executado sobre qualquer base de dados.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.core.models.filme import Filme
+from backend.core.models.taxonomia import Genero
+from backend.core.serializers import FilmeListRapidoSerializer, FilmeListSerializer
+
+
+class _Reverter(Exception):
+    """Usada para reverter a transação com os dados sintéticos."""
+
+
+class Command(BaseCommand):
+    help = 'Mede a serialização da listagem de filmes (DRF vs. caminho rápido) para vários tamanhos de página.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,100,1000', help='Tamanhos de página, separados por vírgulas.')
+        parser.add_argument('--repeat', type=int, default=20, help='Repetições por medição.')
+
+    def handle(self, *args, **options):
+        tamanhos = [int(t) for t in options['sizes'].split(',') if t.strip()]
+        try:
+            with transaction.atomic():
+                ids = self._criar_dados(max(tamanhos))
+                for tamanho in tamanhos:
+                    self._medir(ids[:tamanho], options['repeat'])
+                raise _Reverter
+        except _Reverter:
+            pass
+
+    def _criar_dados(self, total: int) -> list[int]:
+        generos = Genero.objects.bulk_create(
+            [Genero(nome=f'Bench {i}', slug=f'bench-{i}') for i in range(8)]
+        )
+        filmes = Filme.objects.bulk_create([
+            Filme(
+                titulo=f'Bench {i}', slug=f'bench-{i}', ano_lancamento=1950 + i % 70,
+                media_rating=i % 10, poster=f'https://exemplo.org/{i}.jpg',
+            )
+            for i in range(total)
+        ])
+        Ligacao = Filme.generos.through
+        Ligacao.objects.bulk_create([
+            Ligacao(filme_id=f.id, genero_id=generos[(f.id + j) % len(generos)].id)
+            for f in filmes for j in range(3)
+        ])
+        return [f.id for f in filmes]
+
+    def _medir(self, ids: list[int], repeticoes: int):
+        def drf():
+            queryset = Filme.objects.filter(id__in=ids).prefetch_related('generos')
+            return FilmeListSerializer(queryset, many=True).data
+
+        def rapido():
+            queryset = Filme.objects.filter(id__in=ids).values(*FilmeListRapidoSerializer.campos_values())
+            return FilmeListRapidoSerializer(queryset, many=True).data
+
+        tempos = {}
+        for nome, funcao in (('drf', drf), ('rapido', rapido)):
+            amostras = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                funcao()
+                amostras.append(time.perf_counter() - inicio)
+            tempos[nome] = statistics.median(amostras) * 1000
+
+        self.stdout.write(
+            f"{len(ids):>6} filmes: DRF {tempos['drf']:8.2f} ms | rápido {tempos['rapido']:8.2f} ms | "
+            f"{tempos['drf'] / tempos['rapido']:.1f}x"
+        )
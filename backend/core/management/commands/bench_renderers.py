@@ -0,0 +1,118 @@
+# backend/core/management/commands/bench_renderers.py
+"""
+Mede a renderização e a compressão das respostas da listagem de filmes:
+
+- o tempo de renderização e o tamanho de páginas do `FilmeListSerializer` com
+  o `JSONRenderer` do DRF (biblioteca padrão), o `JSONRapidoRenderer` (orjson)
+  e o `MessagePackRenderer`, se o orjson e o msgpack estiverem instalados;
+- para o JSON, o tempo e o tamanho com cada codificação disponível em
+  `compressao.CODIFICADORES` (gzip, br, zstd).
+
+Os filmes sintéticos têm uma descrição longa, para a medição `detalhe` (as
+mesmas páginas com o `FilmeDetailSerializer`). Os dados são criados numa
+transação que é sempre revertida:
+
+    python manage.py bench_renderers --sizes 20,100,1000 --output .cache/renderers.json
+"""
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from backend.core import compressao, renderers
+from backend.core.models.filme import Filme
+from backend.core.models.taxonomia import Genero
+from backend.core.serializers import FilmeDetailSerializer, FilmeListSerializer
+
+DESCRICAO = (
+    'Numa cidade à beira-mar, uma família de pescadores vê a sua vida mudar quando '
+    'um desconhecido chega com uma proposta que ninguém consegue recusar. '
+) * 8
+
+
+class _Reverter(Exception):
+    """Usada para reverter a transação com os dados sintéticos."""
+
+
+class Command(BaseCommand):
+    help = 'Mede a renderização (JSON, orjson, MessagePack) e a compressão (gzip, br, zstd) da listagem de filmes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,100,1000', help='Tamanhos de página, separados por vírgulas.')
+        parser.add_argument('--repeat', type=int, default=20, help='Repetições por medição.')
+        parser.add_argument('--output', help='Ficheiro onde gravar o relatório JSON.')
+
+    def handle(self, *args, **options):
+        tamanhos = [int(t) for t in options['sizes'].split(',') if t.strip()]
+        repeticoes = max(1, options['repeat'])
+        relatorio = {}
+        try:
+            with transaction.atomic():
+                ids = self._criar_dados(max(tamanhos))
+                for tamanho in tamanhos:
+                    filmes = Filme.objects.filter(id__in=ids[:tamanho]).prefetch_related('generos')
+                    for nome, serializer in (('lista', FilmeListSerializer), ('detalhe', FilmeDetailSerializer)):
+                        dados = serializer(filmes, many=True).data
+                        relatorio[f'{nome}-{tamanho}'] = self._medir(dados, repeticoes)
+                raise _Reverter
+        except _Reverter:
+            pass
+
+        for payload, r in relatorio.items():
+            linhas = [f"{nome} {m['ms']:.3f} ms {m['bytes']} B" for nome, m in r['renderers'].items()]
+            linhas += [f"{nome} {m['ms']:.3f} ms {m['bytes']} B ({m['razao']:.1%})" for nome, m in r['compressao'].items()]
+            self.stdout.write(f"{payload:<14} " + ' | '.join(linhas))
+        if options['output']:
+            destino = Path(options['output'])
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_text(json.dumps(relatorio, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {destino}.'))
+
+    def _criar_dados(self, total: int) -> list[int]:
+        generos = Genero.objects.bulk_create(
+            [Genero(nome=f'Bench {i}', slug=f'bench-{i}') for i in range(8)]
+        )
+        filmes = Filme.objects.bulk_create([
+            Filme(
+                titulo=f'Bench {i}', slug=f'bench-{i}', ano_lancamento=1950 + i % 70,
+                media_rating=i % 10, poster=f'https://exemplo.org/{i}.jpg', descricao=DESCRICAO,
+            )
+            for i in range(total)
+        ])
+        Ligacao = Filme.generos.through
+        Ligacao.objects.bulk_create([
+            Ligacao(filme_id=f.id, genero_id=generos[(f.id + j) % len(generos)].id)
+            for f in filmes for j in range(3)
+        ])
+        return [f.id for f in filmes]
+
+    def _medir(self, dados, repeticoes: int) -> dict:
+        candidatos = {'json': JSONRenderer()}
+        if renderers.orjson is not None:
+            candidatos['orjson'] = renderers.JSONRapidoRenderer()
+        if renderers.msgpack is not None:
+            candidatos['msgpack'] = renderers.MessagePackRenderer()
+
+        resultado = {'renderers': {}, 'compressao': {}}
+        for nome, renderer in candidatos.items():
+            ms, conteudo = self._tempo(lambda: renderer.render(dados), repeticoes)
+            resultado['renderers'][nome] = {'ms': ms, 'bytes': len(conteudo)}
+        json_ = candidatos['json'].render(dados)
+        for codificacao in compressao.CODIFICADORES:
+            ms, comprimido = self._tempo(lambda: compressao.comprimir(codificacao, json_), repeticoes)
+            resultado['compressao'][codificacao] = {
+                'ms': ms, 'bytes': len(comprimido), 'razao': round(len(comprimido) / len(json_), 4),
+            }
+        return resultado
+
+    def _tempo(self, funcao, repeticoes: int):
+        amostras = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            valor = funcao()
+            amostras.append(time.perf_counter() - inicio)
+        return round(statistics.median(amostras) * 1000, 3), valor
@@ -0,0 +1,72 @@
+# backend/core/management/commands/benchmark_api.py
+"""
+Executa o benchmark da API (ver `backend/core/benchmark.py`) e grava um
+relatório JSON com o número de queries e os percentis de latência por endpoint.
+
+Por defeito os dados sintéticos são criados numa transação revertida no fim,
+pelo que o comando pode ser executado sobre a base de dados de desenvolvimento
+(SQLite local ou o PostgreSQL do docker-compose) sem a alterar:
+
+    python manage.py benchmark_api --output .cache/benchmark.json
+    docker compose exec backend python manage.py benchmark_api --filmes 2000
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend.core.benchmark import excedidos, executar, gerar_dados
+
+
+class _Reverter(Exception):
+    """Usada para reverter a transação com os dados sintéticos."""
+
+
+class Command(BaseCommand):
+    help = 'Mede o número de queries e a latência (p50/p95) dos endpoints da API sobre dados sintéticos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filmes', type=int, default=200)
+        parser.add_argument('--generos', type=int, default=12)
+        parser.add_argument('--pessoas', type=int, default=300)
+        parser.add_argument('--creditos', type=int, default=8, help='Créditos por filme.')
+        parser.add_argument('--utilizadores', type=int, default=50)
+        parser.add_argument('--reviews', type=int, default=10, help='Reviews por filme.')
+        parser.add_argument('--repeat', type=int, default=20, help='Pedidos por endpoint.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--com-cache', action='store_true', help='Mantém a cache de respostas ativa.')
+        parser.add_argument('--output', help='Ficheiro onde gravar o relatório JSON (por defeito, a saída padrão).')
+        parser.add_argument('--check', action='store_true', help='Termina com erro se algum endpoint exceder o limite de queries.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                dados = gerar_dados(
+                    filmes=options['filmes'], generos=options['generos'], pessoas=options['pessoas'],
+                    creditos=options['creditos'], utilizadores=options['utilizadores'],
+                    reviews=options['reviews'], seed=options['seed'],
+                )
+                relatorio = executar(repeticoes=options['repeat'], com_cache=options['com_cache'])
+                raise _Reverter
+        except _Reverter:
+            pass
+        relatorio['meta']['dados'] = dados
+
+        texto = json.dumps(relatorio, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['output']:
+            destino = Path(options['output'])
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_text(texto + '\n')
+            for nome, r in relatorio['cenarios'].items():
+                self.stdout.write(
+                    f"{nome:<22} {r['status']} {r['queries']:>3}/{r['max_queries']:<3} queries "
+                    f"p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms"
+                )
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {destino}.'))
+        else:
+            self.stdout.write(texto)
+
+        falhados = excedidos(relatorio)
+        if options['check'] and falhados:
+            raise CommandError(f"Endpoints acima do limite de queries ou com erro: {', '.join(falhados)}.")
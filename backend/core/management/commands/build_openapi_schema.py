@@ -0,0 +1,35 @@
+# backend/core/management/commands/build_openapi_schema.py
+"""
+Gera o esquema OpenAPI da API para `settings.OPENAPI_SCHEMA_DIR` (ver
+`backend/core/esquema.py`), já comprimido, para ser servido em `/api/schema/`
+sem introspeção. Deve ser executado no build da imagem ou antes do arranque:
+
+    python manage.py build_openapi_schema
+    python manage.py build_openapi_schema --check   # só verifica se está atualizado
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.core import esquema
+
+
+class Command(BaseCommand):
+    help = 'Gera o esquema OpenAPI (JSON e JSON comprimido) servido em /api/schema/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Pasta de destino (por defeito, OPENAPI_SCHEMA_DIR).')
+        parser.add_argument('--check', action='store_true',
+                            help='Não grava nada; termina com erro se o esquema não existir ou estiver desatualizado.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            erros = esquema.verificar_artefacto()
+            if erros or not esquema.caminhos()['meta'].exists():
+                raise CommandError(erros[0].msg if erros else 'Não há esquema OpenAPI pré-gerado.')
+            self.stdout.write(self.style.SUCCESS('O esquema OpenAPI está atualizado.'))
+            return
+
+        meta = esquema.gerar(options['output'])
+        destino = esquema.caminhos(options['output'])['json']
+        self.stdout.write(self.style.SUCCESS(
+            f"Esquema gravado em {destino} ({meta['bytes']} bytes, {meta['bytes_gzip']} comprimido, ETag {meta['etag']})."
+        ))
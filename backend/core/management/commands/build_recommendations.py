@@ -0,0 +1,46 @@
+# backend/core/management/commands/build_recommendations.py
+"""
+Treina o modelo de recomendações item-item (ver `backend/core/recomendacoes.py`)
+e grava os vizinhos de cada filme na tabela `FilmeSemelhante`.
+
+Pensado para correr periodicamente (ex: cron):
+
+    python manage.py build_recommendations              # reconstrução completa
+    python manage.py build_recommendations --incremental
+
+A reconstrução incremental recalcula os filmes com interações (reviews,
+favoritos e watchlist) criadas, alteradas ou removidas desde a última execução,
+os que partilham utilizadores com eles e os que os tinham como vizinhos. As
+remoções em SQL direto e as alterações por `QuerySet.update` (que não tocam no
+`updated_at` das reviews) só entram numa reconstrução completa.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from backend.core import recomendacoes
+
+
+class Command(BaseCommand):
+    help = 'Calcula os filmes semelhantes (top-K por cosseno) a partir das reviews, favoritos e watchlist.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=20, help='Vizinhos guardados por filme.')
+        parser.add_argument('--incremental', action='store_true', help='Recalcula só os filmes alterados desde a última execução.')
+        parser.add_argument('--desde', help='Recalcula só os filmes alterados depois desta data (ISO 8601).')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            desde = parse_datetime(options['desde'])
+            if desde is None:
+                raise CommandError('`--desde` tem de ser uma data ISO 8601.')
+        elif options['incremental']:
+            desde = recomendacoes.ultima_construcao()
+            if desde is None:
+                self.stdout.write('  Sem um modelo anterior: a fazer a reconstrução completa.')
+
+        motor = 'SciPy' if recomendacoes.sparse is not None else 'Python'
+        resultado = recomendacoes.construir(k=max(1, options['k']), desde=desde)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomendações calculadas ({motor}): {resultado['filmes']} filmes, {resultado['vizinhos']} vizinhos."
+        ))
@@ -0,0 +1,22 @@
+# backend/core/management/commands/compact_trending.py
+"""
+Compacta o ranking de tendências (ver `backend/core/tendencias.py`): recalcula-o
+a partir dos eventos recentes, com a referência do decaimento no instante atual.
+
+Os eventos são somados ao ranking à medida que acontecem; este comando deve
+correr periodicamente (ex: diariamente, por cron) para limitar os valores
+guardados, retirar os filmes sem eventos recentes e corrigir desvios:
+
+    python manage.py compact_trending
+"""
+from django.core.management.base import BaseCommand
+
+from backend.core import tendencias
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o ranking de tendências a partir das reviews, favoritos e watchlist recentes.'
+
+    def handle(self, *args, **options):
+        total = tendencias.compactar()
+        self.stdout.write(self.style.SUCCESS(f'Ranking de tendências compactado: {total} filmes.'))
@@ -0,0 +1,40 @@
+# backend/core/management/commands/export_catalogue.py
+"""
+Exporta o catálogo (géneros, pessoas, filmes, créditos e vídeos) em stream,
+para um ficheiro JSONL ou uma pasta de ficheiros CSV (ver `backend/core/catalogo.py`):
+
+    python manage.py export_catalogue --output catalogo.jsonl.gz
+    python manage.py export_catalogue --format csv --output catalogo/
+"""
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.core import catalogo
+
+
+class Command(BaseCommand):
+    help = 'Exporta o catálogo para JSONL (um ficheiro) ou CSV (uma pasta), lendo a base de dados por lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', required=True, help='Ficheiro JSONL (.jsonl ou .jsonl.gz) ou pasta para os CSV.')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default=None, help='Por defeito, deduzido do --output.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Registos lidos por query.')
+
+    def handle(self, *args, **options):
+        destino = Path(options['output'])
+        formato = options['format'] or ('jsonl' if '.jsonl' in destino.suffixes else 'csv')
+        if formato == 'jsonl' and destino.is_dir():
+            raise CommandError('Para JSONL, --output tem de ser um ficheiro.')
+
+        inicio = time.perf_counter()
+        total = catalogo.exportar(destino, formato, max(1, options['batch_size']))
+        duracao = time.perf_counter() - inicio
+
+        for tipo in catalogo.TIPOS:
+            self.stdout.write(f'  {tipo:<8} {total[tipo]:>10} registos')
+        n = sum(total.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Exportados {n} registos para {destino} em {duracao:.1f}s ({n / max(duracao, 1e-9):.0f} registos/s).'
+        ))
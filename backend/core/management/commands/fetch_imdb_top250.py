@@ -1,106 +1,307 @@
 # backend/core/management/commands/fetch_imdb_top250.py
-import requests
-import time
+"""
+Importa o Top 250 do IMDb como um pipeline em três fases:
+
+1. Procura: as páginas de detalhe são pedidas em paralelo por um conjunto
+   limitado de threads, com um limite de pedidos por segundo partilhado e
+   novas tentativas com espera exponencial (erros de rede, 429 e 5xx).
+2. Análise: cada página é convertida num dicionário com os dados do filme.
+3. Escrita: os filmes são gravados em lotes com `bulk_create`/`bulk_update`.
+
+Após cada lote gravado, os ids do IMDb processados são guardados num ficheiro
+de checkpoint, para que uma execução interrompida possa continuar onde parou.
+Os filmes cuja página de detalhe falhou são gravados só com os dados da lista
+e ficam fora do checkpoint: a execução seguinte volta a pedir os seus detalhes.
+"""
+import json
+import os
+import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
 from bs4 import BeautifulSoup
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 from django.utils.text import slugify
+from backend.core import facetas
+from backend.core.caching import incrementar_versoes, versao_filme, VERSAO_CATALOGO
 from backend.core.models.filme import Filme
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# Campos reescritos num filme que já existe.
+CAMPOS_ATUALIZADOS = ['media_rating', 'poster', 'backdrop', 'descricao', 'updated_at']
+
+
 def get_high_res_poster_url(image_url: str) -> str:
     if not image_url:
         return ""
     return re.sub(r'\._V1_.*\.jpg', '._V1_.jpg', image_url)
 
+
+def parse_top250(html: str) -> list[dict]:
+    """Extrai os filmes (id, título, ano, rating e URL de detalhe) da lista do Top 250."""
+    soup = BeautifulSoup(html, 'html.parser')
+    filmes = []
+    for movie_item in soup.select('li.ipc-metadata-list-summary-item'):
+        try:
+            title_link_elem = movie_item.select_one('a.ipc-title-link-wrapper')
+            title = title_link_elem.select_one('h3.ipc-title__text').text.strip()
+            href = title_link_elem['href']
+            year_elem = movie_item.select_one('div.cli-title-metadata span.cli-title-metadata-item')
+            rating_elem = movie_item.select_one('span.ipc-rating-star--imdb span.ipc-rating-star--rating')
+            filmes.append({
+                'imdb_id': href.split('/')[2],
+                'titulo': title,
+                'href': href,
+                'ano_lancamento': int(year_elem.text.strip()),
+                'media_rating': float(rating_elem.text.strip().replace(',', '.')),
+            })
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            # Um item com um formato inesperado não impede os restantes.
+            continue
+    return filmes
+
+
+def parse_detalhe(html: str) -> dict:
+    """Extrai a sinopse, o poster e o backdrop da página de detalhe de um filme."""
+    detail_soup = BeautifulSoup(html, 'html.parser')
+    dados = {'descricao': '', 'poster': '', 'backdrop': ''}
+
+    description_elem = detail_soup.select_one('span[data-testid="plot-xl"]')
+    if description_elem:
+        dados['descricao'] = description_elem.text.strip()
+
+    poster_elem = detail_soup.select_one('div[data-testid="hero-media__poster"] img')
+    if poster_elem and poster_elem.get('src'):
+        dados['poster'] = get_high_res_poster_url(poster_elem['src'])
+
+    backdrop_elem = detail_soup.select_one('div[data-testid="hero-media__backdrop"] img')
+    if backdrop_elem and backdrop_elem.get('src'):
+        dados['backdrop'] = get_high_res_poster_url(backdrop_elem['src'])
+    return dados
+
+
+class RateLimiter:
+    """Limita o número de pedidos por segundo, partilhado entre threads."""
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self._lock = threading.Lock()
+        self._proximo = 0.0
+
+    def esperar(self):
+        with self._lock:
+            agora = time.monotonic()
+            espera = max(0.0, self._proximo - agora)
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera:
+            time.sleep(espera)
+
+
+class Fetcher:
+    """
+    Faz pedidos HTTP com limite de ritmo e novas tentativas com espera exponencial.
+
+    Cada thread usa a sua própria `requests.Session`, porque as sessões não são
+    seguras para uso concorrente.
+    """
+
+    def __init__(self, limiter: RateLimiter, tentativas: int = 3, backoff: float = 0.5, timeout: float = 15):
+        self.limiter = limiter
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(HEADERS)
+        return session
+
+    def get(self, url: str) -> str:
+        ultimo_erro = None
+        for tentativa in range(self.tentativas + 1):
+            if tentativa:
+                espera = self.backoff * 2 ** (tentativa - 1) * (1 + random.random() / 2)
+                time.sleep(espera)
+            self.limiter.esperar()
+            try:
+                response = self._session().get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                ultimo_erro = e
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                ultimo_erro = requests.HTTPError(f'{response.status_code} para {url}', response=response)
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    time.sleep(min(int(retry_after), 30))
+                continue
+            response.raise_for_status()
+            return response.text
+        raise ultimo_erro
+
+
+class Checkpoint:
+    """Ficheiro JSON com os ids do IMDb já gravados na execução atual."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.concluidos: set[str] = set()
+        if path.exists():
+            try:
+                self.concluidos = set(json.loads(path.read_text())['concluidos'])
+            except (ValueError, KeyError, TypeError):
+                self.concluidos = set()
+
+    def registar(self, imdb_ids):
+        self.concluidos.update(imdb_ids)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.path.with_suffix('.tmp')
+        temporario.write_text(json.dumps({'concluidos': sorted(self.concluidos)}))
+        # `os.replace` é atómico: uma interrupção nunca deixa um ficheiro truncado.
+        os.replace(temporario, self.path)
+
+    def limpar(self):
+        self.concluidos = set()
+        self.path.unlink(missing_ok=True)
+
+
+def gravar_lote(lote: list[dict]) -> tuple[int, int]:
+    """
+    Grava um lote de filmes com uma leitura, um `bulk_create` e um `bulk_update`.
+
+    Returns:
+        O número de filmes criados e atualizados.
+    """
+    agora = timezone.now()
+    existentes = Filme.objects.in_bulk([d['imdb_id'] for d in lote], field_name='imdb_id')
+    novos, atualizados = [], []
+    for dados in lote:
+        filme = existentes.get(dados['imdb_id'])
+        if filme is None:
+            filme = Filme(
+                imdb_id=dados['imdb_id'],
+                titulo=dados['titulo'],
+                ano_lancamento=dados['ano_lancamento'],
+                slug=slugify(f"{dados['titulo']}-{dados['ano_lancamento']}-{dados['imdb_id']}"),
+            )
+            novos.append(filme)
+        else:
+            atualizados.append(filme)
+        filme.media_rating = dados['media_rating']
+        filme.poster = dados['poster']
+        filme.backdrop = dados['backdrop']
+        filme.descricao = dados['descricao']
+        filme.updated_at = agora
+
+    with transaction.atomic():
+        Filme.objects.bulk_create(novos)
+        Filme.objects.bulk_update(atualizados, CAMPOS_ATUALIZADOS)
+
+    # As operações em massa não emitem sinais: a cache é invalidada aqui.
+    incrementar_versoes(VERSAO_CATALOGO, *[versao_filme(f.slug) for f in novos + atualizados])
+    return len(novos), len(atualizados)
+
+
 class Command(BaseCommand):
     help = 'Procura os 250 filmes melhores classificados do IMDb, incluindo sinopse e poster de alta qualidade.'
 
     IMDB_URL = 'https://www.imdb.com'
-    TOP_250_URL = f'{IMDB_URL}/chart/top/'
+    TOP_250_PATH = '/chart/top/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=self.IMDB_URL, help='URL base do IMDb (ex: um servidor local com páginas gravadas).')
+        parser.add_argument('--workers', type=int, default=8, help='Número de pedidos em paralelo.')
+        parser.add_argument('--rate', type=float, default=5.0, help='Máximo de pedidos por segundo (0 = sem limite).')
+        parser.add_argument('--retries', type=int, default=3, help='Novas tentativas por pedido falhado.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Filmes gravados por lote.')
+        parser.add_argument('--limit', type=int, default=None, help='Processa apenas os primeiros N filmes.')
+        parser.add_argument(
+            '--checkpoint',
+            default=str(Path(settings.BASE_DIR).parent / '.cache' / 'imdb_top250.checkpoint.json'),
+            help='Ficheiro de checkpoint usado para retomar execuções interrompidas.',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint existente e começa do início.')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Iniciando o scraper para o Top 250 do IMDb...'))
-        
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-        })
+        inicio = time.monotonic()
+        base_url = options['base_url'].rstrip('/')
+        fetcher = Fetcher(RateLimiter(options['rate']), tentativas=options['retries'])
+        checkpoint = Checkpoint(Path(options['checkpoint']))
+        if options['restart']:
+            checkpoint.limpar()
 
         try:
-            response = session.get(self.TOP_250_URL)
-            response.raise_for_status()
+            filmes = parse_top250(fetcher.get(f'{base_url}{self.TOP_250_PATH}'))
         except requests.RequestException as e:
             self.stderr.write(self.style.ERROR(f'Erro ao aceder à lista do IMDb: {e}'))
             return
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        movie_items = soup.select('li.ipc-metadata-list-summary-item')
-
-        if not movie_items:
+        if not filmes:
             self.stderr.write(self.style.ERROR('Não foi possível encontrar a lista de filmes. O layout do IMDb pode ter mudado.'))
             return
+        if options['limit']:
+            filmes = filmes[:options['limit']]
 
-        created_count = 0
-        updated_count = 0
-
-        for movie_item in movie_items:
-            try:
-                title_link_elem = movie_item.select_one('a.ipc-title-link-wrapper')
-                title_h3 = title_link_elem.select_one('h3.ipc-title__text')
-                title = title_h3.text.strip()
-                
-                href = title_link_elem['href']
-                imdb_id = href.split('/')[2]
-                detail_url = f"{self.IMDB_URL}{href}"
+        pendentes = [f for f in filmes if f['imdb_id'] not in checkpoint.concluidos]
+        if len(pendentes) < len(filmes):
+            self.stdout.write(f'  A retomar a partir do checkpoint: {len(filmes) - len(pendentes)} filmes já processados.')
 
-                year_elem = movie_item.select_one('div.cli-title-metadata span.cli-title-metadata-item')
-                year = int(year_elem.text.strip())
+        created_count = updated_count = 0
+        lote = []
+        # Os filmes sem detalhes: não entram no checkpoint, para serem repetidos.
+        falhados: set[str] = set()
 
-                rating_elem = movie_item.select_one('span.ipc-rating-star--imdb span.ipc-rating-star--rating')
-                rating = float(rating_elem.text.strip().replace(',', '.'))
+        def gravar():
+            nonlocal created_count, updated_count
+            criados, atualizados = gravar_lote(lote)
+            created_count += criados
+            updated_count += atualizados
+            checkpoint.registar(d['imdb_id'] for d in lote if d['imdb_id'] not in falhados)
+            self.stdout.write(self.style.SUCCESS(f'  [+] Lote gravado: {criados} novos, {atualizados} atualizados.'))
+            lote.clear()
 
-                description, poster_url, backdrop_url = "", "", ""
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futuros = {executor.submit(fetcher.get, f"{base_url}{f['href']}"): f for f in pendentes}
+            for futuro in as_completed(futuros):
+                filme = futuros[futuro]
                 try:
-                    self.stdout.write(f'  - Visitando página de detalhes para "{title}"...')
-                    time.sleep(0.2)
-                    detail_response = session.get(detail_url)
-                    if detail_response.status_code == 200:
-                        detail_soup = BeautifulSoup(detail_response.text, 'html.parser')
-                        
-                        description_elem = detail_soup.select_one('span[data-testid="plot-xl"]')
-                        if description_elem: description = description_elem.text.strip()
-                        
-                        # NOVO SELETOR: Procura pela imagem principal na secção "hero"
-                        poster_elem = detail_soup.select_one('div[data-testid="hero-media__poster"] img')
-                        if poster_elem:
-                            poster_url = get_high_res_poster_url(poster_elem['src'])
-
-                        backdrop_elem = detail_soup.select_one('div[data-testid="hero-media__backdrop"] img')
-                        if backdrop_elem:
-                            backdrop_url = get_high_res_poster_url(backdrop_elem['src'])
-
+                    detalhe = parse_detalhe(futuro.result())
                 except requests.RequestException as e:
-                    self.stderr.write(self.style.WARNING(f'    [!] Falha ao buscar detalhes para "{title}": {e}'))
-
-                filme, created = Filme.objects.get_or_create(
-                    imdb_id=imdb_id,
-                    defaults={'titulo': title, 'ano_lancamento': year, 'slug': slugify(f"{title}-{year}-{imdb_id}")}
-                )
-                
-                filme.media_rating = rating
-                filme.poster = poster_url
-                filme.backdrop = backdrop_url
-                filme.descricao = description
-                filme.save()
-
-                if created: created_count += 1
-                else: updated_count += 1
-                
-                self.stdout.write(self.style.SUCCESS(f'  {"[+]" if created else "[~]"} Processado: {filme.titulo} ({filme.ano_lancamento})'))
-
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f'  [!] Erro fatal ao processar um item: {e}'))
-                continue
+                    # Sem a página de detalhe, o filme é gravado só com os dados da lista.
+                    self.stderr.write(self.style.WARNING(f'    [!] Falha ao buscar detalhes para "{filme["titulo"]}": {e}'))
+                    detalhe = parse_detalhe('')
+                    falhados.add(filme['imdb_id'])
+                lote.append({**filme, **detalhe})
+                if len(lote) >= options['batch_size']:
+                    gravar()
+            if lote:
+                gravar()
 
-        self.stdout.write(self.style.SUCCESS(f'\nScraping concluído! {created_count} novos filmes adicionados, {updated_count} filmes atualizados.'))
\ No newline at end of file
+        if falhados:
+            self.stdout.write(self.style.WARNING(
+                f'  {len(falhados)} filmes sem detalhes ficam no checkpoint para a próxima execução.'
+            ))
+        else:
+            # A execução terminou: a próxima deve começar do início.
+            checkpoint.limpar()
+        # Os lotes são gravados sem sinais: as facetas são recalculadas de uma vez.
+        facetas.reconstruir()
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'\nScraping concluído em {duracao:.1f}s! {created_count} novos filmes adicionados, '
+            f'{updated_count} filmes atualizados, {len(falhados)} sem detalhes.'
+        ))
@@ -0,0 +1,46 @@
+# backend/core/management/commands/import_catalogue.py
+"""
+Importa o catálogo de um ficheiro JSONL ou de uma pasta de ficheiros CSV, no
+formato de `export_catalogue` (ver `backend/core/catalogo.py`):
+
+    python manage.py import_catalogue catalogo.jsonl.gz --batch-size 5000
+    python manage.py import_catalogue catalogo/
+
+Os registos são lidos em stream e gravados em lotes com `bulk_create`
+(`update_conflicts`): os que já existem são atualizados. No fim são
+reconstruídas as facetas e invalidada a cache de respostas, porque as escritas
+em massa não emitem sinais.
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.core import catalogo
+
+
+class Command(BaseCommand):
+    help = 'Importa géneros, pessoas, filmes, créditos e vídeos de JSONL ou CSV, em lotes e com memória constante.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('origem', help='Ficheiro JSONL (.jsonl ou .jsonl.gz) ou pasta com os CSV.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Registos gravados por instrução.')
+
+    def handle(self, *args, **options):
+        origem = Path(options['origem'])
+        if not origem.exists():
+            raise CommandError(f'{origem} não existe.')
+        try:
+            resultado = catalogo.importar(origem, options['batch_size'])
+        except (ValueError, KeyError) as e:
+            raise CommandError(f'Registo inválido: {e}') from e
+
+        gravados, ignorados, duracao = resultado['gravados'], resultado['ignorados'], resultado['segundos']
+        for tipo in catalogo.TIPOS:
+            linha = f'  {tipo:<8} {gravados.get(tipo, 0):>10} gravados'
+            if ignorados.get(tipo):
+                linha += f', {ignorados[tipo]} ignorados (referências desconhecidas)'
+            self.stdout.write(linha)
+        n = sum(gravados.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Importados {n} registos em {duracao:.1f}s ({n / max(duracao, 1e-9):.0f} registos/s).'
+        ))
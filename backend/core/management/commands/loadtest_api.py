@@ -0,0 +1,87 @@
+# backend/core/management/commands/loadtest_api.py
+"""
+Compara o débito de servidores já em execução com muitos pedidos concorrentes
+(ver `backend/core/carga.py`). Para comparar as views síncronas sob WSGI com as
+views assíncronas (`/api/async/`) sob ASGI, sobre a mesma base de dados:
+
+    RESPONSE_CACHE_ENABLED=0 gunicorn backend.config.wsgi -w 4 --threads 8 -b 127.0.0.1:8001
+    RESPONSE_CACHE_ENABLED=0 uvicorn backend.config.asgi:application --workers 4 --port 8002
+    python manage.py loadtest_api --target wsgi=http://127.0.0.1:8001/api/ \\
+        --target asgi=http://127.0.0.1:8002/api/async/ --concurrency 200 --duration 20
+
+Sem a cache de respostas, todos os pedidos chegam à base de dados. Os caminhos
+(`--path`) são relativos ao URL de cada alvo; `{filme}` é substituído pelo slug
+do filme com mais reviews (ou pelo indicado em `--filme`).
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.core import carga
+from backend.core.models.filme import Filme
+
+CAMINHOS = ("filmes/", "filmes/{filme}/", "filmes/{filme}/reviews/")
+
+
+class Command(BaseCommand):
+    help = 'Mede o débito (pedidos/s) e a latência de servidores da API em execução, com pedidos concorrentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NOME=URL',
+                            help='Servidor a medir e o URL base da API (pode ser repetido).')
+        parser.add_argument('--path', action='append', help=f'Caminho pedido (por defeito: {", ".join(CAMINHOS)}).')
+        parser.add_argument('--filme', help='Slug usado em `{filme}` (por defeito, o filme com mais reviews).')
+        parser.add_argument('--concurrency', type=int, default=100, help='Pedidos simultâneos.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Segundos de medição por servidor.')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Segundos de aquecimento por servidor.')
+        parser.add_argument('--output', help='Ficheiro onde gravar o relatório JSON.')
+
+    def handle(self, *args, **options):
+        alvos = []
+        for alvo in options['target']:
+            nome, separador, url = alvo.partition('=')
+            if not separador or not nome or not url:
+                raise CommandError(f'--target tem de ter a forma NOME=URL ({alvo!r}).')
+            alvos.append((nome, url if url.endswith('/') else url + '/'))
+
+        caminhos = options['path'] or list(CAMINHOS)
+        if any('{filme}' in c for c in caminhos):
+            slug = options['filme'] or Filme.objects.order_by('-reviews_count', 'id').values_list('slug', flat=True).first()
+            if slug is None:
+                raise CommandError('Não há filmes na base de dados: indique --filme.')
+            caminhos = [c.replace('{filme}', slug) for c in caminhos]
+
+        relatorio = {
+            'meta': {
+                'caminhos': caminhos,
+                'concorrencia': options['concurrency'],
+                'duracao_s': options['duration'],
+            },
+            'alvos': {},
+        }
+        for nome, url in alvos:
+            self.stderr.write(f'{nome}: {options["concurrency"]} ligações durante {options["duration"]:g}s ({url})...')
+            try:
+                resumo = carga.executar(
+                    url, caminhos, concorrencia=options['concurrency'],
+                    duracao=options['duration'], aquecimento=options['warmup'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            relatorio['alvos'][nome] = resumo
+
+        referencia = relatorio['alvos'][alvos[0][0]]['pedidos_s']
+        for nome, resumo in relatorio['alvos'].items():
+            relativo = f' ({resumo["pedidos_s"] / referencia:.2f}x)' if referencia else ''
+            self.stdout.write(
+                f'{nome:<10} {resumo["pedidos_s"]:>9.1f} pedidos/s{relativo}  '
+                f'p50 {resumo["p50_ms"]:.1f} ms  p95 {resumo["p95_ms"]:.1f} ms  p99 {resumo["p99_ms"]:.1f} ms  '
+                f'falhas {resumo["falhas"]}  códigos {resumo["codigos"]}'
+            )
+
+        if options['output']:
+            destino = Path(options['output'])
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_text(json.dumps(relatorio, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {destino}.'))
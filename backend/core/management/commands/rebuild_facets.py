@@ -0,0 +1,17 @@
+# backend/core/management/commands/rebuild_facets.py
+from django.core.management.base import BaseCommand
+
+from backend.core import facetas
+from backend.core.caching import incrementar_versoes, VERSAO_CATALOGO
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói as contagens materializadas das facetas do catálogo (géneros, décadas, poster), '
+        'para corrigir desvios introduzidos por escritas sem sinais.'
+    )
+
+    def handle(self, *args, **options):
+        total = facetas.reconstruir()
+        incrementar_versoes(VERSAO_CATALOGO)
+        self.stdout.write(self.style.SUCCESS(f'Facetas reconstruídas: {total} contagens.'))
@@ -0,0 +1,73 @@
+# backend/core/management/commands/recompute_aggregates.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from backend.core import biblioteca
+from backend.core.caching import incrementar_versoes, versao_filme, VERSAO_CATALOGO
+from backend.core.models.filme import Filme, expressao_media_rating
+from backend.core.models.review import Review
+
+
+def _subqueries_agregados():
+    """Devolve as subqueries correlacionadas com a soma e o número de reviews de cada filme."""
+    por_filme = Review.objects.filter(filme=OuterRef("pk")).order_by().values("filme")
+    soma = Coalesce(Subquery(por_filme.annotate(s=Sum("rating")).values("s")), 0)
+    total = Coalesce(
+        Subquery(por_filme.annotate(c=Count("id")).values("c"), output_field=IntegerField()), 0
+    )
+    return soma, total
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói os agregados de avaliações dos filmes (rating_sum, reviews_count, media_rating) '
+        'a partir das reviews, e os contadores da biblioteca de cada utilizador, para corrigir '
+        'desvios introduzidos por escritas sem sinais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slug', action='append', default=[], help='Limita a reconstrução a este filme (repetível).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Número de filmes atualizados por transação.')
+        parser.add_argument('--check', action='store_true', help='Apenas reporta os filmes com agregados desatualizados.')
+
+    def handle(self, *args, **options):
+        filmes = Filme.objects.all()
+        if options['slug']:
+            filmes = filmes.filter(slug__in=options['slug'])
+
+        soma, total = _subqueries_agregados()
+        desatualizados = filmes.annotate(soma_real=soma, total_real=total).filter(
+            ~Q(rating_sum=F('soma_real')) | ~Q(reviews_count=F('total_real'))
+        )
+
+        if options['check']:
+            n = desatualizados.count()
+            style = self.style.WARNING if n else self.style.SUCCESS
+            self.stdout.write(style(f'{n} filmes com agregados desatualizados.'))
+            return
+
+        # Percorre os filmes por intervalos de id, para que cada transação seja curta
+        # e o comando possa correr sobre um catálogo grande sem bloquear a tabela.
+        batch_size = max(1, options['batch_size'])
+        ids = list(desatualizados.order_by('pk').values_list('pk', flat=True))
+        corrigidos = 0
+        for inicio in range(0, len(ids), batch_size):
+            lote = ids[inicio:inicio + batch_size]
+            with transaction.atomic():
+                Filme.objects.filter(pk__in=lote).update(rating_sum=soma, reviews_count=total)
+                # A média é calculada numa segunda instrução, já sobre os contadores corrigidos.
+                corrigidos += Filme.objects.filter(pk__in=lote).update(
+                    media_rating=expressao_media_rating(F('rating_sum'), F('reviews_count'))
+                )
+
+        if corrigidos:
+            slugs = Filme.objects.filter(pk__in=ids).values_list('slug', flat=True)
+            incrementar_versoes(VERSAO_CATALOGO, *[versao_filme(s) for s in slugs])
+
+        self.stdout.write(self.style.SUCCESS(f'Agregados reconstruídos: {corrigidos} filmes corrigidos.'))
+
+        # Os contadores por utilizador são recalculados por inteiro (não dependem dos filmes).
+        if not options['slug']:
+            linhas = biblioteca.reconstruir()
+            self.stdout.write(self.style.SUCCESS(f'Contadores da biblioteca reconstruídos: {linhas} utilizadores.'))
@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação por pedido: queries SQL, tempos e amostragem de perfis.
+
+O `InstrumentacaoMiddleware` mede, para cada pedido:
+
+- o número de queries e o tempo total na base de dados (através de
+  `connection.execute_wrapper`, que funciona também com `DEBUG=False`);
+- as queries duplicadas (mesmo SQL e parâmetros) e os padrões repetidos (mesmo
+  SQL, parâmetros diferentes), que costumam indicar um N+1;
+- o tempo da view, dos serializers e da renderização. O tempo dos serializers
+  é o de `serializer.data` nas views com `SerializacaoMedidaMixin` (os
+  serializers de `get_serializer`) e nas chamadas a `medir_dados`.
+
+Os valores são devolvidos no cabeçalho `Server-Timing` (visível nas ferramentas
+de desenvolvimento do browser) e registados numa linha JSON no logger
+`backend.core.middleware`, configurado em `LOGGING`. Uma fração dos pedidos
+(`INSTRUMENTATION_PROFILE_RATE`) pode ainda ser executada com o cProfile, sendo
+o perfil gravado num ficheiro `.prof` (ler com `python -m pstats`).
+
+`SessaoOpcionalMiddleware` e `MensagensOpcionalMiddleware` substituem os
+middlewares de sessões e de mensagens do Django: com `API_SESSIONLESS`, os
+pedidos à API (`API_SESSIONLESS_PREFIXES`) que trazem um JWT, ou que não trazem
+a cookie de sessão, não carregam nem gravam a sessão e as mensagens (ver
+`pedido_sem_sessao`).
+
+`PrimariaAposEscritaMiddleware` marca os clientes que acabaram de escrever,
+para que as suas leituras seguintes não vão para uma réplica (ver `replicas.py`).
+
+`CompressaoMiddleware` comprime as respostas com gzip, brotli ou zstd,
+consoante o `Accept-Encoding` do cliente (ver `compressao.py`).
+"""
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.backends.base import SessionBase
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.db import connections
+
+from . import compressao
+
+logger = logging.getLogger(__name__)
+
+# Medições do pedido em curso (None fora de um pedido instrumentado).
+_medicoes: contextvars.ContextVar[Medicoes | None] = contextvars.ContextVar("medicoes", default=None)
+
+
+class Medicoes:
+    """Tempos (em segundos) e queries registados durante um pedido."""
+
+    def __init__(self):
+        self.queries: list[tuple[str, tuple, float]] = []
+        self.tempos: Counter[str] = Counter()
+        self.inicio_view: float | None = None
+        self.inicio_render: float | None = None
+
+    def registar_query(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, _params_hashable(params), time.perf_counter() - inicio))
+
+    @property
+    def tempo_db(self) -> float:
+        return sum(d for _, _, d in self.queries)
+
+    def duplicadas(self) -> int:
+        """Número de queries repetidas com o mesmo SQL e os mesmos parâmetros."""
+        contagem = Counter((sql, params) for sql, params, _ in self.queries)
+        return sum(n - 1 for n in contagem.values())
+
+    def repetidas(self, limite: int) -> dict[str, int]:
+        """Padrões de SQL executados pelo menos `limite` vezes (suspeitas de N+1)."""
+        contagem = Counter(sql for sql, _, _ in self.queries)
+        return {sql: n for sql, n in contagem.items() if n >= limite}
+
+
+def _params_hashable(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return tuple(sorted((k, repr(v)) for k, v in params.items()))
+    return tuple(repr(p) for p in params)
+
+
+def _ms(segundos: float) -> str:
+    return f"{segundos * 1000:.1f}"
+
+
+def medir_dados(serializer):
+    """
+    Devolve `serializer.data`, somando o tempo ao dos serializers do pedido.
+
+    Só as chamadas feitas pelas views são medidas: os serializers usados dentro
+    de outros (ex: `VideoSerializer(...).data` num `SerializerMethodField`)
+    contam no tempo do exterior.
+    """
+    medicoes = _medicoes.get()
+    if medicoes is None:
+        return serializer.data
+    inicio = time.perf_counter()
+    try:
+        return serializer.data
+    finally:
+        medicoes.tempos["serializer"] += time.perf_counter() - inicio
+
+
+class _SerializerMedido:
+    """Um serializer cujo `.data` é medido com `medir_dados`; o resto é delegado."""
+
+    def __init__(self, serializer):
+        self._serializer = serializer
+
+    def __getattr__(self, nome):
+        return getattr(self._serializer, nome)
+
+    @property
+    def data(self):
+        return medir_dados(self._serializer)
+
+
+class SerializacaoMedidaMixin:
+    """
+    Mixin para views genéricas que mede o tempo dos serializers de `get_serializer`.
+
+    Fora de um pedido instrumentado (ex: na geração do esquema OpenAPI), devolve
+    o próprio serializer.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _medicoes.get() is None:
+            return serializer
+        return _SerializerMedido(serializer)
+
+
+def _instrumentar_ligacoes(pilha: ExitStack, medicoes: Medicoes) -> None:
+    for conn in connections.all():
+        pilha.enter_context(conn.execute_wrapper(medicoes.registar_query))
+
+
+class InstrumentacaoMiddleware:
+    """
+    Mede as queries e os tempos de cada pedido (ver a docstring do módulo).
+
+    Deve ser o primeiro middleware, para que o tempo total inclua os restantes.
+    É desativado com `INSTRUMENTATION_ENABLED=False`. Suporta os dois modos do
+    Django: sob ASGI não obriga a passar os pedidos das views assíncronas por
+    uma thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cabecalho = settings.INSTRUMENTATION_SERVER_TIMING
+        self.taxa_perfil = settings.INSTRUMENTATION_PROFILE_RATE
+        self.pasta_perfis = Path(settings.INSTRUMENTATION_PROFILE_DIR)
+        self.limite_repetidas = settings.INSTRUMENTATION_REPEATED_THRESHOLD
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+            # Os hooks síncronos seriam executados numa thread a cada pedido.
+            self.process_view = self._aprocess_view
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        medicoes = Medicoes()
+        token = _medicoes.set(medicoes)
+        perfil = self._iniciar_perfil()
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pilha:
+                _instrumentar_ligacoes(pilha, medicoes)
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - inicio
+            if perfil is not None:
+                perfil.disable()
+            _medicoes.reset(token)
+        return self._terminar(request, response, medicoes, perfil, total)
+
+    async def __acall__(self, request):
+        medicoes = Medicoes()
+        token = _medicoes.set(medicoes)
+        perfil = self._iniciar_perfil()
+        inicio = time.perf_counter()
+        # As ligações à base de dados são locais à thread onde o ORM assíncrono
+        # executa as queries do pedido (a mesma para todas as chamadas
+        # `sync_to_async` do pedido): os wrappers são instalados e removidos lá.
+        pilha = ExitStack()
+        try:
+            await sync_to_async(_instrumentar_ligacoes)(pilha, medicoes)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(pilha.close)()
+        finally:
+            total = time.perf_counter() - inicio
+            if perfil is not None:
+                perfil.disable()
+            _medicoes.reset(token)
+        return self._terminar(request, response, medicoes, perfil, total)
+
+    def _terminar(self, request, response, medicoes: Medicoes, perfil, total: float):
+        if perfil is not None:
+            self._gravar_perfil(perfil, request)
+        if self.cabecalho:
+            response["Server-Timing"] = self._server_timing(medicoes, total)
+        self._registar(request, response, medicoes, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicoes = _medicoes.get()
+        if medicoes is not None:
+            medicoes.inicio_view = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Chamado quando a view termina e antes da renderização (respostas do DRF).
+        medicoes = _medicoes.get()
+        if medicoes is not None and medicoes.inicio_view is not None:
+            agora = time.perf_counter()
+            medicoes.tempos["view"] = agora - medicoes.inicio_view
+            medicoes.inicio_render = agora
+
+            def fim_render(resposta):
+                medicoes.tempos["render"] = time.perf_counter() - medicoes.inicio_render
+
+            response.add_post_render_callback(fim_render)
+        return response
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        InstrumentacaoMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def _aprocess_template_response(self, request, response):
+        return InstrumentacaoMiddleware.process_template_response(self, request, response)
+
+    # --- Saída ---
+
+    def _server_timing(self, medicoes: Medicoes, total: float) -> str:
+        partes = [
+            f'db;dur={_ms(medicoes.tempo_db)};desc="{len(medicoes.queries)} queries, {medicoes.duplicadas()} dup"',
+        ]
+        for nome in ("serializer", "view", "render"):
+            if nome in medicoes.tempos:
+                partes.append(f"{nome};dur={_ms(medicoes.tempos[nome])}")
+        partes.append(f"total;dur={_ms(total)}")
+        return ", ".join(partes)
+
+    def _registar(self, request, response, medicoes: Medicoes, total: float):
+        repetidas = medicoes.repetidas(self.limite_repetidas)
+        registo = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "db_ms": round(medicoes.tempo_db * 1000, 2),
+            "queries": len(medicoes.queries),
+            "duplicates": medicoes.duplicadas(),
+            **{f"{nome}_ms": round(t * 1000, 2) for nome, t in medicoes.tempos.items()},
+        }
+        if repetidas:
+            registo["repeated"] = [{"sql": sql[:300], "count": n} for sql, n in repetidas.items()]
+            logger.warning(json.dumps(registo, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(registo, ensure_ascii=False))
+
+    # --- Perfis ---
+
+    def _iniciar_perfil(self) -> cProfile.Profile | None:
+        if self.taxa_perfil <= 0 or random.random() >= self.taxa_perfil:
+            return None
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outro pedido (noutra thread) já está a ser perfilado.
+            return None
+        return perfil
+
+    def _gravar_perfil(self, perfil: cProfile.Profile, request):
+        self.pasta_perfis.mkdir(parents=True, exist_ok=True)
+        caminho = re.sub(r"[^\w-]+", "_", request.path).strip("_") or "raiz"
+        nome = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.monotonic_ns() % 10**6:06d}-{request.method}-{caminho[:80]}.prof"
+        perfil.dump_stats(self.pasta_perfis / nome)
+
+
+# --- Pedidos à API sem sessão ---
+
+def pedido_sem_sessao(request) -> bool:
+    """
+    Indica se o pedido dispensa a sessão (e as mensagens) do Django.
+
+    É o caso, com `API_SESSIONLESS`, dos pedidos a `API_SESSIONLESS_PREFIXES`
+    com um JWT (no cabeçalho `Authorization` ou na cookie `JWT_AUTH_COOKIE`),
+    que são autenticados por `JWTCookieAuthentication` antes de a
+    `SessionAuthentication` ser tentada, e dos que não têm a cookie de sessão,
+    que não teriam sessão a carregar. Os restantes (ex: o admin, ou a API
+    navegável com a sessão do admin) mantêm a sessão.
+    """
+    if not settings.API_SESSIONLESS or not request.path.startswith(tuple(settings.API_SESSIONLESS_PREFIXES)):
+        return False
+    return (
+        "HTTP_AUTHORIZATION" in request.META
+        or settings.JWT_AUTH_COOKIE in request.COOKIES
+        or settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+class SessaoVazia(SessionBase):
+    """
+    Sessão sem armazenamento, usada nos pedidos sem sessão.
+
+    Está sempre vazia (o utilizador da sessão é o anónimo, sem queries) e o que
+    lá for escrito é descartado no fim do pedido.
+    """
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        pass
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+    def load(self):
+        return {}
+
+
+class SessaoOpcionalMiddleware(SessionMiddleware):
+    """`SessionMiddleware`, exceto nos pedidos de `pedido_sem_sessao`."""
+
+    def process_request(self, request):
+        if pedido_sem_sessao(request):
+            request.session = SessaoVazia()
+        else:
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if isinstance(getattr(request, "session", None), SessaoVazia):
+            return response
+        return super().process_response(request, response)
+
+
+class MensagensOpcionalMiddleware(MessageMiddleware):
+    """`MessageMiddleware`, exceto nos pedidos sem sessão."""
+
+    def process_request(self, request):
+        if not isinstance(getattr(request, "session", None), SessaoVazia):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if isinstance(getattr(request, "session", None), SessaoVazia):
+            return response
+        return super().process_response(request, response)
+
+
+# --- Réplicas ---
+
+class PrimariaAposEscritaMiddleware(MiddlewareMixin):
+    """
+    Define a cookie `REPLICA_STICKY_COOKIE` nas respostas a escritas bem-sucedidas.
+
+    Enquanto a cookie existir (`REPLICA_STICKY_SECONDS`), `replicas.escolher_replica`
+    serve as leituras do cliente na primária, que já tem o que ele escreveu.
+    Só atua se houver réplicas configuradas.
+    """
+
+    def process_response(self, request, response):
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in ("GET", "HEAD", "OPTIONS", "TRACE")
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, "1",
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax",
+            )
+        return response
+
+
+# --- Compressão ---
+
+# Tipos de conteúdo que compensa comprimir (o resto, ex: imagens, já vem comprimido).
+_compressivel = re.compile(r"^(text/.*|application/(json|javascript|xml|msgpack)|.*\+(json|xml))$")
+
+
+class CompressaoMiddleware(MiddlewareMixin):
+    """
+    Comprime as respostas de leitura com a codificação negociada (`compressao.escolher`).
+
+    Só comprime as respostas com pelo menos `RESPONSE_COMPRESSION_MIN_SIZE`
+    bytes, de um tipo compressível e ainda sem `Content-Encoding`. Não atua
+    nas escritas: as respostas ao login levam os tokens, e comprimir segredos
+    junto de dados enviados pelo cliente expõe-nos a ataques como o BREACH.
+    Como o `GZipMiddleware` do Django, torna fraco o `ETag` das respostas
+    comprimidas, que continuam a responder 304 aos pedidos condicionais.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RESPONSE_COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if (
+            request.method not in ("GET", "HEAD")
+            or response.streaming
+            or response.has_header("Content-Encoding")
+            or not _compressivel.match(response.get("Content-Type", "").split(";")[0].strip().lower())
+        ):
+            return response
+
+        # A resposta depende do `Accept-Encoding`, mesmo quando não é comprimida
+        # (ex: a mesma URL pode passar o mínimo depois de os dados mudarem).
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+        codificacao = compressao.escolher(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""), settings.RESPONSE_COMPRESSION_ENCODINGS,
+        )
+        if codificacao is None:
+            return response
+        comprimido = compressao.comprimir(codificacao, response.content)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response["Content-Length"] = str(len(comprimido))
+        response["Content-Encoding"] = codificacao
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
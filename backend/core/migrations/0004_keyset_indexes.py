@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_remove_review_unique_review_por_filme_autor_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filme',
+            index=models.Index(fields=['-media_rating', 'titulo', 'id'], name='idx_filme_rating_titulo_id'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', '-id'], name='idx_review_created_id'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:42
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Filme = apps.get_model("core", "Filme")
+    Review = apps.get_model("core", "Review")
+    por_filme = Review.objects.filter(filme=OuterRef("pk")).order_by().values("filme")
+    Filme.objects.update(
+        rating_sum=Coalesce(Subquery(por_filme.annotate(s=Sum("rating")).values("s")), 0),
+        reviews_count=Coalesce(
+            Subquery(por_filme.annotate(c=Count("id")).values("c"), output_field=IntegerField()), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filme',
+            name='rating_sum',
+            field=models.PositiveBigIntegerField(default=0, help_text='A soma de todas as avaliações dos utilizadores.', verbose_name='Soma das Avaliações'),
+        ),
+        migrations.AddField(
+            model_name='filme',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0, help_text='O número total de avaliações recebidas.', verbose_name='Total de Avaliações'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
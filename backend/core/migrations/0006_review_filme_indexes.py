@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_filme_rating_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['filme', '-created_at', '-id'], name='idx_review_filme_created'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['filme', '-rating', '-created_at', '-id'], name='idx_review_filme_rating'),
+        ),
+    ]
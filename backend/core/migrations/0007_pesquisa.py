@@ -0,0 +1,90 @@
+# Estruturas de pesquisa de texto integral (ver backend/core/search.py).
+#
+# Os objetos criados dependem do motor de base de dados e não fazem parte do
+# estado dos modelos:
+# - PostgreSQL: coluna `search_vector` + trigger + índice GIN em core_filme,
+#   core_pessoa e core_review, e índices de trigramas (pg_trgm) nos títulos/nomes.
+# - SQLite: tabela virtual FTS5 `core_pesquisa_fts`. Os triggers que a mantêm
+#   são (re)criados após cada `migrate` por `search.garantir_indice_fts5`, porque
+#   o SQLite recria as tabelas em muitas alterações de esquema e perde-os.
+
+from django.db import migrations
+
+# tabela: (coluna com peso A, coluna com peso B, coluna com trigramas)
+TABELAS = {
+    "core_filme": ("titulo", "descricao", "titulo"),
+    "core_pessoa": ("nome", "bio", "nome"),
+    "core_review": ("titulo", "texto", None),
+}
+
+
+def _postgres(tabela, peso_a, peso_b, trigramas):
+    vetor = (
+        f"setweight(to_tsvector('simple', coalesce({{r}}.{peso_a}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({{r}}.{peso_b}, '')), 'B')"
+    )
+    sql = [
+        f"ALTER TABLE {tabela} ADD COLUMN search_vector tsvector",
+        f"""
+        CREATE FUNCTION {tabela}_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {vetor.format(r="NEW")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"""
+        CREATE TRIGGER {tabela}_search_vector_trg
+        BEFORE INSERT OR UPDATE OF {peso_a}, {peso_b} ON {tabela}
+        FOR EACH ROW EXECUTE FUNCTION {tabela}_search_vector()
+        """,
+        f"UPDATE {tabela} SET search_vector = {vetor.format(r=tabela)}",
+        f"CREATE INDEX {tabela}_search_gin ON {tabela} USING gin (search_vector)",
+    ]
+    if trigramas:
+        sql.append(f"CREATE INDEX {tabela}_{trigramas}_trgm ON {tabela} USING gin ({trigramas} gin_trgm_ops)")
+    return sql
+
+
+def criar_pesquisa(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        sql = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+        for tabela, (peso_a, peso_b, trigramas) in TABELAS.items():
+            sql += _postgres(tabela, peso_a, peso_b, trigramas)
+    elif vendor == "sqlite":
+        sql = [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS core_pesquisa_fts USING fts5("
+            "titulo, texto, tokenize = 'unicode61 remove_diacritics 2')"
+        ]
+    else:
+        return
+    for instrucao in sql:
+        schema_editor.execute(instrucao)
+
+
+def remover_pesquisa(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for tabela in TABELAS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {tabela}_search_vector_trg ON {tabela}")
+            schema_editor.execute(f"DROP FUNCTION IF EXISTS {tabela}_search_vector()")
+            schema_editor.execute(f"ALTER TABLE {tabela} DROP COLUMN IF EXISTS search_vector")
+            schema_editor.execute(f"DROP INDEX IF EXISTS {tabela}_nome_trgm")
+            schema_editor.execute(f"DROP INDEX IF EXISTS {tabela}_titulo_trgm")
+    elif vendor == "sqlite":
+        for tabela in TABELAS:
+            for sufixo in ("ai", "au", "ad"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {tabela}_fts_{sufixo}")
+        schema_editor.execute("DROP TABLE IF EXISTS core_pesquisa_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_review_filme_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_pesquisa, remover_pesquisa),
+    ]
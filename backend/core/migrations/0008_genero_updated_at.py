@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_pesquisa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genero',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Última Atualização'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_genero_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pessoa',
+            index=models.Index(fields=['nome', 'id'], name='idx_pessoa_nome_id'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def preencher_facetas(apps, schema_editor):
+    """Calcula as contagens iniciais das facetas a partir dos filmes existentes."""
+    FacetaFilme = apps.get_model("core", "FacetaFilme")
+    Filme = apps.get_model("core", "Filme")
+
+    contagens = Counter()
+    for linha in Filme.objects.filter(ano_lancamento__isnull=False).values("ano_lancamento").annotate(n=Count("id")).order_by():
+        contagens[("decada", str(linha["ano_lancamento"] // 10 * 10))] += linha["n"]
+    posters = Filme.objects.aggregate(com=Count("id", filter=~Q(poster="")), total=Count("id"))
+    contagens[("poster", "1")] = posters["com"]
+    contagens[("poster", "0")] = posters["total"] - posters["com"]
+    for linha in Filme.generos.through.objects.values("genero_id").annotate(n=Count("filme_id")).order_by():
+        contagens[("genero", str(linha["genero_id"]))] = linha["n"]
+
+    FacetaFilme.objects.bulk_create(
+        [FacetaFilme(tipo=tipo, chave=chave, total=total) for (tipo, chave), total in contagens.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_pessoa_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetaFilme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('genero', 'Género'), ('decada', 'Década'), ('poster', 'Com poster')], max_length=20, verbose_name='Tipo')),
+                ('chave', models.CharField(help_text="O id do género, o ano inicial da década ou '1'/'0' (com/sem poster).", max_length=50, verbose_name='Chave')),
+                ('total', models.IntegerField(default=0, verbose_name='Total de filmes')),
+            ],
+            options={
+                'verbose_name': 'Faceta',
+                'verbose_name_plural': 'Facetas',
+                'ordering': ['tipo', 'chave'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='filme',
+            index=models.Index(fields=['ano_lancamento', '-media_rating', 'titulo', 'id'], name='idx_filme_ano_rating'),
+        ),
+        migrations.AddIndex(
+            model_name='filme',
+            index=models.Index(condition=models.Q(('poster', ''), _negated=True), fields=['-media_rating', 'titulo', 'id'], name='idx_filme_poster_rating'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetafilme',
+            constraint=models.UniqueConstraint(fields=('tipo', 'chave'), name='unique_faceta_tipo_chave'),
+        ),
+        migrations.RunPython(preencher_facetas, migrations.RunPython.noop),
+    ]
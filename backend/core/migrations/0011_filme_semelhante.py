@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_facetas_filme'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmeSemelhante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Semelhança de cosseno, entre 0 e 1.', verbose_name='Semelhança')),
+                ('calculado_em', models.DateTimeField(verbose_name='Calculado em')),
+                ('filme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semelhantes', to='core.filme', verbose_name='Filme')),
+                ('semelhante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semelhante_de', to='core.filme', verbose_name='Filme semelhante')),
+            ],
+            options={
+                'verbose_name': 'Filme semelhante',
+                'verbose_name_plural': 'Filmes semelhantes',
+                'indexes': [models.Index(fields=['filme', '-score'], name='idx_semelhante_filme_score')],
+                'constraints': [models.UniqueConstraint(fields=('filme', 'semelhante'), name='unique_filme_semelhante')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_filme_semelhante'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TendenciaFilme',
+            fields=[
+                ('filme', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tendencia', serialize=False, to='core.filme', verbose_name='Filme')),
+                ('popularidade', models.FloatField(default=0.0, verbose_name='Popularidade')),
+                ('score', models.FloatField(default=0.0, verbose_name='Score')),
+                ('referencia', models.FloatField(help_text='Instante (timestamp UNIX) para o qual a popularidade está escalada.', verbose_name='Referência')),
+            ],
+            options={
+                'verbose_name': 'Tendência',
+                'verbose_name_plural': 'Tendências',
+                'indexes': [models.Index(fields=['-score', 'filme'], name='idx_tendencia_score')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remover_duplicados(apps, schema_editor):
+    """Apaga os vídeos repetidos (mesmo filme, site e chave), mantendo o mais antigo."""
+    Video = apps.get_model("core", "Video")
+    repetidos = (
+        Video.objects.values("filme_id", "site", "key")
+        .annotate(primeiro=Min("pk"), total=Count("pk"))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for grupo in repetidos:
+        Video.objects.filter(filme_id=grupo["filme_id"], site=grupo["site"], key=grupo["key"]).exclude(
+            pk=grupo["primeiro"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_tendencia_filme'),
+    ]
+
+    operations = [
+        # A restrição falharia nas bases de dados onde o mesmo vídeo foi adicionado duas vezes.
+        migrations.RunPython(remover_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='video',
+            constraint=models.UniqueConstraint(fields=('filme', 'site', 'key'), name='unique_video_filme_site_key'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_contadores(apps, schema_editor):
+    """Calcula os contadores iniciais a partir das listas e das reviews existentes."""
+    ContadoresUtilizador = apps.get_model("core", "ContadoresUtilizador")
+    fontes = (
+        (apps.get_model("core", "Watchlist"), "utilizador_id", "watchlist_count"),
+        (apps.get_model("core", "Favorito"), "utilizador_id", "favoritos_count"),
+        (apps.get_model("core", "Review"), "autor_id", "reviews_count"),
+    )
+    valores = {}
+    for modelo, dono, campo in fontes:
+        for utilizador_id, total in modelo.objects.values(dono).annotate(n=Count("pk")).values_list(dono, "n").order_by():
+            valores.setdefault(utilizador_id, {})[campo] = total
+    ContadoresUtilizador.objects.bulk_create(
+        [ContadoresUtilizador(utilizador_id=u, **campos) for u, campos in valores.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0013_video_chave_natural'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadoresUtilizador',
+            fields=[
+                ('utilizador', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contadores', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Utilizador')),
+                ('watchlist_count', models.PositiveIntegerField(default=0, verbose_name='Filmes na watchlist')),
+                ('favoritos_count', models.PositiveIntegerField(default=0, verbose_name='Filmes favoritos')),
+                ('reviews_count', models.PositiveIntegerField(default=0, verbose_name='Reviews escritas')),
+            ],
+            options={
+                'verbose_name': 'Contadores do utilizador',
+                'verbose_name_plural': 'Contadores dos utilizadores',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='favorito',
+            index=models.Index(fields=['utilizador', '-created_at', '-id'], name='idx_favorito_user_data'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['utilizador', '-created_at', '-id'], name='idx_watchlist_user_data'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
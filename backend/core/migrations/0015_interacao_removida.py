@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_contadores_utilizador'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteracaoRemovida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('removida_em', models.DateTimeField(db_index=True, verbose_name='Removida em')),
+                ('filme', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.filme', verbose_name='Filme')),
+            ],
+            options={
+                'verbose_name': 'Interação removida',
+                'verbose_name_plural': 'Interações removidas',
+            },
+        ),
+    ]
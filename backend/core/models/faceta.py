@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from django.db import models
+
+
+class FacetaFilme(models.Model):
+    """
+    Contagem materializada de filmes por faceta do catálogo (ex: por género).
+
+    Mantida com incrementos pelos sinais de `Filme` e da relação com `Genero`
+    (ver `facetas.py` e `signals.py`); o comando `rebuild_facets` reconstrói-a.
+    """
+
+    class Tipo(models.TextChoices):
+        GENERO = "genero", "Género"
+        DECADA = "decada", "Década"
+        POSTER = "poster", "Com poster"
+
+    tipo = models.CharField("Tipo", max_length=20, choices=Tipo.choices)
+    chave = models.CharField(
+        "Chave",
+        max_length=50,
+        help_text="O id do género, o ano inicial da década ou '1'/'0' (com/sem poster)."
+    )
+    total = models.IntegerField("Total de filmes", default=0)
+
+    class Meta:
+        verbose_name = "Faceta"
+        verbose_name_plural = "Facetas"
+        ordering = ["tipo", "chave"]
+        constraints = [
+            models.UniqueConstraint(fields=["tipo", "chave"], name="unique_faceta_tipo_chave"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_tipo_display()} {self.chave}: {self.total}"
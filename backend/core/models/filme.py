@@ -1,8 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 from django.db import models
+from django.db.models import Case, FloatField, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
 from django.utils.text import slugify
 
+
+def expressao_media_rating(soma, total):
+    """
+    Expressão SQL da média de avaliações a partir da soma e do número de reviews.
+
+    Usada em `UPDATE`s para que a média seja calculada pela base de dados na
+    mesma instrução que altera os contadores, sem ler o filme antes.
+    """
+    return Case(
+        When(GreaterThan(total, 0), then=Cast(soma, FloatField()) / total),
+        default=0.0,
+        output_field=FloatField(),
+    )
+
 class Filme(models.Model):
     """
     Representa um filme no catálogo.
@@ -47,6 +64,17 @@ class Filme(models.Model):
         db_index=True,
         help_text="A média de todas as avaliações dos utilizadores."
     )
+    # Contadores mantidos incrementalmente pelos sinais de Review (ver signals.py).
+    rating_sum = models.PositiveBigIntegerField(
+        "Soma das Avaliações",
+        default=0,
+        help_text="A soma de todas as avaliações dos utilizadores."
+    )
+    reviews_count = models.PositiveIntegerField(
+        "Total de Avaliações",
+        default=0,
+        help_text="O número total de avaliações recebidas."
+    )
     poster = models.URLField(
         "Poster",
         blank=True,
@@ -67,10 +95,32 @@ class Filme(models.Model):
         verbose_name = "Filme"
         verbose_name_plural = "Filmes"
         ordering = ["-media_rating", "titulo"]
+        indexes = [
+            # Cobre a ordenação do catálogo e a paginação por chave (keyset).
+            models.Index(fields=["-media_rating", "titulo", "id"], name="idx_filme_rating_titulo_id"),
+            # Filtros do catálogo (ver `filtrar_filmes` em views.py): intervalo de
+            # anos e, só para os filmes com poster, a mesma ordenação do catálogo.
+            models.Index(fields=["ano_lancamento", "-media_rating", "titulo", "id"], name="idx_filme_ano_rating"),
+            models.Index(
+                fields=["-media_rating", "titulo", "id"],
+                condition=~models.Q(poster=""),
+                name="idx_filme_poster_rating",
+            ),
+        ]
+
+    # Mantidos com UPDATEs atómicos pelos sinais de Review (ver signals.py).
+    CAMPOS_AGREGADOS = ("rating_sum", "reviews_count", "media_rating")
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.titulo}-{self.ano_lancamento}")
+        # Um `save()` completo de uma instância carregada antes de novas reviews
+        # não deve sobrepor os contadores com valores desatualizados.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_AGREGADOS
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self) -> str:
@@ -32,6 +32,10 @@ class Watchlist(models.Model):
                 name="unique_watchlist_por_user_filme"
             )
         ]
+        indexes = [
+            # A biblioteca do utilizador, paginada por chave (`/api/me/library/`).
+            models.Index(fields=["utilizador", "-created_at", "-id"], name="idx_watchlist_user_data"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.filme} in {self.utilizador}'s watchlist"
@@ -60,6 +64,9 @@ class Favorito(models.Model):
         verbose_name_plural = "Favorites"
         ordering = ["-created_at"]
         unique_together = [["utilizador", "filme"]]
+        indexes = [
+            models.Index(fields=["utilizador", "-created_at", "-id"], name="idx_favorito_user_data"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.filme} is a favorite of {self.utilizador}"
@@ -35,6 +35,10 @@ class Pessoa(models.Model):
         verbose_name = "Person"
         verbose_name_plural = "People"
         ordering = ["nome"]
+        indexes = [
+            # Cobre a paginação por chave (keyset) da listagem de pessoas.
+            models.Index(fields=["nome", "id"], name="idx_pessoa_nome_id"),
+        ]
 
     def __str__(self) -> str:
         return self.nome
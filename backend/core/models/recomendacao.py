@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from django.db import models
+
+
+class FilmeSemelhante(models.Model):
+    """
+    Um dos K vizinhos mais próximos de um filme no modelo de recomendações.
+
+    A tabela é gerada pelo comando `build_recommendations` (ver `recomendacoes.py`)
+    e só é lida pela API: os vizinhos de um filme são uma leitura pelo índice
+    `(filme, -score)`.
+    """
+    filme = models.ForeignKey(
+        "core.Filme",
+        verbose_name="Filme",
+        on_delete=models.CASCADE,
+        related_name="semelhantes",
+    )
+    semelhante = models.ForeignKey(
+        "core.Filme",
+        verbose_name="Filme semelhante",
+        on_delete=models.CASCADE,
+        related_name="semelhante_de",
+    )
+    score = models.FloatField("Semelhança", help_text="Semelhança de cosseno, entre 0 e 1.")
+    calculado_em = models.DateTimeField("Calculado em")
+
+    class Meta:
+        verbose_name = "Filme semelhante"
+        verbose_name_plural = "Filmes semelhantes"
+        constraints = [
+            models.UniqueConstraint(fields=["filme", "semelhante"], name="unique_filme_semelhante"),
+        ]
+        indexes = [
+            models.Index(fields=["filme", "-score"], name="idx_semelhante_filme_score"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.semelhante} ~ {self.filme} ({self.score:.3f})"
+
+
+class InteracaoRemovida(models.Model):
+    """
+    Um filme que perdeu uma review, um favorito ou uma entrada na watchlist.
+
+    As linhas apagadas não deixam rasto nas tabelas das interações: este registo
+    permite à reconstrução incremental (`recomendacoes.construir`) recalcular os
+    filmes afetados. É preenchido pelos sinais e por `listas.remover` e
+    esvaziado a cada reconstrução.
+    """
+    # Sem chave estrangeira na base de dados: a remoção é registada depois do
+    # commit, quando o filme pode já ter sido apagado (em cascata).
+    filme = models.ForeignKey(
+        "core.Filme",
+        verbose_name="Filme",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    removida_em = models.DateTimeField("Removida em", db_index=True)
+
+    class Meta:
+        verbose_name = "Interação removida"
+        verbose_name_plural = "Interações removidas"
+
+    def __str__(self) -> str:
+        return f"{self.filme_id} ({self.removida_em})"
@@ -51,6 +51,13 @@ class Review(models.Model):
         ordering = ["-created_at"]
         # Garante que um utilizador só pode fazer uma review por filme
         unique_together = ('filme', 'autor')
+        indexes = [
+            # Cobre a ordenação por data e a paginação por chave (keyset).
+            models.Index(fields=["-created_at", "-id"], name="idx_review_created_id"),
+            # Reviews de um filme, por data ou por avaliação (FilmeViewSet.list_reviews).
+            models.Index(fields=["filme", "-created_at", "-id"], name="idx_review_filme_created"),
+            models.Index(fields=["filme", "-rating", "-created_at", "-id"], name="idx_review_filme_rating"),
+        ]
 
     def __str__(self) -> str:
         return f"Review de {self.autor.username} para {self.filme.titulo}"
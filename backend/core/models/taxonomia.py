@@ -16,6 +16,7 @@ class Genero(models.Model):
         unique=True,
         help_text="URL amigável para o género."
     )
+    updated_at = models.DateTimeField("Última Atualização", auto_now=True)
 
     class Meta:
         verbose_name = "Género"
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from django.db import models
+
+
+class TendenciaFilme(models.Model):
+    """
+    Linha do ranking de tendências de um filme (ver `tendencias.py`).
+
+    `popularidade` é a soma dos pesos dos eventos com decaimento exponencial,
+    escalada para a data de `referencia` (comum a todas as linhas); `score`
+    multiplica-a pela média bayesiana das avaliações e define a ordem do ranking.
+    """
+    filme = models.OneToOneField(
+        "core.Filme",
+        verbose_name="Filme",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="tendencia",
+    )
+    popularidade = models.FloatField("Popularidade", default=0.0)
+    score = models.FloatField("Score", default=0.0)
+    referencia = models.FloatField(
+        "Referência",
+        help_text="Instante (timestamp UNIX) para o qual a popularidade está escalada."
+    )
+
+    class Meta:
+        verbose_name = "Tendência"
+        verbose_name_plural = "Tendências"
+        indexes = [
+            models.Index(fields=["-score", "filme"], name="idx_tendencia_score"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.filme_id}: {self.score:.3f}"
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from django.conf import settings
+from django.db import models
+
+
+class ContadoresUtilizador(models.Model):
+    """
+    Contadores da biblioteca de um utilizador, desnormalizados (ver `biblioteca.py`).
+
+    Mantidos pelos sinais de `Watchlist`, `Favorito` e `Review` e pelas escritas
+    em SQL de `listas.py`, para que o cabeçalho do perfil seja uma leitura de
+    uma linha. Um utilizador sem linha tem todos os contadores a zero.
+    """
+    utilizador = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        verbose_name="Utilizador",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="contadores",
+    )
+    watchlist_count = models.PositiveIntegerField("Filmes na watchlist", default=0)
+    favoritos_count = models.PositiveIntegerField("Filmes favoritos", default=0)
+    reviews_count = models.PositiveIntegerField("Reviews escritas", default=0)
+
+    class Meta:
+        verbose_name = "Contadores do utilizador"
+        verbose_name_plural = "Contadores dos utilizadores"
+
+    def __str__(self) -> str:
+        return f"{self.utilizador_id}: {self.watchlist_count}/{self.favoritos_count}/{self.reviews_count}"
@@ -66,6 +66,10 @@ class Video(models.Model):
         verbose_name = "Video"
         verbose_name_plural = "Videos"
         ordering = ["-created_at"]
+        constraints = [
+            # Chave natural usada pela importação do catálogo (ver catalogo.py).
+            models.UniqueConstraint(fields=["filme", "site", "key"], name="unique_video_filme_site_key"),
+        ]
         indexes = [
             models.Index(fields=["-created_at"], name="idx_video_created_at"),
             models.Index(fields=["tipo"], name="idx_video_tipo"),
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Classes de paginação para a API.
+
+A paginação por defeito do DRF (`PageNumberPagination`) traduz-se num
+`OFFSET n` e num `COUNT(*)` em cada pedido, o que fica mais lento à medida
+que o catálogo cresce. Este módulo define uma paginação por chave
+(keyset/cursor): em vez de saltar `n` linhas, a página seguinte é obtida
+"procurando" a partir dos valores da última linha devolvida, sobre uma chave
+composta coberta por um índice.
+
+O total de resultados deixa de ser calculado em cada pedido. Só é devolvido
+quando o cliente o pede explicitamente (`?include_total=1`) e, mesmo assim,
+é uma aproximação guardada em cache.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connections
+from django.db.models import IntegerField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _serializar_valor(valor):
+    """Converte um valor da chave num tipo representável em JSON sem perdas."""
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        # `isoformat` preserva os microssegundos, ao contrário do DjangoJSONEncoder.
+        return valor.isoformat()
+    return valor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por chave (keyset) sobre uma ordenação composta e determinística.
+
+    As subclasses definem `ordering`, que deve terminar num campo único (ex: `id`)
+    para desempatar linhas com os mesmos valores, e cujos campos não podem ser nulos.
+    O cursor é opaco para o cliente: contém os valores da chave da linha de
+    fronteira e a direção da navegação.
+
+    Para compatibilidade com clientes existentes, um pedido com `?page=N` continua
+    a ser servido pela paginação por número de página.
+    """
+    ordering: tuple[str, ...] = ("-id",)
+    page_size = settings.REST_FRAMEWORK.get("PAGE_SIZE", 20)
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    total_query_param = "include_total"
+    legacy_query_param = "page"
+    # Tempo (em segundos) durante o qual o total aproximado fica em cache.
+    total_cache_timeout = 60
+    invalid_cursor_message = "Cursor inválido."
+    # Campos da ordenação que não pertencem ao modelo (anotações), com o campo
+    # usado para converter os valores do cursor (ex: `{"ano": IntegerField()}`).
+    cursor_fields: dict = {}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+        if self.legacy_query_param in request.query_params:
+            self.legacy = PageNumberPagination()
+            return self.legacy.paginate_queryset(queryset, request, view=view)
+
+        queryset = self._preparar(queryset, request)
+        if self.total_pedido:
+            self.total = self.get_approximate_count(queryset)
+        return self._concluir(list(self._pagina(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Versão assíncrona de `paginate_queryset`, com o ORM assíncrono.
+
+        O total aproximado e a paginação por número de página (`?page=N`) usam
+        código síncrono e são executados numa thread.
+        """
+        self.request = request
+        self.legacy = None
+        if self.legacy_query_param in request.query_params:
+            self.legacy = PageNumberPagination()
+            return await sync_to_async(self.legacy.paginate_queryset)(queryset, request, view=view)
+
+        queryset = self._preparar(queryset, request)
+        if self.total_pedido:
+            self.total = await sync_to_async(self.get_approximate_count)(queryset)
+        return self._concluir([linha async for linha in self._pagina(queryset)])
+
+    def _preparar(self, queryset, request):
+        """Lê o cursor e o tamanho da página do pedido e ordena o queryset pela chave."""
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.total = None
+        self.total_pedido = request.query_params.get(self.total_query_param) in ("1", "true", "True")
+
+        self.cursor = self.decode_cursor(request, queryset.model)
+        self.reverse = self.cursor is not None and self.cursor["reverse"]
+        return queryset.order_by(*self.get_ordering(self.reverse))
+
+    def _pagina(self, queryset):
+        # Pede-se uma linha a mais para saber se existe uma página seguinte
+        # sem ter de contar os resultados.
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_seek_filter(self.cursor["values"], self.reverse))
+        return queryset[: self.page_size + 1]
+
+    def _concluir(self, rows: list) -> list:
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        payload = OrderedDict()
+        if self.total is not None:
+            payload["count"] = self.total
+        payload["next"] = self.get_next_link()
+        payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {
+                    "type": "integer",
+                    "description": "Total aproximado; só presente com `include_total=1`.",
+                },
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor opaco devolvido em `next`/`previous`.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Número de resultados por página (máximo {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.total_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Inclui um total aproximado (em cache) na resposta.",
+                "schema": {"type": "boolean"},
+            },
+        ]
+
+    # --- Ordenação e filtro de procura ---
+
+    def get_ordering(self, reverse: bool = False) -> list[str]:
+        if not reverse:
+            return list(self.ordering)
+        return [f[1:] if f.startswith("-") else f"-{f}" for f in self.ordering]
+
+    def get_seek_filter(self, values: list, reverse: bool) -> Q:
+        """
+        Constrói a condição "linhas depois da chave `values`" para a ordenação.
+
+        Para `(-a, b, id)` e a chave `(x, y, z)` isto equivale a
+        `a < x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)`. A condição
+        redundante sobre o primeiro campo (`a <= x`) permite à base de dados
+        usar o índice composto como limite do intervalo.
+        """
+        ordering = self.get_ordering(reverse)
+        campos = [f.lstrip("-") for f in ordering]
+        descendente = [f.startswith("-") for f in ordering]
+
+        seek = Q()
+        for i, campo in enumerate(campos):
+            iguais = {campos[j]: values[j] for j in range(i)}
+            lookup = "lt" if descendente[i] else "gt"
+            seek |= Q(**iguais, **{f"{campo}__{lookup}": values[i]})
+
+        limite = "lte" if descendente[0] else "gte"
+        return Q(**{f"{campos[0]}__{limite}": values[0]}) & seek
+
+    # --- Cursor ---
+
+    def encode_cursor(self, obj, reverse: bool) -> str:
+        campos = [f.lstrip("-") for f in self.ordering]
+        # As linhas podem ser instâncias ou dicionários (querysets com `.values()`).
+        valores = [obj[c] if isinstance(obj, dict) else getattr(obj, c) for c in campos]
+        dados = {"v": [_serializar_valor(v) for v in valores], "r": int(reverse)}
+        raw = json.dumps(dados, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            campos = [f.lstrip("-") for f in self.ordering]
+            valores = dados["v"]
+            if len(valores) != len(campos):
+                raise ValueError
+            valores = [
+                (self.cursor_fields.get(campo) or model._meta.get_field(campo)).to_python(valor)
+                for campo, valor in zip(campos, valores)
+            ]
+            return {"values": valores, "reverse": bool(dados.get("r"))}
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = remove_query_param(self.base_url, self.legacy_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        url = remove_query_param(self.base_url, self.legacy_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[0], True))
+
+    def get_page_size(self, request) -> int:
+        try:
+            valor = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if valor <= 0:
+            return self.page_size
+        return min(valor, self.max_page_size)
+
+    # --- Total aproximado ---
+
+    def get_approximate_count(self, queryset) -> int:
+        """
+        Devolve o número (aproximado) de resultados, reutilizando o valor em cache.
+
+        A chave da cache é derivada do SQL da consulta, pelo que filtros
+        diferentes têm totais diferentes. Um valor com até `total_cache_timeout`
+        segundos de atraso é aceitável para mostrar "cerca de N resultados".
+        """
+        try:
+            sql = str(queryset.order_by().query)
+        except EmptyResultSet:
+            return 0
+        chave = "keyset:total:" + hashlib.md5(sql.encode("utf-8")).hexdigest()
+        total = cache.get(chave)
+        if total is None:
+            total = self._estimar_total(queryset)
+            cache.set(chave, total, self.total_cache_timeout)
+        return total
+
+    def _estimar_total(self, queryset) -> int:
+        connection = connections[queryset.db]
+        # Sem filtros, o PostgreSQL já mantém uma estimativa do número de linhas
+        # da tabela (atualizada pelo ANALYZE/autovacuum), que não exige um scan.
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return int(row[0])
+        return queryset.order_by().count()
+
+
+class FilmeKeysetPagination(KeysetPagination):
+    """Paginação do catálogo, na mesma ordem de `Filme.Meta.ordering`."""
+    ordering = ("-media_rating", "titulo", "id")
+
+
+class ReviewKeysetPagination(KeysetPagination):
+    """Paginação das reviews, das mais recentes para as mais antigas."""
+    ordering = ("-created_at", "-id")
+
+
+class BibliotecaKeysetPagination(KeysetPagination):
+    """Paginação da watchlist e dos favoritos, das entradas mais recentes para as mais antigas."""
+    ordering = ("-created_at", "-id")
+
+
+class ReviewRatingKeysetPagination(KeysetPagination):
+    """Paginação das reviews, das mais bem avaliadas para as menos bem avaliadas."""
+    ordering = ("-rating", "-created_at", "-id")
+
+
+class PessoaKeysetPagination(KeysetPagination):
+    """Paginação das pessoas por nome."""
+    ordering = ("nome", "id")
+
+
+class FilmografiaKeysetPagination(KeysetPagination):
+    """
+    Paginação dos créditos de uma pessoa, dos filmes mais recentes para os mais antigos.
+
+    `ano` é uma anotação (`Coalesce(filme__ano_lancamento, 0)`), porque o ano de
+    lançamento pode ser nulo e a chave não.
+    """
+    ordering = ("-ano", "-id")
+    cursor_fields = {"ano": IntegerField()}
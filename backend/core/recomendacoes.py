@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Recomendações item-item a partir das reviews, dos favoritos e da watchlist.
+
+O modelo é treinado fora dos pedidos, pelo comando `build_recommendations`:
+
+1. Cada utilizador é um vetor esparso com um peso por filme: a avaliação da
+   review a dividir por 5, `PESO_FAVORITO` ou `PESO_WATCHLIST` (o maior deles).
+2. A semelhança entre dois filmes é o cosseno entre as suas colunas na matriz
+   utilizadores x filmes. Com NumPy/SciPy instalados, os produtos são calculados
+   com matrizes esparsas; sem eles, com dicionários (o resultado é o mesmo).
+3. Para cada filme ficam apenas os `k` vizinhos mais semelhantes, na tabela
+   `FilmeSemelhante`.
+
+A API só lê a tabela: os filmes semelhantes são uma leitura pelo índice e as
+recomendações de um utilizador somam, numa query, a semelhança dos vizinhos
+dos filmes de que gostou. Uma reconstrução incremental (`desde`) recalcula
+apenas os filmes com interações novas, alteradas ou removidas (ver
+`filmes_alterados`), os que partilham utilizadores com eles e os que os têm
+como vizinhos, cujas semelhanças podem ter mudado.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models.listas import Favorito, Watchlist
+from .models.recomendacao import FilmeSemelhante, InteracaoRemovida
+from .models.review import Review
+
+try:
+    from scipy import sparse
+except ImportError:  # NumPy/SciPy são opcionais.
+    sparse = None
+
+# Peso de cada tipo de interação (as reviews valem `rating / 5`).
+PESO_FAVORITO = 1.0
+PESO_WATCHLIST = 0.5
+
+# Avaliação mínima para uma review servir de base às recomendações.
+RATING_MINIMO_RECOMENDACAO = 3
+
+# Filmes calculados de cada vez no produto de matrizes esparsas.
+BLOCO_SCIPY = 1000
+
+
+def carregar_interacoes() -> dict[int, dict[int, float]]:
+    """
+    Lê as interações de todos os utilizadores, com três queries.
+
+    Returns:
+        Para cada utilizador, o peso de cada filme com que interagiu.
+    """
+    interacoes: dict[int, dict[int, float]] = defaultdict(dict)
+
+    def registar(linhas):
+        for utilizador_id, filme_id, peso in linhas:
+            filmes = interacoes[utilizador_id]
+            filmes[filme_id] = max(filmes.get(filme_id, 0.0), peso)
+
+    reviews = Review.objects.values_list("autor_id", "filme_id", "rating").iterator()
+    registar((u, f, rating / 5) for u, f, rating in reviews)
+    for modelo, peso in ((Favorito, PESO_FAVORITO), (Watchlist, PESO_WATCHLIST)):
+        linhas = modelo.objects.values_list("utilizador_id", "filme_id").iterator()
+        registar((u, f, peso) for u, f in linhas)
+    return interacoes
+
+
+def _colunas(interacoes) -> dict[int, dict[int, float]]:
+    """Transpõe as interações: para cada filme, o peso de cada utilizador."""
+    colunas: dict[int, dict[int, float]] = defaultdict(dict)
+    for utilizador_id, filmes in interacoes.items():
+        for filme_id, peso in filmes.items():
+            colunas[filme_id][utilizador_id] = peso
+    return colunas
+
+
+def _produtos_python(interacoes, colunas, alvo):
+    for i in alvo:
+        produtos: dict[int, float] = defaultdict(float)
+        for utilizador_id, peso_i in colunas.get(i, {}).items():
+            for j, peso_j in interacoes[utilizador_id].items():
+                if j != i:
+                    produtos[j] += peso_i * peso_j
+        yield i, produtos
+
+
+def _produtos_scipy(interacoes, colunas, alvo):
+    filmes = list(colunas)
+    indice = {f: n for n, f in enumerate(filmes)}
+    linhas, cols, dados = [], [], []
+    for n, pesos in enumerate(interacoes.values()):
+        for filme_id, peso in pesos.items():
+            linhas.append(n)
+            cols.append(indice[filme_id])
+            dados.append(peso)
+    matriz = sparse.csc_matrix((dados, (linhas, cols)), shape=(len(interacoes), len(filmes)))
+    transposta = matriz.T.tocsr()
+
+    alvo = list(alvo)
+    for i in alvo:
+        if i not in indice:
+            yield i, {}
+    alvo = [indice[i] for i in alvo if i in indice]
+    for inicio in range(0, len(alvo), BLOCO_SCIPY):
+        bloco = alvo[inicio:inicio + BLOCO_SCIPY]
+        produtos = (transposta @ matriz[:, bloco]).tocsc()
+        for n, c in enumerate(bloco):
+            de, ate = produtos.indptr[n], produtos.indptr[n + 1]
+            yield filmes[c], {
+                filmes[r]: float(v)
+                for r, v in zip(produtos.indices[de:ate], produtos.data[de:ate])
+                if r != c and v > 0
+            }
+
+
+def calcular_vizinhos(interacoes, k: int = 20, filmes=None) -> dict[int, list[tuple[int, float]]]:
+    """
+    Calcula os `k` filmes mais semelhantes (cosseno) a cada filme pedido.
+
+    Args:
+        interacoes: O resultado de `carregar_interacoes`.
+        k: Número de vizinhos por filme.
+        filmes: Os ids dos filmes a calcular (por defeito, todos os que têm interações).
+
+    Returns:
+        Para cada filme, os pares `(id do vizinho, semelhança)` por ordem
+        decrescente de semelhança (e crescente de id, em caso de empate).
+    """
+    colunas = _colunas(interacoes)
+    normas = {f: math.sqrt(sum(p * p for p in pesos.values())) for f, pesos in colunas.items()}
+    alvo = colunas.keys() if filmes is None else filmes
+    calcular = _produtos_scipy if sparse is not None else _produtos_python
+
+    vizinhos = {}
+    for i, produtos in calcular(interacoes, colunas, alvo):
+        scores = ((j, produto / (normas[i] * normas[j])) for j, produto in produtos.items())
+        vizinhos[i] = heapq.nsmallest(k, scores, key=lambda par: (-par[1], par[0]))
+    return vizinhos
+
+
+def afetados(interacoes, alterados) -> set[int]:
+    """Os filmes alterados e os que partilham pelo menos um utilizador com eles."""
+    alterados = set(alterados)
+    resultado = set(alterados)
+    for filmes in interacoes.values():
+        if not alterados.isdisjoint(filmes):
+            resultado.update(filmes)
+    return resultado
+
+
+def registar_remocoes(filmes) -> None:
+    """Regista que os `filmes` perderam uma interação (ver `InteracaoRemovida`)."""
+    agora = timezone.now()
+    InteracaoRemovida.objects.bulk_create([InteracaoRemovida(filme_id=f, removida_em=agora) for f in filmes])
+
+
+def agendar_remocoes(filmes) -> None:
+    """Regista as remoções depois do commit da transação atual (ou já, fora de uma)."""
+    filmes = list(filmes)
+    if filmes:
+        transaction.on_commit(partial(registar_remocoes, filmes))
+
+
+def filmes_alterados(desde) -> set[int]:
+    """
+    Os filmes cujas interações mudaram depois de `desde`, numa query.
+
+    São os filmes com reviews criadas ou editadas, entradas novas nos favoritos
+    ou na watchlist e interações removidas (`InteracaoRemovida`).
+    """
+    fontes = [
+        Review.objects.filter(updated_at__gt=desde),
+        Favorito.objects.filter(created_at__gt=desde),
+        Watchlist.objects.filter(created_at__gt=desde),
+        InteracaoRemovida.objects.filter(removida_em__gt=desde),
+    ]
+    primeira, *outras = (fonte.order_by().values_list("filme_id", flat=True) for fonte in fontes)
+    return set(primeira.union(*outras))
+
+
+def ultima_construcao():
+    """A data da última reconstrução do modelo (None se a tabela estiver vazia)."""
+    return FilmeSemelhante.objects.aggregate(ultima=Max("calculado_em"))["ultima"]
+
+
+def construir(k: int = 20, desde=None) -> dict:
+    """
+    Treina o modelo e grava os vizinhos de cada filme em `FilmeSemelhante`.
+
+    Args:
+        k: Número de vizinhos por filme.
+        desde: Se indicado, recalcula apenas os filmes com interações alteradas
+            depois desta data e os filmes afetados por eles; senão, reconstrói
+            a tabela toda.
+
+    Returns:
+        O número de filmes recalculados e de vizinhos gravados.
+    """
+    agora = timezone.now()
+    interacoes = carregar_interacoes()
+    if desde is None:
+        vizinhos = calcular_vizinhos(interacoes, k)
+        apagar = FilmeSemelhante.objects.all()
+    else:
+        alterados = filmes_alterados(desde)
+        # Os filmes que deixaram de partilhar utilizadores com um filme alterado
+        # só são encontrados pelos vizinhos gravados.
+        anteriores = FilmeSemelhante.objects.filter(semelhante_id__in=alterados).values_list("filme_id", flat=True)
+        alvo = afetados(interacoes, alterados) | set(anteriores)
+        vizinhos = calcular_vizinhos(interacoes, k, alvo)
+        apagar = FilmeSemelhante.objects.filter(filme_id__in=alvo)
+
+    objetos = [
+        FilmeSemelhante(filme_id=i, semelhante_id=j, score=score, calculado_em=agora)
+        for i, lista in vizinhos.items()
+        for j, score in lista
+    ]
+    with transaction.atomic():
+        apagar.delete()
+        FilmeSemelhante.objects.bulk_create(objetos, batch_size=1000)
+        # As remoções anteriores a esta reconstrução já estão refletidas nela.
+        InteracaoRemovida.objects.filter(removida_em__lt=agora).delete()
+    return {"filmes": len(vizinhos), "vizinhos": len(objetos)}
+
+
+def recomendar(utilizador_id: int, limite: int = 20) -> list[tuple[int, float]]:
+    """
+    Recomenda filmes a um utilizador a partir dos vizinhos dos filmes de que gostou.
+
+    O score de um filme é a soma das suas semelhanças com os filmes favoritos,
+    da watchlist ou com review de pelo menos `RATING_MINIMO_RECOMENDACAO`
+    estrelas. Os filmes com que o utilizador já interagiu são excluídos. É uma
+    única query, que usa o índice `(filme, -score)`.
+
+    Returns:
+        Os pares `(id do filme, score)`, do mais para o menos recomendado.
+    """
+    avaliados = Review.objects.filter(autor_id=utilizador_id)
+    favoritos = Favorito.objects.filter(utilizador_id=utilizador_id).values("filme_id")
+    watchlist = Watchlist.objects.filter(utilizador_id=utilizador_id).values("filme_id")
+    gostou = (
+        Q(filme_id__in=avaliados.filter(rating__gte=RATING_MINIMO_RECOMENDACAO).values("filme_id"))
+        | Q(filme_id__in=favoritos)
+        | Q(filme_id__in=watchlist)
+    )
+    conhecidos = (
+        Q(semelhante_id__in=avaliados.values("filme_id"))
+        | Q(semelhante_id__in=favoritos)
+        | Q(semelhante_id__in=watchlist)
+    )
+    linhas = (
+        FilmeSemelhante.objects.filter(gostou).exclude(conhecidos)
+        .values("semelhante_id").annotate(total=Sum("score"))
+        .order_by("-total", "semelhante_id")
+        .values_list("semelhante_id", "total")[:limite]
+    )
+    return list(linhas)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Renderers da API: JSON com orjson e MessagePack.
+
+`JSONRapidoRenderer` produz o mesmo JSON que o `JSONRenderer` do DRF, mas com
+o orjson (várias vezes mais rápido nas listagens grandes). Os tipos que o
+orjson não conhece, ou que o DRF representa de outra forma (datas com hora,
+`Decimal`, textos traduzíveis, querysets), passam pelo `JSONEncoder` do DRF.
+Sem o orjson instalado, ou quando é pedida indentação (a API navegável), o
+JSON é gerado pela biblioteca padrão, como antes.
+
+`MessagePackRenderer` serve `application/msgpack` aos clientes internos que o
+peçam no cabeçalho `Accept` (ou com `?format=msgpack`). Só é registado com o
+pacote `msgpack` instalado (ver `API_MSGPACK` em `settings.py`).
+"""
+from __future__ import annotations
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - opcional
+    msgpack = None
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """`JSONRenderer` com o orjson, com a biblioteca padrão como alternativa."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        renderer_context = renderer_context or {}
+        if (
+            self.get_indent(accepted_media_type, renderer_context)
+            or not api_settings.UNICODE_JSON
+            or not api_settings.COMPACT_JSON
+        ):
+            # O orjson só indenta com 2 espaços, sem espaços nos separadores, e escreve sempre UTF-8.
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # As datas passam pelo encoder do DRF, que corta os microssegundos e usa `Z`.
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except (TypeError, orjson.JSONEncodeError):
+            # Ex: inteiros com mais de 64 bits.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Como o DRF: U+2028 e U+2029 são válidos em JSON, mas não em JavaScript.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderiza em MessagePack, com os mesmos valores que o JSON."""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encoders.JSONEncoder().default, use_bin_type=True)
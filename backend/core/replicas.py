@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Leituras do catálogo nas réplicas da base de dados.
+
+As réplicas são as ligações de `settings.DATABASE_REPLICAS` (definidas com
+`DB_REPLICAS`, ver `settings.py`). Só as leituras públicas do catálogo lá são
+feitas: as views que usam `LeituraReplicaMixin` indicam em `replica_actions` as
+ações que podem ir para uma réplica (ex: a listagem e o detalhe de
+`FilmeViewSet`), e o `ReplicaRouter` envia para a réplica escolhida todas as
+leituras feitas durante esses pedidos. Tudo o resto (escritas, leituras do
+próprio utilizador, comandos) usa a `default`.
+
+Uma réplica pode estar atrasada em relação à primária. Para que quem acabou de
+escrever leia o que escreveu, as respostas a escritas bem-sucedidas definem
+uma cookie (`REPLICA_STICKY_COOKIE`) com a duração de `REPLICA_STICKY_SECONDS`,
+durante a qual os pedidos desse cliente são servidos pela primária (ver
+`PrimariaAposEscritaMiddleware`).
+"""
+from __future__ import annotations
+
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+METODOS_SEGUROS = ("GET", "HEAD", "OPTIONS")
+
+# A réplica usada pelas leituras do pedido em curso (None: a `default`).
+_replica: contextvars.ContextVar[str | None] = contextvars.ContextVar("replica", default=None)
+
+
+def replica_atual() -> str | None:
+    return _replica.get()
+
+
+def escolher_replica(request) -> str | None:
+    """
+    A réplica que serve as leituras de `request`, ou None se tiver de ser a primária.
+
+    É a primária se não houver réplicas, se o pedido não for uma leitura ou se
+    o cliente tiver escrito há pouco tempo (cookie `REPLICA_STICKY_COOKIE`).
+    """
+    if not settings.DATABASE_REPLICAS or request.method not in METODOS_SEGUROS:
+        return None
+    if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def usar_replica(alias: str | None):
+    """Envia para `alias` as leituras feitas dentro do bloco (None: a primária)."""
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class LeituraReplicaMixin:
+    """
+    Serve numa réplica as ações de leitura indicadas em `replica_actions`.
+
+    A réplica é escolhida uma vez por pedido, para que todas as queries do
+    pedido (validadores, contagens, páginas) leiam a mesma base de dados.
+    """
+    replica_actions: frozenset[str] = frozenset()
+
+    def dispatch(self, request, *args, **kwargs):
+        acao = getattr(self, "action_map", {}).get(request.method.lower())
+        alias = escolher_replica(request) if acao in self.replica_actions else None
+        with usar_replica(alias):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    Router de bases de dados: as leituras marcadas com `usar_replica` vão para
+    a réplica, as escritas vão sempre para a `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sem router, um objeto lido da réplica seria gravado nela.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As réplicas têm os mesmos dados que a primária.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O esquema das réplicas vem da primária (replicação).
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
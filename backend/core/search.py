@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Pesquisa de texto integral sobre filmes, pessoas e reviews.
+
+Existem duas implementações, escolhidas pelo motor de base de dados:
+
+- PostgreSQL: cada tabela tem uma coluna `search_vector` (tsvector) mantida por
+  um trigger e indexada com GIN; os títulos e nomes têm também um índice de
+  trigramas (`pg_trgm`), que permite encontrar resultados com erros de escrita.
+- SQLite: uma tabela virtual FTS5 (`core_pesquisa_fts`), mantida por triggers,
+  com o texto das três tabelas. Serve o desenvolvimento local (`USE_POSTGRES=0`)
+  e os testes.
+
+As colunas, triggers e índices são criados pela migração `0007_pesquisa` (os
+triggers do SQLite por `garantir_indice_fts5`, após cada `migrate`); os modelos
+não os conhecem, pelo que nunca são lidos nem escritos pelo ORM.
+"""
+from __future__ import annotations
+
+import re
+
+from django.db import connection, connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from .models.filme import Filme
+from .models.pessoa import Pessoa
+from .models.review import Review
+
+# Configuração de texto do PostgreSQL usada nos triggers (ver migração 0007).
+# 'simple' não aplica stemming, o que evita resultados estranhos num catálogo
+# com títulos em várias línguas.
+CONFIG_PESQUISA = "simple"
+
+# Tabela FTS5 usada em SQLite. O `rowid` codifica o tipo e o id do objeto.
+TABELA_FTS = "core_pesquisa_fts"
+
+TIPOS = {
+    # tipo: (modelo, código no rowid FTS5, campos devolvidos, campo com trigramas)
+    "filme": (Filme, 0, ("id", "slug", "titulo", "ano_lancamento", "poster"), "titulo"),
+    "pessoa": (Pessoa, 1, ("id", "slug", "nome", "foto"), "nome"),
+    "review": (Review, 2, ("id", "titulo", "rating", "filme__slug", "filme__titulo"), None),
+}
+
+# Colunas indexadas no FTS5 por tipo: (coluna para `titulo`, coluna para `texto`).
+COLUNAS_FTS = {
+    "filme": ("titulo", "descricao"),
+    "pessoa": ("nome", "bio"),
+    "review": ("titulo", "texto"),
+}
+
+
+def pesquisar(termos: str, tipos=None, limite: int = 20) -> list[dict]:
+    """
+    Pesquisa `termos` nos tipos indicados e devolve resultados ordenados por relevância.
+
+    Args:
+        termos: O texto pesquisado.
+        tipos: Os tipos a pesquisar (subconjunto de `TIPOS`); todos, por defeito.
+        limite: O número máximo de resultados devolvidos.
+
+    Returns:
+        Uma lista de dicionários com `tipo`, `score` e os campos do objeto.
+    """
+    tipos = [t for t in (tipos or TIPOS) if t in TIPOS]
+    if connection.vendor == "postgresql":
+        resultados = [r for tipo in tipos for r in _pesquisar_postgres(tipo, termos, limite)]
+    else:
+        resultados = _pesquisar_fts5(tipos, termos, limite)
+    resultados.sort(key=lambda r: r["score"], reverse=True)
+    return resultados[:limite]
+
+
+# --- PostgreSQL ---
+
+def _pesquisar_postgres(tipo: str, termos: str, limite: int) -> list[dict]:
+    from django.contrib.postgres.search import (
+        SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity,
+    )
+
+    modelo, _, campos, campo_trigramas = TIPOS[tipo]
+    tabela = modelo._meta.db_table
+    vetor = RawSQL(f'"{tabela}"."search_vector"', [], output_field=SearchVectorField())
+    query = SearchQuery(termos, config=CONFIG_PESQUISA, search_type="websearch")
+
+    queryset = modelo.objects.annotate(vetor=vetor)
+    condicao = Q(vetor=query)
+    score = SearchRank(F("vetor"), query)
+    if campo_trigramas:
+        # `trigram_similar` usa o operador `%`, servido pelo índice GIN de trigramas.
+        condicao |= Q(**{f"{campo_trigramas}__trigram_similar": termos})
+        score = Greatest(score, TrigramSimilarity(campo_trigramas, termos), output_field=FloatField())
+
+    linhas = (
+        queryset.filter(condicao)
+        .annotate(score=score)
+        .order_by("-score")
+        .values(*campos, "score")[:limite]
+    )
+    return [{"tipo": tipo, **linha} for linha in linhas]
+
+
+# --- SQLite (FTS5) ---
+
+def _expressao_fts5(termos: str) -> str:
+    """
+    Converte o texto do utilizador numa expressão FTS5 segura.
+
+    Cada palavra é citada (para que a sintaxe FTS5 não seja interpretada) e
+    pesquisada como prefixo, o que tolera palavras incompletas.
+    """
+    palavras = re.findall(r"\w+", termos, flags=re.UNICODE)
+    return " ".join(f'"{p}"*' for p in palavras)
+
+
+def _pesquisar_fts5(tipos, termos: str, limite: int) -> list[dict]:
+    expressao = _expressao_fts5(termos)
+    if not expressao or not tipos:
+        return []
+    codigos = {TIPOS[t][1]: t for t in tipos}
+    marcadores = ", ".join(["%s"] * len(codigos))
+    with connection.cursor() as cursor:
+        # bm25() devolve valores menores para resultados mais relevantes; o
+        # título pesa dez vezes mais do que o texto.
+        cursor.execute(
+            f"SELECT rowid, -bm25({TABELA_FTS}, 10.0, 1.0) AS score FROM {TABELA_FTS} "
+            f"WHERE {TABELA_FTS} MATCH %s AND rowid %% 3 IN ({marcadores}) "
+            f"ORDER BY bm25({TABELA_FTS}, 10.0, 1.0) LIMIT %s",
+            [expressao, *codigos, limite],
+        )
+        encontrados = cursor.fetchall()
+
+    por_tipo: dict[str, dict[int, float]] = {}
+    for rowid, score in encontrados:
+        por_tipo.setdefault(codigos[rowid % 3], {})[rowid // 3] = score
+
+    resultados = []
+    for tipo, scores in por_tipo.items():
+        modelo, _, campos, _ = TIPOS[tipo]
+        for linha in modelo.objects.filter(pk__in=scores).values(*campos):
+            resultados.append({"tipo": tipo, **linha, "score": scores[linha["id"]]})
+    return resultados
+
+
+def _triggers_fts5(tabela: str, codigo: int, col_titulo: str, col_texto: str) -> dict[str, str]:
+    rowid = "{r}.id * 3 + %d" % codigo
+    return {
+        f"{tabela}_fts_ai": f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_fts_ai AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO {TABELA_FTS}(rowid, titulo, texto)
+                VALUES ({rowid.format(r="NEW")}, NEW.{col_titulo}, NEW.{col_texto});
+            END""",
+        f"{tabela}_fts_au": f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_fts_au AFTER UPDATE OF {col_titulo}, {col_texto} ON {tabela} BEGIN
+                UPDATE {TABELA_FTS} SET titulo = NEW.{col_titulo}, texto = NEW.{col_texto}
+                WHERE rowid = {rowid.format(r="NEW")};
+            END""",
+        f"{tabela}_fts_ad": f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_fts_ad AFTER DELETE ON {tabela} BEGIN
+                DELETE FROM {TABELA_FTS} WHERE rowid = {rowid.format(r="OLD")};
+            END""",
+    }
+
+
+def garantir_indice_fts5(using: str = "default") -> None:
+    """
+    Garante que os triggers FTS5 existem em SQLite e reconstrói o índice se faltarem.
+
+    O SQLite não suporta a maioria dos `ALTER TABLE`, pelo que o Django recria a
+    tabela (e perde os seus triggers) em muitas migrações. Esta função é chamada
+    após cada `migrate` e só reindexa as tabelas cujos triggers desapareceram.
+    """
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = {nome for (nome,) in cursor.fetchall()}
+        if TABELA_FTS not in existentes:
+            return
+        for tipo, (modelo, codigo, _, _) in TIPOS.items():
+            tabela = modelo._meta.db_table
+            col_titulo, col_texto = COLUNAS_FTS[tipo]
+            triggers = _triggers_fts5(tabela, codigo, col_titulo, col_texto)
+            if existentes.issuperset(triggers):
+                continue
+            for sql in triggers.values():
+                cursor.execute(sql)
+            cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE rowid % 3 = {codigo}")
+            cursor.execute(
+                f"INSERT INTO {TABELA_FTS}(rowid, titulo, texto) "
+                f"SELECT id * 3 + {codigo}, {col_titulo}, {col_texto} FROM {tabela}"
+            )
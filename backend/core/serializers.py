@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
+import json
+
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import StreamingHttpResponse
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 
@@ -7,6 +11,8 @@ from .models.taxonomia import Genero
 from .models.pessoa import Pessoa
 from .models.filme import Filme
 from .models.review import Review
+from .models.elenco import Elenco
+from .models.video import Video
 from .models.listas import Watchlist, Favorito
 
 User = get_user_model()
@@ -21,6 +27,16 @@ class PessoaSerializer(serializers.ModelSerializer):
         model = Pessoa
         fields = ["id", "nome", "slug", "bio", "foto"]
 
+class PessoaEstatisticasSerializer(PessoaSerializer):
+    # Preenchidos por anotações em PessoaViewSet (ver `anotar_estatisticas_pessoa`).
+    total_filmes = serializers.IntegerField(read_only=True)
+    media_rating_filmes = serializers.FloatField(read_only=True, allow_null=True)
+    primeiro_ano = serializers.IntegerField(read_only=True, allow_null=True)
+    ultimo_ano = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta(PessoaSerializer.Meta):
+        fields = PessoaSerializer.Meta.fields + ["total_filmes", "media_rating_filmes", "primeiro_ano", "ultimo_ano"]
+
 class FilmeListSerializer(serializers.ModelSerializer):
     generos = GeneroSerializer(many=True, read_only=True)
     class Meta:
@@ -30,16 +46,239 @@ class FilmeListSerializer(serializers.ModelSerializer):
             "media_rating", "poster", "backdrop", "generos"
         ]
 
-class FilmeDetailSerializer(FilmeListSerializer):
+class FilmeListStatusSerializer(FilmeListSerializer):
+    # Preenchidos por anotações `Exists()` na listagem (`?include=status`).
+    in_watchlist = serializers.BooleanField(read_only=True)
+    is_favorite = serializers.BooleanField(read_only=True)
+
+    class Meta(FilmeListSerializer.Meta):
+        fields = FilmeListSerializer.Meta.fields + ["in_watchlist", "is_favorite"]
+
+class FilmeScoreSerializer(FilmeListSerializer):
+    # Só documenta o esquema OpenAPI: as respostas usam `FilmeScoreRapidoSerializer`.
+    score = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta(FilmeListSerializer.Meta):
+        fields = FilmeListSerializer.Meta.fields + ["score"]
+
+def _consulta_generos(filme_ids):
+    """
+    A query de `generos_por_filme` e se as suas linhas já vêm agrupadas por filme.
+
+    Em PostgreSQL a agregação é feita pela base de dados (`JSONBAgg`, uma linha
+    por filme); nas restantes bases de dados as ligações são lidas já ordenadas
+    e agrupadas num dicionário por `_agrupar_generos`.
+    """
+    ligacoes = Filme.generos.through.objects.filter(filme_id__in=filme_ids)
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.aggregates import JSONBAgg
+        from django.db.models.functions import JSONObject
+
+        linhas = ligacoes.values("filme_id").annotate(
+            generos=JSONBAgg(
+                JSONObject(id="genero__id", nome="genero__nome", slug="genero__slug"),
+                order_by=("genero__nome", "genero__id"),
+            )
+        ).values_list("filme_id", "generos")
+        return linhas, True
+    linhas = ligacoes.order_by("genero__nome", "genero__id").values_list(
+        "filme_id", "genero__id", "genero__nome", "genero__slug"
+    )
+    return linhas, False
+
+def _agrupar_generos(linhas, agrupadas: bool) -> dict[int, list[dict]]:
+    if agrupadas:
+        return dict(linhas)
+    agrupados: dict[int, list[dict]] = {}
+    for filme_id, genero_id, nome, slug in linhas:
+        agrupados.setdefault(filme_id, []).append({"id": genero_id, "nome": nome, "slug": slug})
+    return agrupados
+
+def generos_por_filme(filme_ids) -> dict[int, list[dict]]:
+    """Devolve os géneros de vários filmes numa única query, agrupados por filme."""
+    linhas, agrupadas = _consulta_generos(filme_ids)
+    return _agrupar_generos(linhas, agrupadas)
+
+async def ageneros_por_filme(filme_ids) -> dict[int, list[dict]]:
+    """Versão assíncrona de `generos_por_filme`, para as views de `views_async.py`."""
+    linhas, agrupadas = _consulta_generos(filme_ids)
+    return _agrupar_generos([linha async for linha in linhas], agrupadas)
+
+class _FilmeListRapidoListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        linhas = list(data)
+        # Os géneros podem vir já carregados no contexto (ex: pelas views assíncronas).
+        generos = self.context.get("generos")
+        if generos is None:
+            generos = generos_por_filme([linha["id"] for linha in linhas])
+        campos = self.child.Meta.fields
+        return [
+            {c: generos.get(linha["id"], []) if c == "generos" else linha[c] for c in campos}
+            for linha in linhas
+        ]
+
+class FilmeListRapidoSerializer(serializers.BaseSerializer):
+    """
+    Serialização rápida (só de leitura) da listagem de filmes.
+
+    Recebe linhas de `.values(*FilmeListRapidoSerializer.campos_values())` em vez de
+    instâncias, não usa os campos genéricos do DRF e carrega os géneros de toda
+    a página com uma única query. Produz exatamente o mesmo JSON que
+    `FilmeListSerializer`.
+    """
+    class Meta:
+        fields = FilmeListSerializer.Meta.fields
+        list_serializer_class = _FilmeListRapidoListSerializer
+
+    @classmethod
+    def campos_values(cls) -> list[str]:
+        return [c for c in cls.Meta.fields if c != "generos"]
+
+    def to_representation(self, instance):
+        return _FilmeListRapidoListSerializer(child=self).to_representation([instance])[0]
+
+class FilmeListStatusRapidoSerializer(FilmeListRapidoSerializer):
+    class Meta(FilmeListRapidoSerializer.Meta):
+        fields = FilmeListStatusSerializer.Meta.fields
+
+class FilmeScoreRapidoSerializer(FilmeListRapidoSerializer):
+    """Filmes semelhantes/recomendados: a listagem rápida com o `score` de cada filme."""
+    class Meta(FilmeListRapidoSerializer.Meta):
+        fields = FilmeListRapidoSerializer.Meta.fields + ["score"]
+
+class _ItemBibliotecaListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        linhas = list(data)
+        campos = FilmeListRapidoSerializer.campos_values()
+        filmes = FilmeListRapidoSerializer(
+            [{c: linha["filme_id" if c == "id" else f"filme__{c}"] for c in campos} for linha in linhas],
+            many=True,
+            context=self.context,
+        ).data
+        data_hora = serializers.DateTimeField()
+        return [
+            {"id": linha["id"], "created_at": data_hora.to_representation(linha["created_at"]), "filme": filme}
+            for linha, filme in zip(linhas, filmes)
+        ]
+
+class ItemBibliotecaRapidoSerializer(serializers.BaseSerializer):
+    """
+    Uma entrada da watchlist ou dos favoritos, com o filme no formato da listagem.
+
+    Recebe linhas de `.values(*ItemBibliotecaRapidoSerializer.campos_values())`,
+    com o filme lido por JOIN; os géneros vêm no contexto (`generos`) ou são
+    carregados com uma query por página, como em `FilmeListRapidoSerializer`.
+    """
+    class Meta:
+        list_serializer_class = _ItemBibliotecaListSerializer
+
+    @classmethod
+    def campos_values(cls) -> list[str]:
+        filme = [f"filme__{c}" for c in FilmeListRapidoSerializer.campos_values() if c != "id"]
+        return ["id", "created_at", "filme_id", *filme]
+
+    def to_representation(self, instance):
+        return _ItemBibliotecaListSerializer(child=self, context=self.context).to_representation([instance])[0]
+
+class ItemBibliotecaSerializer(serializers.Serializer):
+    # Só documenta o esquema OpenAPI: as respostas usam `ItemBibliotecaRapidoSerializer`.
+    id = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    filme = FilmeListSerializer(read_only=True)
+
+class PaginaBibliotecaSerializer(serializers.Serializer):
+    # Só documenta o esquema OpenAPI: uma página de `BibliotecaKeysetPagination`.
+    next = serializers.URLField(read_only=True, allow_null=True)
+    previous = serializers.URLField(read_only=True, allow_null=True)
+    results = ItemBibliotecaSerializer(many=True, read_only=True)
+
+def _valores_parametro(params, nome: str) -> set[str]:
+    return {c.strip() for valor in params.getlist(nome) for c in valor.split(",") if c.strip()}
+
+class CamposDinamicosMixin:
+    """
+    Seleção de campos pela query string do pedido.
+
+    - `?fields=a,b` devolve só os campos indicados;
+    - `?expand=x,y` escolhe quais dos campos em `Meta.expandable_fields` (relações
+      que custam queries extra) são incluídos. Sem `expand`, são todos incluídos;
+      `?expand=` (vazio) não inclui nenhum.
+
+    A view usa `campos_incluidos` para só carregar as relações que vão ser devolvidas.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is not None:
+            incluidos = self.campos_incluidos(request.query_params)
+            for nome in set(self.fields) - incluidos:
+                self.fields.pop(nome)
+
+    @classmethod
+    def campos_incluidos(cls, params) -> set[str]:
+        campos = set(cls.Meta.fields)
+        if "expand" in params:
+            expansiveis = set(getattr(cls.Meta, "expandable_fields", ()))
+            campos -= expansiveis - _valores_parametro(params, "expand")
+        if "fields" in params:
+            campos &= _valores_parametro(params, "fields")
+        return campos
+
+class PessoaMiniSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Pessoa
+        fields = ["id", "nome", "slug", "foto"]
+
+class CreditoSerializer(serializers.ModelSerializer):
+    pessoa = PessoaMiniSerializer(read_only=True)
+
+    class Meta:
+        model = Elenco
+        fields = ["pessoa", "papel", "ordem_credito"]
+
+class VideoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Video
+        fields = ["id", "titulo", "tipo", "site", "key", "url", "idioma"]
+
+class FilmeMiniSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Filme
+        fields = ["id", "titulo", "slug", "ano_lancamento", "media_rating", "poster"]
+
+class FilmografiaSerializer(serializers.ModelSerializer):
+    filme = FilmeMiniSerializer(read_only=True)
+
+    class Meta:
+        model = Elenco
+        fields = ["id", "papel", "ordem_credito", "filme"]
+
+class FilmeDetailSerializer(CamposDinamicosMixin, FilmeListSerializer):
+    # Esperam os `Prefetch` de FilmeViewSet: créditos por `ordem_credito` (com a
+    # pessoa por JOIN) e vídeos ordenados por `tipo`.
+    creditos = CreditoSerializer(many=True, read_only=True)
+    videos = serializers.SerializerMethodField()
+
     class Meta(FilmeListSerializer.Meta):
         fields = FilmeListSerializer.Meta.fields + [
-            "descricao", "imdb_id", "created_at", "updated_at"
+            "descricao", "imdb_id", "created_at", "updated_at", "creditos", "videos"
         ]
+        expandable_fields = ["creditos", "videos"]
+
+    def get_videos(self, obj) -> dict[str, list[dict]]:
+        """Os vídeos do filme agrupados por tipo (ex: `{"trailer": [...]}`)."""
+        agrupados: dict[str, list[dict]] = {}
+        for video in obj.videos.all():
+            agrupados.setdefault(video.tipo, []).append(VideoSerializer(video).data)
+        return agrupados
 
 class FilmeWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Filme
         fields = '__all__'
+        # Mantidos pelos sinais de Review; não podem ser escritos pela API.
+        read_only_fields = ["rating_sum", "reviews_count", "media_rating"]
 
 class UserMiniSerializer(serializers.ModelSerializer):
     class Meta:
@@ -55,6 +294,41 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ["id", "autor", "titulo", "texto", "rating", "spoiler", "created_at", "updated_at"]
         read_only_fields = ["autor", "created_at", "updated_at"]
 
+# Colunas lidas por `stream_reviews_json`, com o mesmo formato de ReviewSerializer.
+_REVIEW_STREAM_CAMPOS = (
+    "id", "autor_id", "autor__username", "titulo", "texto", "rating", "spoiler", "created_at", "updated_at",
+)
+
+def stream_reviews_json(queryset, chunk_size: int = 2000) -> StreamingHttpResponse:
+    """
+    Devolve um array JSON de reviews gerado à medida que é enviado ao cliente.
+
+    Em vez de instanciar modelos e serializers para todas as linhas, lê tuplos
+    com `values_list().iterator()` (sem cache do queryset), de forma que a
+    memória usada não depende do número de reviews exportadas.
+    """
+    data_hora = serializers.DateTimeField()
+
+    def gerar():
+        yield "["
+        for i, (pk, autor_id, username, titulo, texto, rating, spoiler, criada, atualizada) in enumerate(
+            queryset.values_list(*_REVIEW_STREAM_CAMPOS).iterator(chunk_size=chunk_size)
+        ):
+            linha = {
+                "id": pk,
+                "autor": {"id": autor_id, "username": username},
+                "titulo": titulo,
+                "texto": texto,
+                "rating": rating,
+                "spoiler": spoiler,
+                "created_at": data_hora.to_representation(criada),
+                "updated_at": data_hora.to_representation(atualizada),
+            }
+            yield ("," if i else "") + json.dumps(linha, ensure_ascii=False)
+        yield "]"
+
+    return StreamingHttpResponse(gerar(), content_type="application/json")
+
 class WatchlistSerializer(serializers.ModelSerializer):
     utilizador = UserMiniSerializer(read_only=True)
     filme_id = serializers.PrimaryKeyRelatedField(source="filme", queryset=Filme.objects.all(), write_only=True)
@@ -6,58 +6,119 @@ Os sinais são um mecanismo do Django que permite que certas ações (remetentes
 notifiquem outras partes da aplicação (receptores) quando um evento ocorre.
 
 Neste ficheiro, definimos receptores que são acionados sempre que uma `Review`
-é guardada (`post_save`) ou apagada (`post_delete`). A função destes receptores
-é recalcular e atualizar os campos agregados `media_rating` e `reviews_count`
-no modelo `Filme` correspondente, mantendo assim os dados consistentes e
-otimizados para leitura.
+é guardada (`pre_save`/`post_save`) ou apagada (`post_delete`). A função destes
+receptores é manter os campos agregados `rating_sum`, `reviews_count` e
+`media_rating` no modelo `Filme` correspondente, aplicando apenas a diferença
+introduzida pela review (em vez de recalcular todas as reviews do filme),
+mantendo assim os dados consistentes e otimizados para leitura.
+
+Escritas que não emitem sinais (`bulk_create`, `QuerySet.update`, SQL direto)
+não atualizam os agregados; o comando `recompute_aggregates` reconstrói-os.
+
+Definimos também os receptores que invalidam a cache versionada das respostas
+do catálogo (ver `caching.py`) quando um `Filme`, um `Genero` ou a relação
+entre ambos mudam, e quando os créditos, os vídeos ou as pessoas de um filme
+mudam, e os que mantêm as contagens materializadas das facetas do catálogo
+(ver `facetas.py`), o ranking de tendências (ver `tendencias.py`) e os
+contadores da biblioteca de cada utilizador (ver `biblioteca.py`), o que
+regista as interações removidas para as recomendações (ver `recomendacoes.py`)
+e o que invalida a cache de utilizadores da autenticação JWT (ver `authentication.py`).
 """
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import (
+    post_save, post_delete, pre_save, pre_delete, m2m_changed, post_migrate,
+)
+from collections import Counter
+
 from django.dispatch import receiver
 from django.apps import apps
-from django.db.models import Avg, Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models.filme import expressao_media_rating
+from . import biblioteca, facetas, recomendacoes, tendencias
+from .authentication import utilizadores
+from .caching import (
+    incrementar_versoes, versao_filme, versao_genero, VERSAO_CATALOGO, VERSAO_GENEROS, VERSAO_PESSOAS,
+)
 
 # --- Carregamento dinâmico dos modelos ---
 # `apps.get_model` é usado para obter as classes dos modelos de forma segura,
 # evitando importações circulares, especialmente durante a inicialização do Django.
 Filme = apps.get_model("core", "Filme")
 Review = apps.get_model("core", "Review")
+Genero = apps.get_model("core", "Genero")
+Pessoa = apps.get_model("core", "Pessoa")
+Elenco = apps.get_model("core", "Elenco")
+Video = apps.get_model("core", "Video")
+FacetaFilme = apps.get_model("core", "FacetaFilme")
+Favorito = apps.get_model("core", "Favorito")
+Watchlist = apps.get_model("core", "Watchlist")
 
 
-def _atualizar_agregados_filme(filme_id: int):
+def _aplicar_delta_filme(filme_id: int, delta_soma: int, delta_total: int, slug: str | None = None):
     """
-    Função auxiliar para recalcular e atualizar os dados agregados de um Filme.
+    Função auxiliar para aplicar uma variação aos dados agregados de um Filme.
 
-    Esta função é chamada sempre que uma review é criada, atualizada ou apagada.
-    Ela executa uma única query à base de dados para obter a nova média de
-    classificações (rating) e o número total de reviews para um dado filme.
+    Em vez de ler o filme e recalcular a média sobre todas as suas reviews
+    (uma operação O(n)), executa um único `UPDATE` em que a base de dados soma
+    as variações aos contadores com expressões `F()` e calcula a nova média a
+    partir deles. Como não há leitura prévia, escritas concorrentes não se
+    sobrepõem umas às outras.
 
     Args:
         filme_id: O ID do filme que precisa de ser atualizado.
+        delta_soma: A variação da soma das avaliações.
+        delta_total: A variação do número de reviews (-1, 0 ou 1).
+        slug: O slug do filme, se já for conhecido (para invalidar a cache).
     """
-    try:
-        filme = Filme.objects.get(id=filme_id)
-    except Filme.DoesNotExist:
-        # Se o filme não for encontrado (caso raro), não há nada a fazer.
+    soma = F("rating_sum") + delta_soma
+    total = F("reviews_count") + delta_total
+    # Numa instrução UPDATE, as colunas do lado direito têm sempre os valores
+    # anteriores à atualização, pelo que a média usa as mesmas expressões.
+    atualizados = Filme.objects.filter(pk=filme_id).update(
+        rating_sum=soma,
+        reviews_count=total,
+        media_rating=expressao_media_rating(soma, total),
+        updated_at=timezone.now(),
+    )
+    if not atualizados:
+        # Se o filme não for encontrado (ex: está a ser apagado), não há nada a fazer.
         return
 
-    # Executa uma query de agregação na tabela de Reviews.
-    # `aggregate` calcula a média (`Avg`) do campo 'rating' e a contagem (`Count`)
-    # de registos, tudo numa única operação na base de dados.
-    agregados = Review.objects.filter(filme_id=filme_id).aggregate(
-        media=Avg("rating"),
-        total=Count("id"),
-    )
+    # O `update()` não emite `post_save`, pelo que a cache é invalidada aqui.
+    if slug is None:
+        slug = Filme.objects.filter(pk=filme_id).values_list("slug", flat=True).first()
+    incrementar_versoes(versao_filme(slug), VERSAO_CATALOGO)
+
 
-    # Atualiza os campos do objeto Filme em memória.
-    # Se não houver reviews, `media` será None, pelo que usamos `or 0.0`.
-    filme.media_rating = agregados["media"] or 0.0
-    filme.reviews_count = agregados["total"] or 0
+def _slug_do_filme(review) -> str | None:
+    """Devolve o slug do filme da review sem consultar a base de dados, se possível."""
+    if Review.filme.is_cached(review) and review.filme.pk == review.filme_id:
+        return review.filme.slug
+    return None
 
-    # Guarda as alterações na base de dados.
-    # `update_fields` é uma otimização importante: especifica quais colunas
-    # devem ser atualizadas, evitando reescrever o registo inteiro e acionar
-    # desnecessariamente outros sinais ou lógica de `auto_now`.
-    filme.save(update_fields=["media_rating", "reviews_count", "updated_at"])
+
+@receiver(pre_save, sender=Review)
+def review_pre_save(sender, instance, **kwargs):
+    """
+    Receptor acionado antes de uma `Review` ser guardada.
+
+    Para atualizações, guarda a avaliação e o filme anteriores, necessários para
+    calcular a variação a aplicar no `post_save`. Para novas reviews não há
+    nada a ler.
+
+    Args:
+        sender: A classe do modelo que emitiu o sinal (Review).
+        instance: A instância específica do modelo que vai ser guardada.
+        **kwargs: Argumentos adicionais do sinal.
+    """
+    instance._agregado_anterior = None
+    if not instance._state.adding and instance.pk:
+        instance._agregado_anterior = (
+            Review.objects.filter(pk=instance.pk).values_list("rating", "filme_id").first()
+        )
 
 
 @receiver(post_save, sender=Review)
@@ -74,8 +135,20 @@ def review_post_save(sender, instance, created, **kwargs):
         created: Um booleano que é True se um novo registo foi criado.
         **kwargs: Argumentos adicionais do sinal.
     """
-    # Chama a função auxiliar para atualizar os dados do filme associado.
-    _atualizar_agregados_filme(instance.filme_id)
+    anterior = getattr(instance, "_agregado_anterior", None)
+    slug = _slug_do_filme(instance)
+    if created or anterior is None:
+        _aplicar_delta_filme(instance.filme_id, instance.rating, 1, slug)
+        return
+
+    rating_anterior, filme_anterior = anterior
+    if filme_anterior == instance.filme_id:
+        if instance.rating != rating_anterior:
+            _aplicar_delta_filme(instance.filme_id, instance.rating - rating_anterior, 0, slug)
+    else:
+        # A review mudou de filme: sai de um e entra no outro.
+        _aplicar_delta_filme(filme_anterior, -rating_anterior, -1)
+        _aplicar_delta_filme(instance.filme_id, instance.rating, 1, slug)
 
 
 @receiver(post_delete, sender=Review)
@@ -91,5 +164,300 @@ def review_post_delete(sender, instance, **kwargs):
         instance: A instância específica do modelo que foi apagada.
         **kwargs: Argumentos adicionais do sinal.
     """
-    # Chama a função auxiliar para atualizar os dados do filme associado.
-    _atualizar_agregados_filme(instance.filme_id)
+    _aplicar_delta_filme(instance.filme_id, -instance.rating, -1, _slug_do_filme(instance))
+
+
+# --- Invalidação da cache de respostas ---
+
+@receiver(pre_save, sender=Filme)
+def filme_pre_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda o slug e as facetas anteriores de um filme existente antes de este ser alterado.
+
+    Se o slug mudar, as respostas em cache associadas ao slug antigo também
+    têm de ser invalidadas; se o ano ou o poster mudarem, as facetas antigas
+    são decrementadas. A consulta só é feita quando algum destes campos pode mudar.
+    """
+    instance._slug_anterior = None
+    instance._facetas_anteriores = None
+    campos = {"slug", "ano_lancamento", "poster"}
+    if instance.pk and (update_fields is None or campos.intersection(update_fields)):
+        anterior = (
+            Filme.objects.filter(pk=instance.pk).values_list("slug", "ano_lancamento", "poster").first()
+        )
+        if anterior is not None:
+            instance._slug_anterior = anterior[0]
+            instance._facetas_anteriores = facetas.chaves_filme(anterior[1], anterior[2])
+
+
+@receiver(post_save, sender=Filme)
+@receiver(post_delete, sender=Filme)
+def filme_invalidar_cache(sender, instance, **kwargs):
+    """Invalida o detalhe do filme e as listagens do catálogo."""
+    versoes = {versao_filme(instance.slug), VERSAO_CATALOGO}
+    slug_anterior = getattr(instance, "_slug_anterior", None)
+    if slug_anterior:
+        versoes.add(versao_filme(slug_anterior))
+    incrementar_versoes(*versoes)
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+def genero_invalidar_cache(sender, instance, **kwargs):
+    """
+    Invalida o género e tudo o que o apresenta.
+
+    Os filmes incluem os seus géneros, pelo que as respostas de filmes também
+    dependem do contador `generos`.
+    """
+    incrementar_versoes(versao_genero(instance.pk), VERSAO_GENEROS)
+
+
+@receiver(m2m_changed, sender=Filme.generos.through)
+def filme_generos_invalidar_cache(sender, instance, action, reverse, **kwargs):
+    """Invalida a cache quando os géneros associados a um filme mudam."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # `instance` é um Genero: vários filmes podem ter mudado de uma vez.
+        incrementar_versoes(VERSAO_CATALOGO, VERSAO_GENEROS)
+    else:
+        incrementar_versoes(versao_filme(instance.slug), VERSAO_CATALOGO)
+
+
+@receiver(post_save, sender=Pessoa)
+@receiver(post_delete, sender=Pessoa)
+@receiver(post_save, sender=Elenco)
+@receiver(post_delete, sender=Elenco)
+def pessoas_invalidar_cache(sender, instance, **kwargs):
+    """
+    Invalida as respostas de `/api/pessoas/`.
+
+    As estatísticas de uma pessoa dependem também dos seus filmes, que já
+    incrementam o contador `catalogo` quando mudam.
+    """
+    incrementar_versoes(VERSAO_PESSOAS)
+
+
+# --- Data de alteração dos filmes (validadores ETag / Last-Modified) ---
+# Os géneros fazem parte da representação de um filme, mas alterá-los não toca
+# no `updated_at` do filme. Estes receptores atualizam-no diretamente, para que
+# os validadores calculados em `conditional.py` mudem com a resposta.
+
+def _tocar_filmes(filmes) -> None:
+    filmes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Genero)
+def genero_tocar_filmes(sender, instance, created, **kwargs):
+    """Um género alterado muda a representação de todos os seus filmes."""
+    if not created:
+        _tocar_filmes(Filme.objects.filter(generos=instance))
+
+
+@receiver(pre_delete, sender=Genero)
+def genero_pre_delete_tocar_filmes(sender, instance, **kwargs):
+    """As ligações aos filmes são apagadas em cascata, sem `m2m_changed`."""
+    _tocar_filmes(Filme.objects.filter(generos=instance))
+
+
+@receiver(m2m_changed, sender=Filme.generos.through)
+def filme_generos_tocar_filmes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Atualiza o `updated_at` dos filmes cujos géneros mudaram."""
+    if action in ("post_add", "post_remove"):
+        filmes = Filme.objects.filter(pk__in=pk_set) if reverse else Filme.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        # Depois do `clear` já não se sabe que filmes estavam associados.
+        filmes = Filme.objects.filter(generos=instance) if reverse else Filme.objects.filter(pk=instance.pk)
+    else:
+        return
+    _tocar_filmes(filmes)
+
+
+def _tocar_e_invalidar(filmes) -> None:
+    """Toca nos filmes e invalida o seu detalhe em cache."""
+    slugs = list(filmes.values_list("slug", flat=True))
+    if slugs:
+        _tocar_filmes(Filme.objects.filter(slug__in=slugs))
+        incrementar_versoes(*[versao_filme(slug) for slug in slugs])
+
+
+@receiver(post_save, sender=Elenco)
+@receiver(post_delete, sender=Elenco)
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def filme_relacao_alterada(sender, instance, **kwargs):
+    """Os créditos e os vídeos fazem parte do detalhe do filme."""
+    _tocar_e_invalidar(Filme.objects.filter(pk=instance.filme_id))
+
+
+@receiver(post_save, sender=Pessoa)
+def pessoa_tocar_filmes(sender, instance, created, **kwargs):
+    """O nome, o slug e a foto de uma pessoa aparecem nos créditos dos seus filmes."""
+    if not created:
+        _tocar_e_invalidar(Filme.objects.filter(creditos__pessoa=instance).distinct())
+
+
+# --- Facetas do catálogo ---
+# As contagens de `FacetaFilme` recebem apenas a variação causada por cada
+# escrita: a década e o poster de um filme e as ligações aos géneros.
+
+@receiver(post_save, sender=Filme)
+def filme_facetas(sender, instance, created, **kwargs):
+    """Conta um filme novo ou move-o entre facetas quando o ano ou o poster mudam."""
+    anteriores = getattr(instance, "_facetas_anteriores", None)
+    if not created and anteriores is None:
+        return
+    deltas = Counter(facetas.chaves_filme(instance.ano_lancamento, instance.poster))
+    if not created:
+        deltas.subtract(anteriores)
+    facetas.ajustar(deltas)
+
+
+@receiver(pre_delete, sender=Filme)
+def filme_pre_delete_facetas(sender, instance, **kwargs):
+    """Guarda os géneros do filme: as ligações são apagadas em cascata, sem `m2m_changed`."""
+    instance._generos_facetas = list(
+        Filme.generos.through.objects.filter(filme_id=instance.pk).values_list("genero_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Filme)
+def filme_post_delete_facetas(sender, instance, **kwargs):
+    """Desconta o filme apagado da sua década, do poster e dos seus géneros."""
+    deltas = Counter(facetas.chaves_filme(instance.ano_lancamento, instance.poster))
+    deltas.update((facetas.Tipo.GENERO, str(g)) for g in getattr(instance, "_generos_facetas", []))
+    deltas = Counter({chave: -n for chave, n in deltas.items()})
+    facetas.ajustar(deltas)
+
+
+@receiver(post_delete, sender=Genero)
+def genero_post_delete_facetas(sender, instance, **kwargs):
+    """Um género apagado deixa de ter faceta."""
+    FacetaFilme.objects.filter(tipo=facetas.Tipo.GENERO, chave=str(instance.pk)).delete()
+
+
+@receiver(m2m_changed, sender=Filme.generos.through)
+def filme_generos_facetas(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Atualiza as contagens dos géneros ligados ou desligados de filmes.
+
+    O `pk_set` de um `post_add` só contém as ligações novas, mas o de um
+    `remove` contém todas as pedidas, mesmo as que não existiam: as ligações
+    removidas são lidas antes da escrita (`pre_remove`/`pre_clear`).
+    """
+    if action == "post_add":
+        if reverse:
+            deltas = Counter({(facetas.Tipo.GENERO, str(instance.pk)): len(pk_set)})
+        else:
+            deltas = Counter((facetas.Tipo.GENERO, str(pk)) for pk in pk_set)
+        facetas.ajustar(deltas)
+    elif action in ("pre_remove", "pre_clear"):
+        ligacoes = sender.objects.filter(**{"genero_id" if reverse else "filme_id": instance.pk})
+        if action == "pre_remove":
+            ligacoes = ligacoes.filter(**{"filme_id__in" if reverse else "genero_id__in": pk_set})
+        instance._generos_removidos = Counter(
+            (facetas.Tipo.GENERO, str(g)) for g in ligacoes.values_list("genero_id", flat=True)
+        )
+    elif action in ("post_remove", "post_clear"):
+        removidos = getattr(instance, "_generos_removidos", Counter())
+        facetas.ajustar(Counter({chave: -n for chave, n in removidos.items()}))
+
+
+# --- Tendências ---
+# Os eventos são somados ao ranking depois do commit (`tendencias.agendar`),
+# fora da transação da escrita que os origina.
+
+@receiver(post_save, sender=Review)
+def review_tendencias(sender, instance, created, **kwargs):
+    """Uma review nova é um evento; alterar a avaliação só recalcula o `score`."""
+    anterior = getattr(instance, "_agregado_anterior", None)
+    if created or anterior is None:
+        eventos = [(instance.filme_id, tendencias.PESO_REVIEW, instance.created_at)]
+    elif anterior[1] != instance.filme_id:
+        eventos = [
+            (anterior[1], -tendencias.PESO_REVIEW, instance.created_at),
+            (instance.filme_id, tendencias.PESO_REVIEW, instance.created_at),
+        ]
+    elif anterior[0] != instance.rating:
+        eventos = [(instance.filme_id, 0.0, instance.created_at)]
+    else:
+        return
+    tendencias.agendar(eventos)
+
+
+@receiver(post_delete, sender=Review)
+def review_post_delete_tendencias(sender, instance, **kwargs):
+    tendencias.agendar([(instance.filme_id, -tendencias.PESO_REVIEW, instance.created_at)])
+
+
+@receiver(post_save, sender=Favorito)
+@receiver(post_save, sender=Watchlist)
+def lista_tendencias(sender, instance, created, **kwargs):
+    """Entradas criadas pelo ORM (as escritas de `listas.py` registam-se a si próprias)."""
+    if created:
+        tendencias.agendar([(instance.filme_id, tendencias.PESOS_LISTA[sender], instance.created_at)])
+
+
+@receiver(post_delete, sender=Favorito)
+@receiver(post_delete, sender=Watchlist)
+def lista_post_delete_tendencias(sender, instance, **kwargs):
+    tendencias.agendar([(instance.filme_id, -tendencias.PESOS_LISTA[sender], instance.created_at)])
+
+
+# --- Contadores da biblioteca de cada utilizador ---
+# (As escritas em SQL de `listas.py` ajustam os contadores por si próprias.)
+
+@receiver(post_save, sender=Favorito)
+@receiver(post_save, sender=Watchlist)
+@receiver(post_save, sender=Review)
+def biblioteca_post_save(sender, instance, created, **kwargs):
+    if created:
+        biblioteca.ajustar(sender, getattr(instance, biblioteca.CAMPOS[sender][1]), 1)
+
+
+@receiver(post_delete, sender=Favorito)
+@receiver(post_delete, sender=Watchlist)
+@receiver(post_delete, sender=Review)
+def biblioteca_post_delete(sender, instance, **kwargs):
+    biblioteca.ajustar(sender, getattr(instance, biblioteca.CAMPOS[sender][1]), -1)
+
+
+# --- Interações removidas (reconstrução incremental das recomendações) ---
+# (As escritas em SQL de `listas.py` registam-se a si próprias.)
+
+@receiver(post_delete, sender=Favorito)
+@receiver(post_delete, sender=Watchlist)
+@receiver(post_delete, sender=Review)
+def recomendacoes_post_delete(sender, instance, **kwargs):
+    recomendacoes.agendar_remocoes([instance.filme_id])
+
+
+@receiver(post_save, sender=Review)
+def recomendacoes_review_movida(sender, instance, created, **kwargs):
+    """Uma review que muda de filme é também uma remoção no filme anterior."""
+    anterior = getattr(instance, "_agregado_anterior", None)
+    if not created and anterior is not None and anterior[1] != instance.filme_id:
+        recomendacoes.agendar_remocoes([anterior[1]])
+
+
+# --- Cache de utilizadores da autenticação ---
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def utilizador_invalidar_cache(sender, instance, **kwargs):
+    # Também depois do commit: um pedido concorrente pode ter voltado a guardar
+    # a versão anterior, lida antes de a transação terminar.
+    utilizadores.invalidar(instance.pk)
+    transaction.on_commit(lambda: utilizadores.invalidar(instance.pk))
+
+
+# --- Pesquisa ---
+
+@receiver(post_migrate)
+def pesquisa_post_migrate(sender, using="default", **kwargs):
+    """Recria os triggers da pesquisa FTS5 (SQLite) que as migrações possam ter removido."""
+    if sender.name != "backend.core":
+        return
+    from .search import garantir_indice_fts5
+    garantir_indice_fts5(using)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Ranking de tendências: popularidade recente com decaimento exponencial.
+
+Cada evento (uma review, um favorito ou uma entrada na watchlist) tem um peso
+que cai para metade a cada `TRENDING_HALF_LIFE_DAYS`. Em vez de reescrever
+todas as linhas à medida que o tempo passa, os eventos são escalados para um
+instante de referência comum ("forward decay"): um evento de peso `w` no
+instante `t` soma `w * exp(λ (t - referencia))` à popularidade do filme. O
+decaimento até ao momento atual é o mesmo fator para todos os filmes, pelo que
+a ordem do ranking não muda com o tempo e cada evento é somado com um `UPDATE`.
+
+O `score` do ranking é a popularidade multiplicada pela média bayesiana das
+avaliações, `(C * m + soma) / (C + n)`: a média `m` a priori conta como `C`
+reviews (`TRENDING_PRIOR_RATING`/`TRENDING_PRIOR_REVIEWS`), pelo que uma única
+review de 5 estrelas pouco afasta o filme da média.
+
+Os eventos são registados depois do commit da escrita que os origina (ver
+`agendar`), pelos sinais de `Review`, `Favorito` e `Watchlist` e pelas escritas
+em SQL de `listas.py`. A compactação periódica (`compactar`, comando
+`compact_trending`) recalcula a tabela a partir dos eventos recentes com a
+referência no instante atual: os valores deixam de crescer sem limite, os
+filmes sem eventos recentes saem do ranking e os desvios (escritas em massa
+sem sinais, alterações de avaliação) são corrigidos.
+"""
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models.filme import Filme
+from .models.listas import Favorito, Watchlist
+from .models.review import Review
+from .models.tendencia import TendenciaFilme
+
+# Peso de cada tipo de evento.
+PESO_REVIEW = 3.0
+PESO_FAVORITO = 2.0
+PESO_WATCHLIST = 1.0
+PESOS_LISTA = {Favorito: PESO_FAVORITO, Watchlist: PESO_WATCHLIST}
+
+# A compactação ignora os eventos mais antigos do que este número de meias-vidas
+# (pesam menos de 0,1% de um evento atual).
+HORIZONTE_MEIAS_VIDAS = 10
+
+
+def _taxa() -> float:
+    """A constante de decaimento λ, por segundo."""
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_DAYS * 86400)
+
+
+def media_bayesiana(soma: float, total: int) -> float:
+    prior, peso = settings.TRENDING_PRIOR_RATING, settings.TRENDING_PRIOR_REVIEWS
+    return (peso * prior + soma) / (peso + total)
+
+
+def _media_bayesiana_sql():
+    """`media_bayesiana` em SQL, sobre os contadores do filme de cada linha."""
+    prior, peso = settings.TRENDING_PRIOR_RATING, settings.TRENDING_PRIOR_REVIEWS
+    filme = Filme.objects.filter(pk=OuterRef("filme_id"))
+    media = ExpressionWrapper(
+        (Value(peso * prior) + Subquery(filme.values("rating_sum")))
+        / (Value(float(peso)) + Subquery(filme.values("reviews_count"))),
+        output_field=FloatField(),
+    )
+    return Coalesce(media, Value(prior))
+
+
+def decair(valor: float, referencia: float, agora: float | None = None) -> float:
+    """Converte um valor escalado para `referencia` no seu valor no instante `agora`."""
+    agora = timezone.now().timestamp() if agora is None else agora
+    return valor * math.exp(-_taxa() * (agora - referencia))
+
+
+def registar(eventos) -> None:
+    """
+    Soma ao ranking os eventos `(filme_id, peso, quando)`.
+
+    Um peso negativo desfaz um evento anterior (ex: um favorito removido), com
+    o instante em que este aconteceu. São três queries, qualquer que seja o
+    número de eventos: a referência atual, a criação das linhas em falta e um
+    `UPDATE` que soma a variação de cada filme e recalcula o seu `score`.
+    """
+    eventos = list(eventos)
+    if not eventos:
+        return
+    referencia = TendenciaFilme.objects.values_list("referencia", flat=True).first()
+    if referencia is None:
+        referencia = timezone.now().timestamp()
+    taxa = _taxa()
+    deltas: dict[int, float] = defaultdict(float)
+    for filme_id, peso, quando in eventos:
+        deltas[filme_id] += peso * math.exp(taxa * (quando.timestamp() - referencia))
+
+    # Só os eventos positivos criam linhas: desfazer um evento de um filme que
+    # já não está no ranking não tem efeito.
+    novos = [TendenciaFilme(filme_id=f, referencia=referencia) for f, d in deltas.items() if d > 0]
+    if novos:
+        TendenciaFilme.objects.bulk_create(novos, ignore_conflicts=True)
+    variacao = Case(
+        *[When(filme_id=f, then=Value(d)) for f, d in deltas.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    popularidade = F("popularidade") + variacao
+    TendenciaFilme.objects.filter(filme_id__in=deltas).update(
+        popularidade=popularidade,
+        score=popularidade * _media_bayesiana_sql(),
+    )
+
+
+def agendar(eventos) -> None:
+    """Regista os eventos depois do commit da transação atual (ou já, fora de uma)."""
+    transaction.on_commit(partial(registar, list(eventos)))
+
+
+def compactar(lote: int = 1000) -> int:
+    """
+    Reconstrói o ranking a partir dos eventos recentes, com a referência no instante atual.
+
+    Returns:
+        O número de filmes no ranking.
+    """
+    agora = timezone.now()
+    referencia = agora.timestamp()
+    taxa = _taxa()
+    limite = agora - timedelta(days=settings.TRENDING_HALF_LIFE_DAYS * HORIZONTE_MEIAS_VIDAS)
+
+    popularidade: dict[int, float] = defaultdict(float)
+    fontes = ((Review, PESO_REVIEW), (Favorito, PESO_FAVORITO), (Watchlist, PESO_WATCHLIST))
+    for modelo, peso in fontes:
+        eventos = modelo.objects.filter(created_at__gte=limite).values_list("filme_id", "created_at")
+        for filme_id, quando in eventos.iterator():
+            popularidade[filme_id] += peso * math.exp(taxa * (quando.timestamp() - referencia))
+
+    linhas = []
+    ids = list(popularidade)
+    for inicio in range(0, len(ids), lote):
+        contadores = Filme.objects.filter(pk__in=ids[inicio:inicio + lote]).values_list("pk", "rating_sum", "reviews_count")
+        for filme_id, soma, total in contadores:
+            valor = popularidade[filme_id]
+            linhas.append(TendenciaFilme(
+                filme_id=filme_id,
+                popularidade=valor,
+                score=valor * media_bayesiana(soma, total),
+                referencia=referencia,
+            ))
+
+    with transaction.atomic():
+        TendenciaFilme.objects.all().delete()
+        TendenciaFilme.objects.bulk_create(linhas, batch_size=lote)
+    return len(linhas)
@@ -7,10 +7,12 @@ como os sinais (signals) que atualizam automaticamente os dados agregados.
 """
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
 
 # --- Importação direta dos modelos ---
 # Importar diretamente dos ficheiros .py dos modelos é uma prática robusta
 # que evita problemas de importação circular.
+from .models.taxonomia import Genero
 from .models.filme import Filme
 from .models.review import Review
 
@@ -99,3 +101,1619 @@ class SignalTests(TestCase):
         # VERIFICAÇÃO: A média deve voltar a ser 10.0 e a contagem 1.
         self.assertEqual(self.filme.media_rating, 10.0)
         self.assertEqual(self.filme.reviews_count, 1)
+
+    def test_save_de_instancia_desatualizada_mantem_agregados(self):
+        desatualizado = Filme.objects.get(pk=self.filme.pk)
+        Review.objects.create(filme=self.filme, autor=self.user_a, rating=5)
+
+        desatualizado.titulo = "Título Alterado"
+        desatualizado.save()
+        self.filme.refresh_from_db()
+        self.assertEqual(self.filme.titulo, "Título Alterado")
+        self.assertEqual(
+            (self.filme.rating_sum, self.filme.reviews_count, self.filme.media_rating), (5, 1, 5.0)
+        )
+
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Testes para a paginação por chave (keyset) do catálogo de filmes.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        # Vários filmes com a mesma média, para garantir que os empates são
+        # resolvidos pelo título e pelo id sem repetir nem saltar linhas.
+        for i, rating in enumerate([4.5, 4.5, 4.5, 3.0, 3.0, 2.0, 1.0]):
+            Filme.objects.create(titulo=f"Filme {i % 3}", slug=f"filme-{i}", media_rating=rating)
+
+    def _percorrer(self, url):
+        slugs, paginas = [], []
+        while url:
+            resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            paginas.append(resposta.data)
+            slugs += [f["slug"] for f in resposta.data["results"]]
+            url = resposta.data["next"]
+        return slugs, paginas
+
+    def test_percorre_catalogo_pela_ordem_do_modelo(self):
+        esperado = list(Filme.objects.order_by("-media_rating", "titulo", "id").values_list("slug", flat=True))
+        slugs, paginas = self._percorrer("/api/filmes/?page_size=2")
+
+        self.assertEqual(slugs, esperado)
+        self.assertEqual(len(paginas), 4)
+        # Sem `include_total` não se calcula nenhum total.
+        self.assertNotIn("count", paginas[0])
+
+    def test_pagina_anterior_devolve_os_mesmos_resultados(self):
+        primeira = self.client.get("/api/filmes/?page_size=3").data
+        segunda = self.client.get(primeira["next"]).data
+        anterior = self.client.get(segunda["previous"]).data
+
+        self.assertEqual(anterior["results"], primeira["results"])
+        self.assertIsNone(anterior["previous"])
+
+    def test_total_aproximado_e_cursor_invalido(self):
+        resposta = self.client.get("/api/filmes/?include_total=1")
+        self.assertEqual(resposta.data["count"], 7)
+
+        resposta = self.client.get("/api/filmes/?cursor=invalido")
+        self.assertEqual(resposta.status_code, 404)
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Testes para a cache versionada das respostas do catálogo.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.filme = Filme.objects.create(titulo="Em Cache", slug="em-cache", ano_lancamento=2020)
+
+    def test_detalhe_e_servido_da_cache_ate_o_filme_mudar(self):
+        url = f"/api/filmes/{self.filme.slug}/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            resposta = self.client.get(url)
+        self.assertEqual(resposta["X-Cache"], "HIT")
+
+        # Guardar o filme incrementa a sua versão e invalida a resposta.
+        self.filme.titulo = "Título Novo"
+        self.filme.save()
+        resposta = self.client.get(url)
+        self.assertEqual(resposta["X-Cache"], "MISS")
+        self.assertEqual(resposta.data["titulo"], "Título Novo")
+
+    def test_formatos_negociados_tem_entradas_proprias(self):
+        url = f"/api/filmes/{self.filme.slug}/"
+        json_ = self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        # O formato escolhido pelo `Accept` (aqui, a API navegável) não está na query string.
+        html = self.client.get(url, HTTP_ACCEPT="text/html")
+        self.assertEqual(html["X-Cache"], "MISS")
+        self.assertNotEqual(html["ETag"], json_["ETag"])
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT="text/html")["ETag"], html["ETag"])
+
+    def test_alterar_generos_invalida_a_listagem(self):
+        self.client.get("/api/filmes/")
+        genero = Genero.objects.create(nome="Drama", slug="drama")
+        self.filme.generos.add(genero)
+
+        resposta = self.client.get("/api/filmes/")
+        self.assertEqual(resposta["X-Cache"], "MISS")
+        self.assertEqual(resposta.data["results"][0]["generos"][0]["slug"], "drama")
+
+    def test_leitura_concorrente_antes_do_commit_nao_fica_em_cache(self):
+        from .caching import VERSAO_CATALOGO, obter_versoes, versao_filme
+
+        url = f"/api/filmes/{self.filme.slug}/"
+        nomes = [versao_filme(self.filme.slug), VERSAO_CATALOGO]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.filme.titulo = "Ainda Não Confirmado"
+            self.filme.save()
+            durante = obter_versoes(nomes)
+            # Um pedido noutra ligação leria aqui a linha antiga e guardá-la-ia com a versão nova.
+            self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertNotEqual(obter_versoes(nomes), durante)
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+    def test_versoes_nunca_recuam(self):
+        from unittest import mock
+        from .caching import _cache, _chave_versao, incrementar_versoes, obter_versoes
+
+        # Um contador à frente do relógio (ex: escrito por outra máquina) avança uma unidade.
+        _cache().set(_chave_versao("teste"), 10 ** 30, None)
+        incrementar_versoes("teste")
+        self.assertEqual(obter_versoes(["teste"]), [10 ** 30 + 1])
+
+        # Caso contrário, cada incremento grava o instante atual.
+        _cache().set(_chave_versao("teste"), 5, None)
+        with mock.patch("backend.core.caching.time.time_ns", return_value=10 ** 12):
+            incrementar_versoes("outro", "teste")
+        self.assertEqual(obter_versoes(["outro", "teste"]), [10 ** 12, 10 ** 12])
+
+    def test_versoes_em_falta_sao_um_erro_de_configuracao(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from rest_framework import viewsets
+        from .caching import VersionedCacheMixin
+
+        class SemVersoes(VersionedCacheMixin, viewsets.ReadOnlyModelViewSet):
+            queryset = Filme.objects.all()
+
+        with self.assertRaises(ImproperlyConfigured):
+            SemVersoes().get_cache_versions()
+
+
+class RecomputeAggregatesTests(TestCase):
+    """
+    Testes para o comando `recompute_aggregates`, que corrige agregados desatualizados.
+    """
+
+    def test_corrige_agregados_apos_escritas_sem_sinais(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        user = User.objects.create_user(username="user_c", password="123")
+        filme = Filme.objects.create(titulo="Desvio", slug="desvio", ano_lancamento=2001)
+        # `bulk_create` não emite sinais, pelo que os agregados ficam a zero.
+        Review.objects.bulk_create([Review(filme=filme, autor=user, rating=4, texto="")])
+        filme.refresh_from_db()
+        self.assertEqual(filme.reviews_count, 0)
+
+        saida = StringIO()
+        call_command("recompute_aggregates", "--check", stdout=saida)
+        self.assertIn("1 filmes", saida.getvalue())
+
+        call_command("recompute_aggregates", stdout=StringIO())
+        filme.refresh_from_db()
+        self.assertEqual((filme.rating_sum, filme.reviews_count, filme.media_rating), (4, 1, 4.0))
+
+
+class FilmeStatusTests(TestCase):
+    """
+    Testes para o estado de watchlist/favorito em lote e na listagem.
+    """
+
+    def setUp(self):
+        from .models.listas import Watchlist, Favorito
+
+        self.user = User.objects.create_user(username="estado", password="123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.filmes = [
+            Filme.objects.create(titulo=f"Estado {i}", slug=f"estado-{i}", media_rating=i) for i in range(3)
+        ]
+        Watchlist.objects.create(utilizador=self.user, filme=self.filmes[0])
+        Favorito.objects.create(utilizador=self.user, filme=self.filmes[1])
+
+    def test_estado_em_lote_usa_duas_queries(self):
+        with self.assertNumQueries(2):
+            resposta = self.client.get("/api/filmes/bulk-status/?slugs=estado-0,estado-1,estado-2,inexistente")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data["estado-0"], {"in_watchlist": True, "is_favorite": False})
+        self.assertEqual(resposta.data["estado-1"], {"in_watchlist": False, "is_favorite": True})
+        self.assertEqual(resposta.data["inexistente"], {"in_watchlist": False, "is_favorite": False})
+
+        resposta = self.client.post("/api/filmes/bulk-status/", {"ids": [self.filmes[0].id]}, format="json")
+        self.assertTrue(resposta.data[str(self.filmes[0].id)]["in_watchlist"])
+
+    def test_listagem_com_include_status(self):
+        resposta = self.client.get("/api/filmes/?include=status")
+        estados = {f["slug"]: (f["in_watchlist"], f["is_favorite"]) for f in resposta.data["results"]}
+        self.assertEqual(estados, {
+            "estado-0": (True, False),
+            "estado-1": (False, True),
+            "estado-2": (False, False),
+        })
+
+
+class ListasPessoaisTests(TestCase):
+    """
+    Testes para as escritas idempotentes na watchlist e nos favoritos.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="listas", password="123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.filmes = [Filme.objects.create(titulo=f"Lista {i}", slug=f"lista-{i}") for i in range(3)]
+
+    def test_put_e_delete_sao_idempotentes_e_usam_uma_query(self):
+        from .models.listas import Watchlist
+
+        url = "/api/filmes/lista-0/watchlist/"
+        with self.assertNumQueries(1):
+            resposta = self.client.put(url)
+        self.assertEqual((resposta.status_code, resposta.data), (201, {"in_watchlist": True}))
+        resposta = self.client.put(url)
+        self.assertEqual((resposta.status_code, resposta.data), (200, {"in_watchlist": True}))
+        self.assertEqual(Watchlist.objects.filter(utilizador=self.user).count(), 1)
+
+        with self.assertNumQueries(1):
+            resposta = self.client.delete(url)
+        self.assertEqual(resposta.data, {"in_watchlist": False})
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertFalse(Watchlist.objects.exists())
+        self.assertEqual(self.client.put("/api/filmes/inexistente/favorite/").status_code, 404)
+
+    def test_toggle_mantem_o_comportamento(self):
+        url = "/api/filmes/lista-1/toggle_favorite/"
+        # Ligar: o `DELETE` sem efeito e o `INSERT`; desligar: só o `DELETE`.
+        with self.assertNumQueries(2):
+            resposta = self.client.post(url)
+        self.assertEqual((resposta.status_code, resposta.data), (201, {"is_favorite": True}))
+        with self.assertNumQueries(1):
+            resposta = self.client.post(url)
+        self.assertEqual((resposta.status_code, resposta.data), (200, {"is_favorite": False}))
+
+    def test_adicionar_e_remover_em_lote(self):
+        from .models.listas import Favorito
+
+        Favorito.objects.create(utilizador=self.user, filme=self.filmes[0])
+        slugs = ["lista-0", "lista-1", "lista-2", "inexistente"]
+        resposta = self.client.post("/api/favoritos/bulk/", {"slugs": slugs}, format="json")
+        self.assertEqual(resposta.data, {"added": 2})
+        self.assertEqual(Favorito.objects.filter(utilizador=self.user).count(), 3)
+
+        resposta = self.client.delete("/api/favoritos/bulk/?slugs=lista-0,lista-1")
+        self.assertEqual(resposta.data, {"removed": 2})
+        self.assertEqual(list(Favorito.objects.values_list("filme__slug", flat=True)), ["lista-2"])
+
+
+class BibliotecaTests(TestCase):
+    """
+    Testes para os contadores da biblioteca e o endpoint `/api/me/library/`.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="biblioteca", password="123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.filmes = [Filme.objects.create(titulo=f"Biblioteca {i}", slug=f"biblioteca-{i}") for i in range(3)]
+
+    def _contadores(self):
+        from . import biblioteca
+        return biblioteca.contadores(self.user.pk)
+
+    def test_contadores_seguem_as_escritas(self):
+        from .models.listas import Favorito
+
+        self.assertEqual(self._contadores(), {"watchlist": 0, "favoritos": 0, "reviews": 0})
+        Favorito.objects.create(utilizador=self.user, filme=self.filmes[0])
+        Review.objects.create(filme=self.filmes[0], autor=self.user, titulo="T", texto="X", rating=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/filmes/biblioteca-1/watchlist/")
+            self.client.put("/api/filmes/biblioteca-2/watchlist/")
+            self.client.put("/api/filmes/biblioteca-2/watchlist/")
+            self.client.post("/api/favoritos/bulk/", {"slugs": ["biblioteca-0", "biblioteca-1"]}, format="json")
+        self.assertEqual(self._contadores(), {"watchlist": 2, "favoritos": 2, "reviews": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/filmes/biblioteca-1/watchlist/")
+        self.filmes[0].delete()
+        self.assertEqual(self._contadores(), {"watchlist": 1, "favoritos": 1, "reviews": 0})
+
+    def test_reconstruir_corrige_os_desvios(self):
+        from . import biblioteca
+        from .models.listas import Watchlist
+        from .models.utilizador import ContadoresUtilizador
+
+        Watchlist.objects.bulk_create([Watchlist(utilizador=self.user, filme=f) for f in self.filmes])
+        ContadoresUtilizador.objects.update_or_create(utilizador=self.user, defaults={"favoritos_count": 7})
+        self.assertEqual(biblioteca.reconstruir([self.user.pk]), 1)
+        self.assertEqual(self._contadores(), {"watchlist": 3, "favoritos": 0, "reviews": 0})
+        self.assertEqual(biblioteca.reconstruir(), 1)
+        self.user.delete()
+        self.assertFalse(ContadoresUtilizador.objects.exists())
+
+    def test_endpoint_devolve_contadores_e_paginas(self):
+        from .models.listas import Favorito, Watchlist
+
+        for f in self.filmes:
+            Watchlist.objects.create(utilizador=self.user, filme=f)
+        Favorito.objects.create(utilizador=self.user, filme=self.filmes[1])
+
+        with self.assertNumQueries(4):
+            resposta = self.client.get("/api/me/library/?page_size=2")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data["counts"], {"watchlist": 3, "favoritos": 1, "reviews": 0})
+        self.assertEqual(
+            [item["filme"]["slug"] for item in resposta.data["watchlist"]["results"]], ["biblioteca-2", "biblioteca-1"]
+        )
+        self.assertEqual(resposta.data["favoritos"]["results"][0]["filme"]["slug"], "biblioteca-1")
+        self.assertIsNone(resposta.data["favoritos"]["next"])
+
+        seguinte = self.client.get(resposta.data["watchlist"]["next"])
+        self.assertEqual(list(seguinte.data), ["counts", "watchlist"])
+        self.assertEqual([item["filme"]["slug"] for item in seguinte.data["watchlist"]["results"]], ["biblioteca-0"])
+
+        self.assertEqual(self.client.get("/api/me/library/?lista=outra").status_code, 400)
+        self.assertEqual(self.client.get("/api/me/library/?cursor=abc").status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/api/me/library/").status_code, 401)
+
+
+class FilmeListRapidoTests(TestCase):
+    """
+    Testes para a serialização rápida da listagem de filmes.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        acao = Genero.objects.create(nome="Ação", slug="acao")
+        drama = Genero.objects.create(nome="Drama", slug="drama")
+        for i in range(5):
+            filme = Filme.objects.create(titulo=f"Rápido {i}", slug=f"rapido-{i}", media_rating=i, poster=f"https://exemplo.org/{i}.jpg")
+            filme.generos.set([drama, acao] if i % 2 else [drama])
+
+    def test_mesmo_json_que_o_serializer_drf(self):
+        from .serializers import FilmeListRapidoSerializer, FilmeListSerializer
+
+        queryset = Filme.objects.order_by("-media_rating", "titulo", "id")
+        esperado = FilmeListSerializer(queryset.prefetch_related("generos"), many=True).data
+        with self.assertNumQueries(2):
+            obtido = FilmeListRapidoSerializer(queryset.values(*FilmeListRapidoSerializer.campos_values()), many=True).data
+        self.assertEqual(obtido, [dict(f) for f in esperado])
+
+    def test_listagem_usa_o_caminho_rapido(self):
+        primeira = self.client.get("/api/filmes/?page_size=3")
+        self.assertEqual([f["slug"] for f in primeira.data["results"]], ["rapido-4", "rapido-3", "rapido-2"])
+        self.assertEqual([g["slug"] for g in primeira.data["results"][1]["generos"]], ["acao", "drama"])
+        segunda = self.client.get(primeira.data["next"])
+        self.assertEqual([f["slug"] for f in segunda.data["results"]], ["rapido-1", "rapido-0"])
+
+
+class FilmeDetalheTests(TestCase):
+    """
+    Testes para o detalhe do filme com créditos e vídeos.
+    """
+
+    def setUp(self):
+        from .models.elenco import Elenco
+        from .models.pessoa import Pessoa
+        from .models.video import Video
+
+        self.client = APIClient()
+        self.filme = Filme.objects.create(titulo="Detalhado", slug="detalhado")
+        self.filme.generos.add(Genero.objects.create(nome="Drama", slug="drama"))
+        for i in range(12):
+            pessoa = Pessoa.objects.create(nome=f"Pessoa {i}", slug=f"pessoa-{i}")
+            Elenco.objects.create(filme=self.filme, pessoa=pessoa, papel="Ator", ordem_credito=11 - i)
+        Video.objects.create(filme=self.filme, titulo="Trailer", tipo="trailer", key="a")
+        Video.objects.create(filme=self.filme, titulo="Teaser", tipo="teaser", key="b")
+        Video.objects.create(filme=self.filme, titulo="Trailer 2", tipo="trailer", key="c")
+
+    def test_detalhe_com_creditos_e_videos_em_quatro_queries(self):
+        with self.settings(RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(4):
+            resposta = self.client.get("/api/filmes/detalhado/")
+        self.assertEqual(len(resposta.data["creditos"]), 12)
+        self.assertEqual(resposta.data["creditos"][0]["pessoa"]["slug"], "pessoa-11")
+        self.assertEqual(resposta.data["creditos"][0]["ordem_credito"], 0)
+        self.assertEqual({t: len(v) for t, v in resposta.data["videos"].items()}, {"teaser": 1, "trailer": 2})
+
+        with self.settings(RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(1):
+            resposta = self.client.get("/api/filmes/detalhado/", HTTP_IF_NONE_MATCH=resposta["ETag"])
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_fields_e_expand(self):
+        with self.settings(RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(1):
+            resposta = self.client.get("/api/filmes/detalhado/?fields=id,titulo")
+        self.assertEqual(set(resposta.data), {"id", "titulo"})
+
+        with self.settings(RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(3):
+            resposta = self.client.get("/api/filmes/detalhado/?expand=creditos")
+        self.assertIn("creditos", resposta.data)
+        self.assertNotIn("videos", resposta.data)
+
+    def test_alterar_creditos_muda_o_etag(self):
+        from .models.elenco import Elenco
+
+        etag = self.client.get("/api/filmes/detalhado/")["ETag"]
+        Elenco.objects.filter(filme=self.filme).first().delete()
+        resposta = self.client.get("/api/filmes/detalhado/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.data["creditos"]), 11)
+
+
+class PessoaTests(TestCase):
+    """
+    Testes para a API de pessoas, estatísticas e filmografia.
+    """
+
+    def setUp(self):
+        from .models.elenco import Elenco
+        from .models.pessoa import Pessoa
+
+        self.client = APIClient()
+        self.pessoa = Pessoa.objects.create(nome="Realizadora", slug="realizadora")
+        Pessoa.objects.create(nome="Sem Filmes", slug="sem-filmes")
+        for i, (ano, rating) in enumerate([(1990, 4.0), (2005, 2.0), (None, 3.0)]):
+            filme = Filme.objects.create(titulo=f"Obra {i}", slug=f"obra-{i}", ano_lancamento=ano)
+            Filme.objects.filter(pk=filme.pk).update(media_rating=rating)
+            Elenco.objects.create(filme=filme, pessoa=self.pessoa, papel="Realizador", ordem_credito=0)
+        # Dois créditos no mesmo filme não contam duas vezes nas estatísticas.
+        Elenco.objects.create(filme=filme, pessoa=self.pessoa, papel="Argumentista", ordem_credito=1)
+
+    def test_detalhe_com_estatisticas_numa_query(self):
+        with self.settings(RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(1):
+            resposta = self.client.get("/api/pessoas/realizadora/")
+        self.assertEqual(resposta.data["total_filmes"], 3)
+        self.assertAlmostEqual(resposta.data["media_rating_filmes"], 3.0)
+        self.assertEqual((resposta.data["primeiro_ano"], resposta.data["ultimo_ano"]), (1990, 2005))
+
+        vazia = self.client.get("/api/pessoas/sem-filmes/").data
+        self.assertEqual((vazia["total_filmes"], vazia["media_rating_filmes"]), (0, None))
+
+    def test_listagem_paginada_por_nome(self):
+        resposta = self.client.get("/api/pessoas/?page_size=1")
+        self.assertEqual(resposta.data["results"][0]["slug"], "realizadora")
+        seguinte = self.client.get(resposta.data["next"])
+        self.assertEqual(seguinte.data["results"][0]["slug"], "sem-filmes")
+
+    def test_filmografia_paginada_numa_query(self):
+        with self.assertNumQueries(1):
+            resposta = self.client.get("/api/pessoas/realizadora/filmografia/?page_size=2")
+        self.assertEqual([c["filme"]["ano_lancamento"] for c in resposta.data["results"]], [2005, 1990])
+        restantes = self.client.get(resposta.data["next"]).data["results"]
+        self.assertEqual([c["papel"] for c in restantes], ["Argumentista", "Realizador"])
+        self.assertEqual(self.client.get("/api/pessoas/inexistente/filmografia/").status_code, 404)
+
+
+class FacetasTests(TestCase):
+    """
+    Testes para os filtros do catálogo e as contagens materializadas das facetas.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.acao = Genero.objects.create(nome="Ação", slug="acao")
+        self.drama = Genero.objects.create(nome="Drama", slug="drama")
+        dados = [(1985, 4.5, "p.jpg", [self.acao, self.drama]), (1994, 3.0, "", [self.drama]), (2003, 2.0, "p.jpg", [])]
+        for i, (ano, rating, poster, generos) in enumerate(dados):
+            filme = Filme.objects.create(titulo=f"Faceta {i}", slug=f"faceta-{i}", ano_lancamento=ano, poster=poster)
+            Filme.objects.filter(pk=filme.pk).update(media_rating=rating)
+            filme.generos.set(generos)
+
+    def _slugs(self, query):
+        resposta = self.client.get(f"/api/filmes/?{query}")
+        self.assertEqual(resposta.status_code, 200)
+        return [f["slug"] for f in resposta.data["results"]]
+
+    def test_filtros(self):
+        self.assertEqual(self._slugs("genero=acao,drama"), ["faceta-0", "faceta-1"])
+        self.assertEqual(self._slugs("ano_min=1990&ano_max=2010"), ["faceta-1", "faceta-2"])
+        self.assertEqual(self._slugs("rating_min=3"), ["faceta-0", "faceta-1"])
+        self.assertEqual(self._slugs("com_poster=1&genero=drama"), ["faceta-0"])
+        self.assertEqual(self.client.get("/api/filmes/?ano_min=abc").status_code, 400)
+
+    def test_contagens_mantidas_pelos_sinais(self):
+        from . import facetas
+
+        esperado = {
+            "generos": [{"slug": "drama", "nome": "Drama", "total": 2}, {"slug": "acao", "nome": "Ação", "total": 1}],
+            "decadas": [{"decada": 1980, "total": 1}, {"decada": 1990, "total": 1}, {"decada": 2000, "total": 1}],
+            "com_poster": {"true": 2, "false": 1},
+        }
+        self.assertEqual(facetas.contagens(), esperado)
+
+        filme = Filme.objects.get(slug="faceta-1")
+        filme.ano_lancamento, filme.poster = 1989, "p.jpg"
+        filme.save()
+        filme.generos.remove(self.drama, self.acao)
+        self.acao.filmes.add(filme)
+        Filme.objects.get(slug="faceta-0").delete()
+        contagens = facetas.contagens()
+        self.assertEqual(contagens["generos"], [{"slug": "acao", "nome": "Ação", "total": 1}])
+        self.assertEqual(contagens["decadas"], [{"decada": 1980, "total": 1}, {"decada": 2000, "total": 1}])
+        self.assertEqual(contagens["com_poster"], {"true": 2, "false": 0})
+
+        # A reconstrução completa chega ao mesmo resultado.
+        facetas.reconstruir()
+        self.assertEqual(facetas.contagens(), contagens)
+
+    def test_listagem_com_facets(self):
+        with self.settings(RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(4):
+            resposta = self.client.get("/api/filmes/?include=facets&genero=acao")
+        self.assertEqual([f["slug"] for f in resposta.data["results"]], ["faceta-0"])
+        self.assertEqual(resposta.data["facets"]["com_poster"], {"true": 2, "false": 1})
+
+
+class RecomendacoesTests(TestCase):
+    """
+    Testes para o modelo de filmes semelhantes e as recomendações personalizadas.
+    """
+
+    def setUp(self):
+        from .models.listas import Favorito
+
+        self.client = APIClient()
+        self.filmes = {n: Filme.objects.create(titulo=f"Filme {n}", slug=n) for n in "abcd"}
+        self.u1, self.u2, self.u3, self.u4 = (User.objects.create_user(username=f"u{i}") for i in range(1, 5))
+        for autor, slug, rating in [(self.u1, "a", 5), (self.u1, "b", 5), (self.u2, "a", 5), (self.u2, "b", 4), (self.u2, "c", 5)]:
+            Review.objects.create(filme=self.filmes[slug], autor=autor, titulo="T", texto="X", rating=rating)
+        for slug in "cd":
+            Favorito.objects.create(utilizador=self.u3, filme=self.filmes[slug])
+
+    def test_similar_por_cosseno(self):
+        from . import recomendacoes
+
+        recomendacoes.construir(k=5)
+        with self.assertNumQueries(2):
+            resposta = self.client.get("/api/filmes/a/similar/")
+        self.assertEqual([(f["slug"], round(f["score"], 3)) for f in resposta.data["results"]], [("b", 0.994), ("c", 0.5)])
+        self.assertEqual([f["slug"] for f in self.client.get("/api/filmes/c/similar/?limit=1").data["results"]], ["d"])
+        self.assertEqual(self.client.get("/api/filmes/inexistente/similar/").status_code, 404)
+
+    def test_recomendacoes_personalizadas_e_populares(self):
+        from . import recomendacoes
+
+        recomendacoes.construir(k=5)
+        self.client.force_authenticate(self.u1)
+        with self.assertNumQueries(3):
+            resposta = self.client.get("/api/recomendacoes/")
+        self.assertEqual(resposta.data["source"], "similar")
+        self.assertEqual([(f["slug"], round(f["score"], 3)) for f in resposta.data["results"]], [("c", 0.942)])
+
+        self.client.force_authenticate(self.u4)
+        resposta = self.client.get("/api/recomendacoes/")
+        self.assertEqual(resposta.data["source"], "popular")
+        self.assertEqual([f["slug"] for f in resposta.data["results"]], ["a", "c", "b"])
+
+    def test_reconstrucao_incremental(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from . import recomendacoes
+        from .models.recomendacao import FilmeSemelhante
+
+        call_command("build_recommendations", k=5, stdout=StringIO())
+        anterior = recomendacoes.ultima_construcao()
+        u5 = User.objects.create_user(username="u5")
+        Review.objects.create(filme=self.filmes["d"], autor=u5, titulo="T", texto="X", rating=5)
+
+        saida = StringIO()
+        call_command("build_recommendations", incremental=True, k=5, stdout=saida)
+        self.assertIn("2 filmes", saida.getvalue())
+        resposta = self.client.get("/api/filmes/d/similar/")
+        self.assertEqual([(f["slug"], round(f["score"], 3)) for f in resposta.data["results"]], [("c", 0.5)])
+        # O filme `a` não partilha utilizadores com `d`: os seus vizinhos não foram recalculados.
+        self.assertEqual(
+            set(FilmeSemelhante.objects.filter(filme__slug="a").values_list("calculado_em", flat=True)), {anterior}
+        )
+
+    def test_reconstrucao_incremental_com_listas(self):
+        from . import listas, recomendacoes
+        from .models.listas import Favorito
+        from .models.recomendacao import FilmeSemelhante, InteracaoRemovida
+
+        def vizinhos(slug):
+            return set(FilmeSemelhante.objects.filter(filme__slug=slug).values_list("semelhante__slug", flat=True))
+
+        recomendacoes.construir(k=5)
+        self.assertEqual(vizinhos("d"), {"c"})
+
+        # Um favorito novo (sem tocar no filme) entra na reconstrução incremental.
+        with self.captureOnCommitCallbacks(execute=True):
+            listas.adicionar(Favorito, self.u1.pk, ["d"])
+        recomendacoes.construir(k=5, desde=recomendacoes.ultima_construcao())
+        self.assertEqual(vizinhos("d"), {"a", "b", "c"})
+        self.assertIn("d", vizinhos("a"))
+
+        # As remoções (em SQL e pelo ORM) também, incluindo nos filmes que
+        # deixaram de partilhar utilizadores com `d`.
+        with self.captureOnCommitCallbacks(execute=True):
+            listas.remover(Favorito, self.u1.pk, ["d"])
+            Favorito.objects.filter(utilizador=self.u3, filme__slug="d").delete()
+        self.assertEqual(InteracaoRemovida.objects.count(), 2)
+        recomendacoes.construir(k=5, desde=recomendacoes.ultima_construcao())
+        self.assertEqual(vizinhos("d"), set())
+        self.assertNotIn("d", vizinhos("a") | vizinhos("c"))
+        self.assertFalse(InteracaoRemovida.objects.exists())
+
+
+class TendenciasTests(TestCase):
+    """
+    Testes para o ranking de tendências com decaimento exponencial.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.utilizadores = [User.objects.create_user(username=f"t{i}") for i in range(3)]
+        self.unica = Filme.objects.create(titulo="Uma Review", slug="uma-review")
+        self.varias = Filme.objects.create(titulo="Várias Reviews", slug="varias-reviews")
+
+    def _ranking(self):
+        resposta = self.client.get("/api/filmes/trending/")
+        return [(f["slug"], round(f["score"], 1)) for f in resposta.data["results"]]
+
+    def test_eventos_somados_depois_do_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(filme=self.unica, autor=self.utilizadores[0], titulo="T", texto="X", rating=5)
+            for u in self.utilizadores:
+                Review.objects.create(filme=self.varias, autor=u, titulo="T", texto="X", rating=4)
+        # Média bayesiana com 5 reviews de 3 estrelas a priori: (15 + 5) / 6 e (15 + 12) / 8.
+        self.assertEqual(self._ranking(), [("varias-reviews", 30.4), ("uma-review", 10.0)])
+
+        self.client.force_authenticate(self.utilizadores[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/filmes/uma-review/favorite/")
+        self.assertEqual(self._ranking()[1], ("uma-review", 16.7))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/filmes/uma-review/favorite/")
+        self.assertEqual(self._ranking()[1], ("uma-review", 10.0))
+
+        with self.assertNumQueries(2):
+            self.client.get("/api/filmes/trending/")
+
+    def test_compactar_aplica_o_decaimento(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import tendencias
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(filme=self.unica, autor=self.utilizadores[0], titulo="T", texto="X", rating=5)
+        incremental = self._ranking()
+
+        self.assertEqual(tendencias.compactar(), 1)
+        self.assertEqual(self._ranking(), incremental)
+
+        # Uma meia-vida depois, o evento vale metade.
+        Review.objects.filter(pk=review.pk).update(created_at=timezone.now() - timedelta(days=7))
+        tendencias.compactar()
+        self.assertEqual(self._ranking(), [("uma-review", 5.0)])
+
+
+class CatalogoTests(TestCase):
+    """
+    Testes para a exportação e importação do catálogo em JSONL e CSV.
+    """
+
+    def setUp(self):
+        from .models.elenco import Elenco
+        from .models.pessoa import Pessoa
+        from .models.video import Video
+
+        drama = Genero.objects.create(nome="Drama", slug="drama")
+        crime = Genero.objects.create(nome="Crime", slug="crime")
+        filme = Filme.objects.create(titulo="O Padrinho", slug="o-padrinho", ano_lancamento=1972, poster="p.jpg")
+        filme.generos.set([drama, crime])
+        Filme.objects.create(titulo="Sem Nada", slug="sem-nada")
+        pessoa = Pessoa.objects.create(nome="Al Pacino", slug="al-pacino")
+        Elenco.objects.create(filme=filme, pessoa=pessoa, papel="Michael", ordem_credito=1)
+        Video.objects.create(filme=filme, site="youtube", key="abc", titulo="Trailer")
+
+    def _resumo(self):
+        from .models.elenco import Elenco
+        from .models.video import Video
+
+        return {
+            "filmes": sorted(Filme.objects.values_list("slug", "titulo", "ano_lancamento", "poster")),
+            "generos": sorted(Filme.generos.through.objects.values_list("filme__slug", "genero__slug")),
+            "elenco": list(Elenco.objects.values_list("filme__slug", "pessoa__slug", "papel", "ordem_credito")),
+            "videos": list(Video.objects.values_list("filme__slug", "key", "titulo")),
+        }
+
+    def _ida_e_volta(self, formato, nome):
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+
+        original = self._resumo()
+        with tempfile.TemporaryDirectory() as pasta:
+            destino = Path(pasta) / nome
+            call_command("export_catalogue", "--format", formato, "--output", str(destino), stdout=StringIO())
+            Filme.objects.all().delete()
+            Genero.objects.all().delete()
+            saida = StringIO()
+            call_command("import_catalogue", str(destino), "--batch-size", "1", stdout=saida)
+            self.assertEqual(self._resumo(), original)
+            # Reimportar atualiza em vez de duplicar.
+            Filme.objects.filter(slug="o-padrinho").update(titulo="Alterado")
+            call_command("import_catalogue", str(destino), stdout=StringIO())
+            self.assertEqual(self._resumo(), original)
+        return saida.getvalue()
+
+    def test_ida_e_volta_jsonl(self):
+        saida = self._ida_e_volta("jsonl", "catalogo.jsonl.gz")
+        self.assertIn("registos/s", saida)
+        from .models.faceta import FacetaFilme
+        self.assertEqual(FacetaFilme.objects.get(tipo="genero", chave=str(Genero.objects.get(slug="drama").pk)).total, 1)
+
+    def test_ida_e_volta_csv(self):
+        self._ida_e_volta("csv", "catalogo")
+
+    def test_referencias_desconhecidas_ignoradas(self):
+        import json
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+
+        linhas = [
+            {"tipo": "filme", "slug": "novo", "titulo": "Novo", "generos": ["inexistente"]},
+            {"tipo": "elenco", "filme": "novo", "pessoa": "ninguem", "papel": "X"},
+            {"tipo": "video", "filme": "outro", "site": "youtube", "key": "k", "titulo": "T"},
+        ]
+        with tempfile.TemporaryDirectory() as pasta:
+            origem = Path(pasta) / "catalogo.jsonl"
+            origem.write_text("\n".join(json.dumps(l) for l in linhas), encoding="utf-8")
+            saida = StringIO()
+            call_command("import_catalogue", str(origem), stdout=saida)
+        self.assertTrue(Filme.objects.filter(slug="novo", generos__isnull=True).exists())
+        self.assertIn("1 ignorados", saida.getvalue())
+        self.assertFalse(Filme.objects.get(slug="o-padrinho").videos.filter(key="k").exists())
+
+
+class AsyncLeituraTests(TestCase):
+    """
+    Testes para as views assíncronas de leitura (`/api/async/`) e o teste de carga.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        drama = Genero.objects.create(nome="Drama", slug="drama")
+        for i in range(25):
+            filme = Filme.objects.create(titulo=f"Filme {i}", slug=f"filme-{i}", ano_lancamento=1990 + i)
+            filme.generos.add(drama)
+        self.user = User.objects.create_user(username="leitor", password="x")
+        Review.objects.create(filme=filme, autor=self.user, titulo="T", texto="X", rating=4)
+
+    def test_mesmas_respostas_que_os_endpoints_sincronos(self):
+        urls = [
+            "filmes/", "filmes/?include=facets&genero=drama&ano_min=2000", "filmes/?page=2",
+            "filmes/filme-24/", "filmes/filme-24/?expand=", "filmes/filme-24/reviews/?rating=4",
+            "filmes/inexistente/", "filmes/?ano_min=x",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                sincrona, assincrona = self.client.get("/api/" + url), self.client.get("/api/async/" + url)
+                self.assertEqual(assincrona.status_code, sincrona.status_code)
+                # Os links de paginação apontam para o mesmo endpoint.
+                self.assertEqual(assincrona.content.replace(b"/api/async/", b"/api/"), sincrona.content)
+                self.assertEqual(assincrona.get("ETag"), sincrona.get("ETag"))
+
+        seguinte = self.client.get("/api/async/filmes/").json()["next"]
+        self.assertIn("/api/async/filmes/?cursor=", seguinte)
+        self.assertEqual(len(self.client.get(seguinte).json()["results"]), 5)
+
+    def test_get_condicional_e_cache(self):
+        with self.settings(RESPONSE_CACHE_ENABLED=False):
+            etag = self.client.get("/api/async/filmes/filme-1/")["ETag"]
+            with self.assertNumQueries(1):
+                resposta = self.client.get("/api/async/filmes/filme-1/", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 304)
+
+        self.client.get("/api/async/filmes/")
+        with self.assertNumQueries(0):
+            resposta = self.client.get("/api/async/filmes/")
+        self.assertEqual(resposta["X-Cache"], "HIT")
+
+    def test_status_com_jwt(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from .models.listas import Favorito
+
+        Favorito.objects.create(utilizador=self.user, filme=Filme.objects.get(slug="filme-3"))
+        self.assertEqual(
+            self.client.get("/api/async/filmes/filme-3/status/").json(),
+            {"in_watchlist": False, "is_favorite": False},
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(
+            self.client.get("/api/async/filmes/filme-3/status/").json(),
+            {"in_watchlist": False, "is_favorite": True},
+        )
+        self.assertEqual(self.client.get("/api/async/filmes/inexistente/status/").status_code, 404)
+        estados = {
+            f["slug"]: f["is_favorite"]
+            for f in self.client.get("/api/async/filmes/?include=status&page_size=30").json()["results"]
+        }
+        self.assertEqual([s for s, favorito in estados.items() if favorito], ["filme-3"])
+
+    def test_autenticacao_assincrona_por_cookie_exige_csrf(self):
+        from asgiref.sync import async_to_sync
+        from django.conf import settings
+        from django.test import RequestFactory
+        from rest_framework.exceptions import PermissionDenied
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .authentication import JWTCookieAuthentication
+
+        autenticacao = JWTCookieAuthentication()
+        fabrica = RequestFactory()
+        fabrica.cookies[settings.JWT_AUTH_COOKIE] = str(AccessToken.for_user(self.user))
+        self.assertEqual(async_to_sync(autenticacao.aauthenticate)(fabrica.get("/api/async/filmes/"))[0], self.user)
+        pedido = fabrica.post("/api/async/filmes/")
+        pedido._dont_enforce_csrf_checks = False
+        with self.assertRaises(PermissionDenied):
+            async_to_sync(autenticacao.aauthenticate)(pedido)
+
+    def test_teste_de_carga(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from . import carga
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                corpo = b'{"ok":true}'
+                self.send_response(200 if self.path == "/api/ok/" else 404)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            base = f"http://127.0.0.1:{servidor.server_port}/api/"
+            resumo = carga.executar(base, ["ok/", "nao/"], concorrencia=4, duracao=0.3, aquecimento=0)
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        self.assertGreater(resumo["pedidos"], 0)
+        self.assertEqual(resumo["falhas"], 0)
+        self.assertEqual(set(resumo["codigos"]), {"200", "404"})
+        with self.assertRaises(ValueError):
+            carga.executar("https://exemplo.pt/api/", ["ok/"])
+
+
+class FilmeReviewsTests(TestCase):
+    """
+    Testes para a listagem paginada (e exportação em stream) das reviews de um filme.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.filme = Filme.objects.create(titulo="Com Reviews", slug="com-reviews")
+        for i in range(6):
+            autor = User.objects.create_user(username=f"critico{i}", password="123")
+            Review.objects.create(filme=self.filme, autor=autor, rating=i % 5 + 1, texto=f"Texto {i}", spoiler=i % 2 == 0)
+
+    def test_listagem_paginada_sem_n_mais_1(self):
+        url = f"/api/filmes/{self.filme.slug}/reviews/?page_size=4"
+        # Uma query para o filme, outra para os validadores (ETag) e outra
+        # para a página (com o autor por JOIN).
+        with self.assertNumQueries(3):
+            resposta = self.client.get(url)
+        self.assertEqual(len(resposta.data["results"]), 4)
+        self.assertIsNotNone(resposta.data["next"])
+        self.assertEqual(resposta.data["results"][0]["autor"]["username"], "critico5")
+
+    def test_filtros_e_ordenacao(self):
+        url = f"/api/filmes/{self.filme.slug}/reviews/?spoiler=0&ordering=highest"
+        ratings = [r["rating"] for r in self.client.get(url).data["results"]]
+        self.assertEqual(ratings, [4, 2, 1])
+
+        url = f"/api/filmes/{self.filme.slug}/reviews/?rating=1,2"
+        self.assertEqual(len(self.client.get(url).data["results"]), 3)
+        self.assertEqual(self.client.get(f"/api/filmes/{self.filme.slug}/reviews/?rating=9").status_code, 400)
+
+    def test_exportacao_em_stream(self):
+        import json
+
+        resposta = self.client.get(f"/api/filmes/{self.filme.slug}/reviews/?stream=1")
+        self.assertTrue(resposta.streaming)
+        dados = json.loads(b"".join(resposta.streaming_content))
+        self.assertEqual(len(dados), 6)
+        self.assertEqual(set(dados[0]), {"id", "autor", "titulo", "texto", "rating", "spoiler", "created_at", "updated_at"})
+
+
+class SearchTests(TestCase):
+    """
+    Testes para a pesquisa de texto integral (fallback FTS5 em SQLite).
+    """
+
+    def setUp(self):
+        from .models.pessoa import Pessoa
+
+        self.client = APIClient()
+        self.filme = Filme.objects.create(titulo="O Padrinho", slug="o-padrinho", descricao="Uma família da máfia.")
+        Filme.objects.create(titulo="Tubarão", slug="tubarao", descricao="Um padrinho aparece no fim.")
+        Pessoa.objects.create(nome="Francis Ford Coppola", slug="coppola", bio="Realizador de O Padrinho.")
+        autor = User.objects.create_user(username="leitor", password="123")
+        Review.objects.create(filme=self.filme, autor=autor, rating=5, titulo="Obra-prima", texto="Máfia e família.")
+
+    def test_resultados_mistos_ordenados_por_relevancia(self):
+        resultados = self.client.get("/api/search/?q=padrinho").data["results"]
+        tipos = [(r["tipo"], r.get("slug")) for r in resultados]
+        # O título pesa mais do que a descrição ou a biografia.
+        self.assertEqual(tipos[0], ("filme", "o-padrinho"))
+        self.assertIn(("filme", "tubarao"), tipos)
+        self.assertIn(("pessoa", "coppola"), tipos)
+
+    def test_filtra_por_tipo_e_acompanha_alteracoes(self):
+        resultados = self.client.get("/api/search/?q=mafia&tipo=review").data["results"]
+        self.assertEqual([r["filme__slug"] for r in resultados], ["o-padrinho"])
+
+        self.filme.titulo = "Il Padrino"
+        self.filme.save()
+        resultados = self.client.get("/api/search/?q=padrino&tipo=filme").data["results"]
+        self.assertEqual([r["slug"] for r in resultados], ["o-padrinho"])
+
+        self.filme.delete()
+        self.assertEqual(self.client.get("/api/search/?q=padrino").data["results"], [])
+        self.assertEqual(self.client.get("/api/search/?q=x").status_code, 400)
+
+
+class FetchImdbTop250Tests(TestCase):
+    """
+    Testes para o pipeline de importação do IMDb, contra um servidor HTTP local.
+    """
+
+    LISTA = """<ul>{}</ul>"""
+    ITEM = """
+        <li class="ipc-metadata-list-summary-item">
+          <a class="ipc-title-link-wrapper" href="/title/{id}/"><h3 class="ipc-title__text">{titulo}</h3></a>
+          <div class="cli-title-metadata"><span class="cli-title-metadata-item">{ano}</span></div>
+          <span class="ipc-rating-star--imdb"><span class="ipc-rating-star--rating">9,1</span></span>
+        </li>"""
+    DETALHE = """
+        <span data-testid="plot-xl">Sinopse de {id}.</span>
+        <div data-testid="hero-media__poster"><img src="https://img/{id}._V1_QL75.jpg"></div>"""
+
+    def setUp(self):
+        import tempfile
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.ids = ["tt0000001", "tt0000002", "tt0000003"]
+        self.pedidos = []
+        # Páginas de detalhe que respondem com um erro.
+        self.indisponiveis = set()
+        testes = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                testes.pedidos.append(self.path)
+                if self.path == "/chart/top/":
+                    itens = "".join(
+                        testes.ITEM.format(id=i, titulo=f"Filme {i}", ano=1990 + n) for n, i in enumerate(testes.ids)
+                    )
+                    corpo = testes.LISTA.format(itens)
+                elif self.path.split("/")[2] in testes.indisponiveis:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                else:
+                    corpo = testes.DETALHE.format(id=self.path.split("/")[2])
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(corpo.encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.checkpoint = f"{tempfile.mkdtemp()}/checkpoint.json"
+
+    def _correr(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command(
+            "fetch_imdb_top250", f"--base-url=http://127.0.0.1:{self.servidor.server_port}",
+            "--rate=0", "--batch-size=2", f"--checkpoint={self.checkpoint}", *args,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+
+    def test_importa_e_atualiza_em_lotes(self):
+        self._correr()
+        filmes = Filme.objects.order_by("imdb_id")
+        self.assertEqual([f.imdb_id for f in filmes], self.ids)
+        self.assertEqual(filmes[0].descricao, "Sinopse de tt0000001.")
+        self.assertEqual(filmes[0].poster, "https://img/tt0000001._V1_.jpg")
+        self.assertEqual(filmes[0].media_rating, 9.1)
+
+        # Uma segunda execução atualiza os filmes existentes em vez de os duplicar.
+        self._correr()
+        self.assertEqual(Filme.objects.count(), 3)
+
+    def test_retoma_a_partir_do_checkpoint(self):
+        import json
+        import os
+
+        with open(self.checkpoint, "w") as f:
+            json.dump({"concluidos": self.ids[:2]}, f)
+        self._correr()
+
+        detalhes = [p for p in self.pedidos if p != "/chart/top/"]
+        self.assertEqual(detalhes, [f"/title/{self.ids[2]}/"])
+        # No fim de uma execução completa o checkpoint é removido.
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_detalhes_falhados_ficam_fora_do_checkpoint(self):
+        import json
+        import os
+
+        self.indisponiveis = {self.ids[1]}
+        self._correr("--retries=0")
+        # O filme é gravado com os dados da lista, mas não fica como concluído.
+        self.assertEqual(Filme.objects.get(imdb_id=self.ids[1]).descricao, "")
+        with open(self.checkpoint) as f:
+            self.assertEqual(sorted(json.load(f)["concluidos"]), [self.ids[0], self.ids[2]])
+
+        self.indisponiveis = set()
+        self.pedidos.clear()
+        self._correr("--retries=0")
+        self.assertEqual([p for p in self.pedidos if p != "/chart/top/"], [f"/title/{self.ids[1]}/"])
+        self.assertEqual(Filme.objects.get(imdb_id=self.ids[1]).descricao, f"Sinopse de {self.ids[1]}.")
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+
+class AutenticacaoJWTTests(TestCase):
+    """
+    Testes para o token na cookie HttpOnly e a cache de utilizadores da autenticação JWT.
+    """
+
+    def setUp(self):
+        from .authentication import utilizadores
+
+        utilizadores.limpar()
+        self.user = User.objects.create_user(username="jwt", password="uma-palavra-passe")
+        self.client = APIClient()
+        Filme.objects.create(titulo="Com Cookie", slug="com-cookie")
+
+    def _login(self):
+        resposta = self.client.post(
+            "/api/auth/token/", {"username": "jwt", "password": "uma-palavra-passe"}, format="json"
+        )
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_login_define_cookie_httponly_aceite_sem_cabecalho(self):
+        from django.conf import settings
+
+        cookie = self._login().cookies[settings.JWT_AUTH_COOKIE]
+        self.assertTrue(cookie["httponly"])
+        self.assertEqual(self.client.get("/api/auth/me/").data["username"], "jwt")
+        resposta = self.client.get("/api/filmes/com-cookie/status/")
+        self.assertEqual(resposta.data, {"in_watchlist": False, "is_favorite": False})
+
+        self.assertEqual(self.client.post("/api/auth/logout/").status_code, 204)
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_utilizador_em_cache_ate_ser_gravado(self):
+        access = self._login().data["access"]
+        self.client.cookies.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        with self.assertNumQueries(1):
+            self.client.get("/api/auth/me/")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/auth/me/").data["username"], "jwt")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_escritas_por_cookie_exigem_csrf(self):
+        from django.conf import settings
+
+        self._login()
+        cookies = self.client.cookies
+        cliente = APIClient(enforce_csrf_checks=True)
+        cliente.cookies = cookies
+        self.assertEqual(cliente.put("/api/filmes/com-cookie/watchlist/").status_code, 403)
+
+        # O login define a cookie CSRF, cujo valor acompanha as escritas por cookie.
+        csrf = cookies[settings.CSRF_COOKIE_NAME].value
+        resposta = cliente.put("/api/filmes/com-cookie/watchlist/", HTTP_X_CSRFTOKEN=csrf)
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(cliente.delete("/api/filmes/com-cookie/watchlist/", HTTP_X_CSRFTOKEN=csrf).status_code, 200)
+
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {cookies['cinemix_access'].value}")
+        self.assertEqual(cliente.put("/api/filmes/com-cookie/watchlist/").status_code, 201)
+
+
+class SessoesApiTests(TestCase):
+    """
+    Testes para os pedidos à API sem sessão (`API_SESSIONLESS`).
+    """
+
+    def setUp(self):
+        Filme.objects.create(titulo="Sem Sessão", slug="sem-sessao")
+        self.admin = User.objects.create_user(username="admin-sessoes", is_staff=True, is_superuser=True)
+
+    def test_pedidos_anonimos_e_com_jwt_nao_usam_a_sessao(self):
+        from django.test import Client, override_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        cliente = Client()
+        self.assertNotIn("Cookie", cliente.get("/api/filmes/").get("Vary", ""))
+        with override_settings(API_SESSIONLESS=False):
+            self.assertIn("Cookie", Client().get("/api/filmes/").get("Vary", ""))
+
+        # Com a cookie de sessão e um JWT, o utilizador é o do token, sem ler a sessão.
+        cliente.force_login(self.admin)
+        outro = User.objects.create_user(username="com-token")
+        with self.assertNumQueries(1):
+            resposta = cliente.get("/api/auth/me/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(outro)}")
+        self.assertEqual(resposta.json()["username"], "com-token")
+
+    def test_sessao_mantida_no_admin_e_sem_token(self):
+        from django.test import Client
+
+        cliente = Client()
+        cliente.force_login(self.admin)
+        self.assertEqual(cliente.get("/api/auth/me/").json()["username"], "admin-sessoes")
+        self.assertEqual(cliente.get("/admin/core/filme/").status_code, 200)
+
+    def test_sessao_terminada_no_servidor(self):
+        from django.contrib.sessions.models import Session
+        from django.test import Client
+
+        # Por defeito as sessões ficam na base de dados: apagá-las termina-as.
+        cliente = Client()
+        cliente.force_login(self.admin)
+        Session.objects.all().delete()
+        self.assertEqual(cliente.get("/admin/core/filme/").status_code, 302)
+
+    def test_comando_mede_as_configuracoes(self):
+        import json
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as pasta:
+            destino = Path(pasta) / "sessoes.json"
+            call_command("bench_api_sessions", "--repeat", "2", "--output", str(destino), stdout=StringIO())
+            relatorio = json.loads(destino.read_text())
+        self.assertEqual(set(relatorio), {"db", "cookie", "sem_sessao"})
+        self.assertTrue(relatorio["db"]["anonimo"]["vary_cookie"])
+        self.assertFalse(relatorio["sem_sessao"]["anonimo"]["vary_cookie"])
+        self.assertLess(relatorio["cookie"]["anonimo_sessao"]["queries"], relatorio["db"]["anonimo_sessao"]["queries"])
+        self.assertFalse(Filme.objects.filter(slug="bench-sessoes").exists())
+
+
+class ReplicasTests(TestCase):
+    """
+    Testes para o encaminhamento das leituras do catálogo para as réplicas.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="replicas")
+        Filme.objects.create(titulo="Na Réplica", slug="na-replica")
+
+    def _aliases_lidos(self, pedido):
+        """Os aliases escolhidos pelo router para as leituras de `pedido`."""
+        from unittest import mock
+        from django.test import override_settings
+        from .replicas import ReplicaRouter
+
+        lidos = []
+        original = ReplicaRouter.db_for_read
+
+        def espiao(router, model, **hints):
+            lidos.append(original(router, model, **hints))
+            # A réplica não existe nos testes: a leitura é feita na `default`.
+            return None
+
+        with override_settings(DATABASE_REPLICAS=["replica_1"], RESPONSE_CACHE_ENABLED=False):
+            with mock.patch.object(ReplicaRouter, "db_for_read", espiao):
+                resposta = pedido()
+        return resposta, set(lidos)
+
+    def test_leituras_do_catalogo_vao_para_a_replica(self):
+        resposta, lidos = self._aliases_lidos(lambda: self.client.get("/api/filmes/"))
+        self.assertEqual((resposta.status_code, lidos), (200, {"replica_1"}))
+        _, lidos = self._aliases_lidos(lambda: self.client.get("/api/filmes/na-replica/reviews/"))
+        self.assertEqual(lidos, {"replica_1"})
+        _, lidos = self._aliases_lidos(lambda: self.client.get("/api/reviews/"))
+        self.assertEqual(lidos, {None})
+
+    def test_escrita_fixa_o_cliente_na_primaria(self):
+        from django.conf import settings
+
+        self.client.force_authenticate(self.user)
+        resposta, _ = self._aliases_lidos(lambda: self.client.put("/api/filmes/na-replica/watchlist/"))
+        self.assertEqual(resposta.status_code, 201)
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, resposta.cookies)
+        _, lidos = self._aliases_lidos(lambda: self.client.get("/api/filmes/"))
+        self.assertEqual(lidos, {None})
+
+        # Nem a cache de respostas, que pode ter sido preenchida a partir de uma réplica.
+        from django.test import override_settings
+        anonimo = APIClient()
+        anonimo.cookies[settings.REPLICA_STICKY_COOKIE] = "1"
+        with override_settings(DATABASE_REPLICAS=["replica_1"]):
+            self.assertNotIn("X-Cache", anonimo.get("/api/filmes/"))
+
+    def test_router_escreve_e_migra_so_na_primaria(self):
+        from django.test import override_settings
+        from .replicas import ReplicaRouter, usar_replica
+
+        router = ReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=["replica_1"]), usar_replica("replica_1"):
+            self.assertEqual(router.db_for_read(Filme), "replica_1")
+            self.assertEqual(router.db_for_write(Filme), "default")
+            self.assertIs(router.allow_migrate("replica_1", "core"), False)
+            self.assertIsNone(router.allow_migrate("default", "core"))
+        self.assertIsNone(router.db_for_read(Filme))
+
+
+class EsquemaOpenApiTests(TestCase):
+    """
+    Testes para o esquema OpenAPI pré-gerado (`build_openapi_schema` e `/api/schema/`).
+    """
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        definicoes = override_settings(OPENAPI_SCHEMA_DIR=pasta.name, OPENAPI_SCHEMA_REQUIRED=False)
+        definicoes.enable()
+        self.addCleanup(definicoes.disable)
+
+    def _gerar(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command("build_openapi_schema", stdout=StringIO(), stderr=StringIO())
+
+    def test_esquema_servido_com_etag_e_gzip_sem_introspecao(self):
+        import gzip
+        import json
+        from unittest import mock
+        from drf_spectacular.generators import SchemaGenerator
+
+        self._gerar()
+        with mock.patch.object(SchemaGenerator, "get_schema", side_effect=AssertionError("introspeção")):
+            with self.assertNumQueries(0):
+                resposta = self.client.get("/api/schema/")
+            self.assertEqual(resposta["Content-Type"], "application/vnd.oai.openapi+json")
+            self.assertIn("/api/filmes/", json.loads(resposta.content)["paths"])
+
+            comprimida = self.client.get("/api/schema/", HTTP_ACCEPT_ENCODING="gzip, br")
+            self.assertEqual(comprimida["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(comprimida.content), resposta.content)
+            self.assertIn("Accept-Encoding", comprimida["Vary"])
+
+            repetida = self.client.get("/api/schema/", HTTP_IF_NONE_MATCH=resposta["ETag"])
+            self.assertEqual((repetida.status_code, repetida.content), (304, b""))
+
+    def test_verificacao_deteta_esquema_desatualizado(self):
+        import json
+        from django.core import checks
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from django.test import override_settings
+        from . import esquema
+
+        with override_settings(OPENAPI_SCHEMA_REQUIRED=True):
+            self.assertEqual([e.id for e in esquema.verificar_artefacto()], ["core.E001"])
+            # Só no `check --deploy`: o `migrate` corre antes de o esquema ser gerado.
+            self.assertNotIn("core.E001", [e.id for e in checks.run_checks()])
+            self.assertIn("core.E001", [e.id for e in checks.run_checks(include_deployment_checks=True)])
+        self._gerar()
+        self.assertEqual(esquema.verificar_artefacto(), [])
+
+        # Um esquema gerado com outras rotas.
+        meta = esquema.caminhos()["meta"]
+        meta.write_text(json.dumps({**json.loads(meta.read_text()), "rotas": "outras"}))
+        self.assertEqual([e.id for e in esquema.verificar_artefacto()], ["core.E003"])
+        with self.assertRaises(CommandError):
+            call_command("build_openapi_schema", "--check")
+
+    def test_views_sem_serializer_documentadas(self):
+        from drf_spectacular.generators import SchemaGenerator
+
+        # As views ignoradas pelo gerador (sem serializer) não aparecem em `paths`.
+        caminhos = SchemaGenerator().get_schema(request=None, public=True)["paths"]
+        pesquisa = caminhos["/api/search/"]["get"]
+        self.assertIn("q", [p["name"] for p in pesquisa["parameters"]])
+        self.assertIn("200", pesquisa["responses"])
+        self.assertIn("200", caminhos["/api/recomendacoes/"]["get"]["responses"])
+        self.assertIn("200", caminhos["/api/me/library/"]["get"]["responses"])
+        self.assertIn("204", caminhos["/api/auth/logout/"]["post"]["responses"])
+
+
+class RenderizacaoCompressaoTests(TestCase):
+    """
+    Testes para o `JSONRapidoRenderer` (orjson), o MessagePack e a compressão das respostas.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(30):
+            Filme.objects.create(titulo=f"Comprimido {i}", slug=f"comprimido-{i}", poster=f"https://exemplo.org/{i}.jpg")
+
+    def test_json_rapido_igual_ao_do_drf(self):
+        import datetime
+        from decimal import Decimal
+        from unittest import mock
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from . import renderers
+
+        dados = {
+            "data": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "dia": datetime.date(2024, 5, 1),
+            "preco": Decimal("4.50"),
+            "texto": gettext_lazy("Filmes"),
+            1: ["linha\u2028separada", None, True, 3.25],
+            "enorme": 2 ** 70,
+        }
+        esperado = JSONRenderer().render(dados)
+        self.assertEqual(renderers.JSONRapidoRenderer().render(dados), esperado)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.JSONRapidoRenderer().render(dados), esperado)
+
+        # Indentado (API navegável): a biblioteca padrão, como o DRF.
+        indentado = renderers.JSONRapidoRenderer().render(dados, "application/json; indent=4")
+        self.assertEqual(indentado, JSONRenderer().render(dados, "application/json; indent=4"))
+
+        resposta = self.client.get("/api/filmes/")
+        self.assertEqual(resposta.content, JSONRenderer().render(resposta.data))
+
+    def test_messagepack_so_com_o_pacote_instalado(self):
+        from django.conf import settings
+        from . import renderers
+
+        registado = "backend.core.renderers.MessagePackRenderer" in settings.REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]
+        if renderers.msgpack is None:
+            self.assertFalse(registado)
+            self.skipTest("msgpack não instalado")
+        resposta = self.client.get("/api/filmes/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(resposta["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(resposta.content), self.client.get("/api/filmes/").json())
+
+    def test_negociacao_da_codificacao(self):
+        from unittest import mock
+        from . import compressao
+
+        preferencia = ["zstd", "br", "gzip"]
+        with mock.patch.dict(compressao.CODIFICADORES, {"br": (lambda dados, nivel: dados, 4)}):
+            self.assertEqual(compressao.escolher("gzip, br;q=0.5", preferencia), "br")
+            self.assertEqual(compressao.escolher("gzip, br;q=0", preferencia), "gzip")
+        with mock.patch.dict(compressao.CODIFICADORES, {"gzip": compressao.CODIFICADORES["gzip"]}, clear=True):
+            self.assertEqual(compressao.escolher("zstd, br, gzip;q=0.1", preferencia), "gzip")
+            self.assertEqual(compressao.escolher("*", preferencia), "gzip")
+            self.assertIsNone(compressao.escolher("identity", preferencia))
+            self.assertIsNone(compressao.escolher("", preferencia))
+
+    def test_respostas_comprimidas_acima_do_limite(self):
+        import gzip
+        from django.test import override_settings
+
+        original = self.client.get("/api/filmes/")
+        self.assertNotIn("Content-Encoding", original)
+        self.assertIn("Accept-Encoding", original["Vary"])
+
+        with override_settings(RESPONSE_COMPRESSION_ENCODINGS=["gzip"]):
+            comprimida = self.client.get("/api/filmes/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+            self.assertEqual(comprimida["Content-Encoding"], "gzip")
+            self.assertEqual(int(comprimida["Content-Length"]), len(comprimida.content))
+            self.assertEqual(gzip.decompress(comprimida.content), original.content)
+            self.assertTrue(comprimida["ETag"].startswith("W/"))
+            self.assertEqual(comprimida["ETag"].removeprefix("W/"), original["ETag"].removeprefix("W/"))
+
+            # O ETag fraco continua a validar os pedidos condicionais.
+            repetida = self.client.get("/api/filmes/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=comprimida["ETag"])
+            self.assertEqual(repetida.status_code, 304)
+
+            recusada = self.client.get("/api/filmes/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+            self.assertNotIn("Content-Encoding", recusada)
+
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=len(original.content) + 1):
+            pequena = self.client.get("/api/filmes/", HTTP_ACCEPT_ENCODING="gzip")
+            self.assertNotIn("Content-Encoding", pequena)
+            self.assertIn("Accept-Encoding", pequena["Vary"])
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Testes para os pedidos GET condicionais (ETag / Last-Modified).
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.filme = Filme.objects.create(titulo="Condicional", slug="condicional")
+
+    def test_detalhe_responde_304_ate_o_filme_mudar(self):
+        url = f"/api/filmes/{self.filme.slug}/"
+        resposta = self.client.get(url)
+        etag = resposta["ETag"]
+        self.assertIn("Last-Modified", resposta)
+
+        # Servido da cache de respostas, o 304 não precisa de nenhuma query.
+        with self.assertNumQueries(0):
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+
+        # Sem cache (utilizador autenticado), basta uma query de agregação,
+        # sem carregar nem serializar o filme.
+        self.client.force_authenticate(User.objects.create_user(username="cond", password="123"))
+        with self.assertNumQueries(1):
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+
+        self.filme.descricao = "Nova descrição."
+        self.filme.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listagem_muda_com_generos_e_remocoes(self):
+        etag = self.client.get("/api/filmes/")["ETag"]
+        genero = Genero.objects.create(nome="Comédia", slug="comedia")
+        self.filme.generos.add(genero)
+        resposta = self.client.get("/api/filmes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+        etag = resposta["ETag"]
+        # O ETag da listagem vem dos contadores de versão: sem cache de respostas
+        # (utilizador autenticado), o 304 não precisa de nenhuma query.
+        self.client.force_authenticate(User.objects.create_user(username="cond-lista", password="123"))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/filmes/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.force_authenticate(None)
+
+        # Uma escrita desfeita em seguida também muda o ETag.
+        Filme.objects.create(titulo="Outro", slug="outro")
+        Filme.objects.filter(slug="outro").delete()
+        resposta = self.client.get("/api/filmes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        etag = resposta["ETag"]
+
+        etag_generos = self.client.get("/api/generos/")["ETag"]
+        genero.nome = "Comédia Romântica"
+        genero.save()
+        self.assertEqual(self.client.get("/api/generos/", HTTP_IF_NONE_MATCH=etag_generos).status_code, 200)
+        self.assertEqual(self.client.get("/api/filmes/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listagem_sem_last_modified(self):
+        Filme.objects.create(titulo="A Remover", slug="a-remover")
+        resposta = self.client.get("/api/filmes/")
+        self.assertNotIn("Last-Modified", resposta)
+        self.assertNotIn("Last-Modified", self.client.get(f"/api/filmes/{self.filme.slug}/reviews/"))
+        self.assertIn("Last-Modified", self.client.get(f"/api/generos/{Genero.objects.create(nome='Drama', slug='drama').pk}/"))
+
+        # Só com `If-Modified-Since`, uma remoção (que não muda o MAX(updated_at)) já não dá 304.
+        Filme.objects.filter(slug="a-remover").delete()
+        resposta = self.client.get("/api/filmes/", HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.data["results"]), 1)
+
+
+class BenchmarkTests(TestCase):
+    """
+    Testes para o benchmark da API: limites de queries por endpoint e N+1.
+    """
+
+    def test_endpoints_respeitam_o_limite_de_queries(self):
+        from .benchmark import excedidos, executar, gerar_dados
+
+        gerar_dados(filmes=6, generos=3, pessoas=8, creditos=3, utilizadores=4, reviews=3)
+        pequeno = executar(repeticoes=1)
+        self.assertEqual(excedidos(pequeno), [])
+
+        # Com mais dados, o número de queries de cada endpoint não pode crescer.
+        gerar_dados(filmes=30, generos=3, pessoas=8, creditos=3, utilizadores=4, reviews=3, seed=7, prefixo="mais")
+        grande = executar(repeticoes=1)
+        self.assertEqual(
+            {n: r["queries"] for n, r in grande["cenarios"].items()},
+            {n: r["queries"] for n, r in pequeno["cenarios"].items()},
+        )
+
+    def test_comando_grava_relatorio_json(self):
+        import json
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as pasta:
+            destino = Path(pasta) / "relatorio.json"
+            call_command("benchmark_api", "--filmes", "5", "--utilizadores", "3", "--repeat", "2",
+                         "--check", "--output", str(destino), stdout=StringIO())
+            relatorio = json.loads(destino.read_text())
+        self.assertEqual(relatorio["meta"]["dados"]["filmes"], 5)
+        self.assertIn("p95_ms", relatorio["cenarios"]["filmes.list"])
+        self.assertFalse(Filme.objects.exists())
+
+
+class InstrumentacaoTests(TestCase):
+    """
+    Testes para o middleware de instrumentação (Server-Timing, logs e perfis).
+    """
+
+    def setUp(self):
+        genero = Genero.objects.create(nome="Instrumentado", slug="instrumentado")
+        for i in range(6):
+            Filme.objects.create(titulo=f"Medido {i}", slug=f"medido-{i}").generos.add(genero)
+
+    def test_cabecalho_server_timing_e_registo(self):
+        import json
+
+        with self.settings(INSTRUMENTATION_ENABLED=True, RESPONSE_CACHE_ENABLED=False):
+            client = APIClient()
+            with self.assertLogs("backend.core.middleware", level="INFO") as logs:
+                resposta = client.get("/api/filmes/")
+        cabecalho = resposta["Server-Timing"]
+        for nome in ("db;dur=", "serializer;dur=", "view;dur=", "render;dur=", "total;dur="):
+            self.assertIn(nome, cabecalho)
+        registo = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((registo["path"], registo["status"]), ("/api/filmes/", 200))
+        self.assertEqual(registo["queries"], 2)
+
+    def test_queries_repetidas_geram_aviso(self):
+        import json
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import InstrumentacaoMiddleware, Medicoes
+
+        medicoes = Medicoes()
+        for _ in range(3):
+            medicoes.queries.append(("SELECT 1 WHERE id = %s", ("1",), 0.001))
+        medicoes.queries.append(("SELECT 1 WHERE id = %s", ("2",), 0.001))
+        self.assertEqual(medicoes.duplicadas(), 2)
+        self.assertEqual(medicoes.repetidas(4), {"SELECT 1 WHERE id = %s": 4})
+
+        def view_com_n_mais_1(request):
+            for filme in Filme.objects.all():
+                list(filme.generos.all())
+            return HttpResponse("ok")
+
+        with self.settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_REPEATED_THRESHOLD=5):
+            middleware = InstrumentacaoMiddleware(view_com_n_mais_1)
+            with self.assertLogs("backend.core.middleware", level="WARNING") as logs:
+                resposta = middleware(RequestFactory().get("/n-mais-1/"))
+        self.assertIn('desc="7 queries, 0 dup"', resposta["Server-Timing"])
+        registo = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(registo["repeated"][0]["count"], 6)
+
+    def test_serializers_aninhados_contam_uma_vez(self):
+        from unittest import mock
+        from rest_framework import serializers
+        from . import middleware
+
+        class Interior(serializers.Serializer):
+            nome = serializers.CharField()
+
+        class Exterior(serializers.Serializer):
+            interiores = serializers.SerializerMethodField()
+
+            def get_interiores(self, obj):
+                return Interior([{"nome": "a"}, {"nome": "b"}], many=True).data
+
+        medicoes = middleware.Medicoes()
+        token = middleware._medicoes.set(medicoes)
+        # Cada leitura do relógio avança um segundo.
+        relogio = iter(range(100))
+        try:
+            with mock.patch.object(middleware.time, "perf_counter", lambda: next(relogio)):
+                dados = middleware.medir_dados(Exterior({}))
+        finally:
+            middleware._medicoes.reset(token)
+        self.assertEqual(dados["interiores"], [{"nome": "a"}, {"nome": "b"}])
+        self.assertEqual(medicoes.tempos["serializer"], 1)
+
+    def test_serializers_nao_sao_alterados_globalmente(self):
+        from rest_framework import serializers
+
+        with self.settings(INSTRUMENTATION_ENABLED=True, RESPONSE_CACHE_ENABLED=False):
+            APIClient().get("/api/filmes/")
+        self.assertEqual(serializers.BaseSerializer.__dict__["data"].fget.__module__, "rest_framework.serializers")
+
+    def test_amostragem_de_perfis(self):
+        import tempfile
+        from pathlib import Path
+
+        with tempfile.TemporaryDirectory() as pasta:
+            with self.settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_PROFILE_RATE=1.0, INSTRUMENTATION_PROFILE_DIR=pasta):
+                APIClient().get("/api/generos/")
+            perfis = list(Path(pasta).glob("*.prof"))
+            self.assertEqual(len(perfis), 1)
+            self.assertIn("api_generos", perfis[0].name)
@@ -7,15 +7,35 @@ from .views import (
     ReviewViewSet,
     WatchlistViewSet,
     FavoritoViewSet,
+    PessoaViewSet,
+    SearchView,
+    RecomendacoesView,
+    BibliotecaView,
 )
+from .views_async import vista_assincrona
 
 router = DefaultRouter()
 router.register(r'generos', GeneroViewSet, basename='genero')
 router.register(r'filmes', FilmeViewSet, basename='filme')
+router.register(r'pessoas', PessoaViewSet, basename='pessoa')
 router.register(r'reviews', ReviewViewSet, basename='review')
 router.register(r'watchlist', WatchlistViewSet, basename='watchlist')
 router.register(r'favoritos', FavoritoViewSet, basename='favorito')
 
+# Os links de paginação incluem o URL: as respostas de `/api/async/` têm chaves próprias na cache.
+FILMES_ASYNC = {'basename': 'filme-async'}
+
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    path('recomendacoes/', RecomendacoesView.as_view(), name='recomendacoes'),
+    path('me/library/', BibliotecaView.as_view(), name='me-library'),
+    # Ações assíncronas de `FilmeViewSet` (ver views_async.py), para servir sob ASGI.
+    path('async/filmes/', vista_assincrona(FilmeViewSet, {'get': 'list'}, **FILMES_ASYNC), name='async-filme-list'),
+    path('async/filmes/<slug:slug>/', vista_assincrona(FilmeViewSet, {'get': 'retrieve'}, **FILMES_ASYNC),
+         name='async-filme-detail'),
+    path('async/filmes/<slug:slug>/reviews/', vista_assincrona(FilmeViewSet, {'get': 'list_reviews'}, **FILMES_ASYNC),
+         name='async-filme-reviews'),
+    path('async/filmes/<slug:slug>/status/', vista_assincrona(FilmeViewSet, {'get': 'status'}, **FILMES_ASYNC),
+         name='async-filme-status'),
     path('', include(router.urls)),
 ]
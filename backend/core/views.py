@@ -1,41 +1,369 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import viewsets, permissions, generics, status
+from django.db.models import (
+    Avg, BooleanField, Count, Exists, F, Max, Min, OuterRef, Prefetch, Q, Subquery, Value, aprefetch_related_objects,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.middleware.csrf import get_token
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema, inline_serializer
+from rest_framework import viewsets, permissions, generics, serializers, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .models.taxonomia import Genero
 from .models.filme import Filme
 from .models.review import Review
 from .models.listas import Watchlist, Favorito
+from .models.elenco import Elenco
+from .models.pessoa import Pessoa
+from .models.video import Video
+from .models.tendencia import TendenciaFilme
 
+from .conditional import (
+    ConditionalGetMixin, acalcular_validadores, aplicar_validadores, calcular_validadores, resposta_condicional,
+    validadores_objeto,
+)
+from .caching import (
+    VersionedCacheMixin, VERSAO_CATALOGO, VERSAO_GENEROS, VERSAO_PESSOAS, versao_filme, versao_genero,
+)
+from . import biblioteca, facetas, listas, recomendacoes, tendencias
+from .authentication import apagar_cookie, definir_cookie
+from .middleware import SerializacaoMedidaMixin, medir_dados
+from .replicas import LeituraReplicaMixin
+from .search import pesquisar, TIPOS as TIPOS_PESQUISA
+from .views_async import LeituraAssincronaMixin
+from .pagination import (
+    BibliotecaKeysetPagination, FilmeKeysetPagination, FilmografiaKeysetPagination, PessoaKeysetPagination,
+    ReviewKeysetPagination, ReviewRatingKeysetPagination,
+)
 from .serializers import (
     GeneroSerializer,
-    FilmeListSerializer, FilmeDetailSerializer, FilmeWriteSerializer,
-    ReviewSerializer, WatchlistSerializer, FavoritoSerializer,
+    FilmeListSerializer, FilmeListStatusSerializer, FilmeDetailSerializer, FilmeWriteSerializer,
+    FilmeListRapidoSerializer, FilmeListStatusRapidoSerializer, FilmeScoreRapidoSerializer, FilmeScoreSerializer,
+    PessoaEstatisticasSerializer, FilmografiaSerializer,
+    ReviewSerializer, WatchlistSerializer, FavoritoSerializer, ItemBibliotecaRapidoSerializer, PaginaBibliotecaSerializer,
+    stream_reviews_json,
+    ageneros_por_filme, generos_por_filme,
     UserRegistrationSerializer, UserSerializer,
 )
 
 User = get_user_model()
 
-class GeneroViewSet(viewsets.ModelViewSet):
+# Número máximo de filmes por pedido de estado em lote.
+MAX_FILMES_ESTADO = 100
+
+# Número máximo de filmes por pedido de escrita em lote nas listas pessoais.
+MAX_FILMES_LISTA = 1000
+
+# Número máximo de filmes semelhantes ou recomendados por pedido.
+MAX_RECOMENDACOES = 50
+
+# Listas pessoais devolvidas por `/api/me/library/`.
+BIBLIOTECA_LISTAS = {
+    'watchlist': Watchlist,
+    'favoritos': Favorito,
+}
+
+# Ordenações disponíveis para as reviews de um filme e a paginação de cada uma.
+REVIEW_ORDENACOES = {
+    'newest': ReviewKeysetPagination,
+    'highest': ReviewRatingKeysetPagination,
+}
+
+
+def _parametro_lista(request, nome: str) -> list[str]:
+    """
+    Lê um parâmetro com vários valores, do corpo (lista JSON) ou da query string.
+
+    Sem valores no corpo, usa a query string, onde aceita tanto `?nome=a,b` como `?nome=a&nome=b`.
+    """
+    valores = []
+    if request.method != 'GET' and hasattr(request.data, 'get'):
+        valores = request.data.get(nome) or []
+        if isinstance(valores, (str, int)):
+            valores = [valores]
+    if not valores:
+        for valor in request.query_params.getlist(nome):
+            valores.extend(valor.split(','))
+    return [str(v).strip() for v in valores if str(v).strip()]
+
+def _limite(request, padrao: int, maximo: int) -> int:
+    """Lê o parâmetro `limit`, limitado ao intervalo [1, maximo]."""
+    try:
+        return min(max(int(request.query_params.get('limit', padrao)), 1), maximo)
+    except ValueError:
+        return padrao
+
+def filtrar_reviews(queryset, params):
+    """
+    Aplica os filtros públicos de reviews (`spoiler` e `rating`) a um queryset.
+
+    Raises:
+        ValueError: Se algum dos valores indicados não for válido.
+    """
+    spoiler = params.get('spoiler')
+    if spoiler is not None:
+        if spoiler not in ('0', '1', 'true', 'false'):
+            raise ValueError('`spoiler` tem de ser 0 ou 1.')
+        queryset = queryset.filter(spoiler=spoiler in ('1', 'true'))
+
+    ratings = [r for v in params.getlist('rating') for r in v.split(',') if r.strip()]
+    if ratings:
+        if not all(r.strip().isdigit() and 1 <= int(r) <= 5 for r in ratings):
+            raise ValueError('`rating` aceita valores inteiros de 1 a 5.')
+        queryset = queryset.filter(rating__in={int(r) for r in ratings})
+    return queryset
+
+
+def _inteiro(params, nome: str) -> int | None:
+    valor = params.get(nome)
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f'`{nome}` tem de ser um número inteiro.') from None
+
+
+def filtrar_filmes(queryset, params):
+    """
+    Aplica os filtros do catálogo a um queryset de filmes.
+
+    Filtros: `genero=acao,drama` (filmes com pelo menos um dos géneros),
+    `ano_min`/`ano_max` (intervalo inclusivo), `rating_min` e `com_poster=0|1`.
+    O filtro de géneros é um `EXISTS` sobre a tabela da relação, para que um
+    filme com vários dos géneros pedidos não apareça repetido.
+
+    Raises:
+        ValueError: Se algum dos valores indicados não for válido.
+    """
+    generos = [g.strip() for v in params.getlist('genero') for g in v.split(',') if g.strip()]
+    if generos:
+        Ligacao = Filme.generos.through
+        queryset = queryset.filter(Exists(
+            Ligacao.objects.filter(filme_id=OuterRef('pk'), genero__slug__in=generos)
+        ))
+
+    ano_min, ano_max = _inteiro(params, 'ano_min'), _inteiro(params, 'ano_max')
+    if ano_min is not None:
+        queryset = queryset.filter(ano_lancamento__gte=ano_min)
+    if ano_max is not None:
+        queryset = queryset.filter(ano_lancamento__lte=ano_max)
+
+    rating_min = params.get('rating_min')
+    if rating_min not in (None, ''):
+        try:
+            queryset = queryset.filter(media_rating__gte=float(rating_min))
+        except ValueError:
+            raise ValueError('`rating_min` tem de ser um número.') from None
+
+    com_poster = params.get('com_poster')
+    if com_poster is not None:
+        if com_poster not in ('0', '1', 'true', 'false'):
+            raise ValueError('`com_poster` tem de ser 0 ou 1.')
+        condicao = Q(poster='')
+        queryset = queryset.exclude(condicao) if com_poster in ('1', 'true') else queryset.filter(condicao)
+    return queryset
+
+
+def anotar_estado(queryset, user):
+    """Anota `in_watchlist`/`is_favorite` com subqueries `EXISTS` na própria listagem."""
+    if not user.is_authenticated:
+        falso = Value(False, output_field=BooleanField())
+        return queryset.annotate(in_watchlist=falso, is_favorite=falso)
+    return queryset.annotate(
+        in_watchlist=Exists(Watchlist.objects.filter(utilizador=user, filme=OuterRef('pk'))),
+        is_favorite=Exists(Favorito.objects.filter(utilizador=user, filme=OuterRef('pk'))),
+    )
+
+
+def prefetches_detalhe_filme(params) -> list:
+    """
+    As relações pedidas no detalhe (ver `?fields=`/`?expand=`), uma query cada.
+
+    O detalhe completo faz quatro queries, independentemente do tamanho do
+    elenco: o filme, os géneros, os créditos (com a pessoa por JOIN) e os vídeos.
+    """
+    campos = FilmeDetailSerializer.campos_incluidos(params)
+    prefetches = []
+    if 'generos' in campos:
+        prefetches.append('generos')
+    if 'creditos' in campos:
+        prefetches.append(Prefetch(
+            'creditos', queryset=Elenco.objects.select_related('pessoa').order_by('ordem_credito', 'id'),
+        ))
+    if 'videos' in campos:
+        prefetches.append(Prefetch('videos', queryset=Video.objects.order_by('tipo', '-created_at', 'id')))
+    return prefetches
+
+
+def anotar_estatisticas_pessoa(queryset):
+    """
+    Anota cada pessoa com estatísticas dos seus filmes, calculadas em SQL.
+
+    Cada estatística é uma subquery correlacionada sobre os filmes distintos da
+    pessoa (uma pessoa pode ter vários créditos no mesmo filme, ex: realizador e
+    argumentista). Numa página paginada, só são calculadas para as linhas devolvidas.
+    """
+    filmes = Filme.objects.filter(
+        pk__in=Elenco.objects.filter(pessoa=OuterRef(OuterRef('pk'))).values('filme_id')
+    ).order_by().annotate(grupo=Value(1)).values('grupo')
+
+    def agregado(expressao):
+        return Subquery(filmes.annotate(valor=expressao).values('valor')[:1])
+
+    return queryset.annotate(
+        total_filmes=Coalesce(agregado(Count('pk')), 0),
+        media_rating_filmes=agregado(Avg('media_rating')),
+        primeiro_ano=agregado(Min('ano_lancamento')),
+        ultimo_ano=agregado(Max('ano_lancamento')),
+    )
+
+
+class GeneroViewSet(LeituraReplicaMixin, VersionedCacheMixin, ConditionalGetMixin, SerializacaoMedidaMixin, viewsets.ModelViewSet):
     queryset = Genero.objects.all()
     serializer_class = GeneroSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    replica_actions = frozenset({'list', 'retrieve'})
+
+    def get_cache_versions(self):
+        if self.action == 'retrieve':
+            return [versao_genero(self.kwargs[self.lookup_url_kwarg or self.lookup_field])]
+        return [VERSAO_GENEROS]
 
-class FilmeViewSet(viewsets.ModelViewSet):
+class FilmeViewSet(
+    LeituraReplicaMixin, VersionedCacheMixin, ConditionalGetMixin, SerializacaoMedidaMixin, LeituraAssincronaMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Filme.objects.all().prefetch_related('generos')
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = FilmeKeysetPagination
     lookup_field = 'slug'
+    # Leituras públicas do catálogo; o estado do utilizador (`status`) fica na primária.
+    replica_actions = frozenset({'list', 'retrieve', 'list_reviews', 'trending', 'similar'})
 
     def get_serializer_class(self):
         if self.action == 'list':
-            return FilmeListSerializer
+            # Na geração do esquema OpenAPI é documentado o serializer do DRF com o mesmo JSON.
+            if settings.FAST_LIST_SERIALIZATION and not getattr(self, 'swagger_fake_view', False):
+                return FilmeListStatusRapidoSerializer if self._incluir('status') else FilmeListRapidoSerializer
+            return FilmeListStatusSerializer if self._incluir('status') else FilmeListSerializer
         if self.action in ['create', 'update', 'partial_update']:
             return FilmeWriteSerializer
         return FilmeDetailSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' and self._incluir('status'):
+            queryset = anotar_estado(queryset, self.request.user)
+        if self.action == 'list' and settings.FAST_LIST_SERIALIZATION:
+            # A serialização rápida lê dicionários; os géneros são carregados
+            # por página pelo próprio serializer, em vez do `prefetch_related`.
+            queryset = queryset.prefetch_related(None).values(*self.get_serializer_class().campos_values())
+        if self.action == 'retrieve':
+            # As relações são carregadas em `get_object`, depois dos validadores.
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            try:
+                queryset = filtrar_filmes(queryset, self.request.query_params)
+            except ValueError as e:
+                raise ParseError(str(e))
+        return queryset
+
+    def get_paginated_response(self, data):
+        # `include=facets` acrescenta as contagens de todo o catálogo (não só
+        # dos filmes filtrados), lidas da tabela materializada `FacetaFilme`.
+        response = super().get_paginated_response(data)
+        if self._incluir('facets'):
+            response.data['facets'] = facetas.contagens()
+        return response
+
+    async def aget_paginated_response(self, data):
+        if self._incluir('facets'):
+            # As facetas são lidas com o ORM síncrono, numa thread.
+            return await sync_to_async(self.get_paginated_response)(data)
+        return self.get_paginated_response(data)
+
+    async def acontexto_serializer(self, dados):
+        # Sem os géneros no contexto, a serialização rápida leria-os com uma query síncrona.
+        if self.action == 'list' and issubclass(self.get_serializer_class(), FilmeListRapidoSerializer):
+            return {'generos': await ageneros_por_filme([linha['id'] for linha in dados])}
+        return {}
+
+    _filme = None
+
+    def _obter_filme(self):
+        """O filme do URL, lido uma só vez por pedido e sem relações."""
+        if self._filme is None:
+            self._filme = super().get_object()
+        return self._filme
+
+    async def _aobter_filme(self):
+        if self._filme is None:
+            self._filme = await super().aget_object()
+        return self._filme
+
+    def get_object(self):
+        filme = self._obter_filme()
+        if self.action == 'retrieve':
+            prefetch_related_objects([filme], *self._prefetches_detalhe())
+        return filme
+
+    async def aget_object(self):
+        filme = await self._aobter_filme()
+        if self.action == 'retrieve':
+            await aprefetch_related_objects([filme], *self._prefetches_detalhe())
+        return filme
+
+    def _prefetches_detalhe(self) -> list:
+        return prefetches_detalhe_filme(self.request.query_params)
+
+    def _incluir(self, nome: str) -> bool:
+        return nome in _parametro_lista(self.request, 'include')
+
+    def get_conditional_validators(self, *extra):
+        # No detalhe, os validadores vêm do próprio filme (que é lido na mesma
+        # query): créditos, vídeos e géneros tocam no seu `updated_at` (signals.py).
+        if self.action == 'retrieve':
+            return validadores_objeto(self._obter_filme(), *extra)
+        return super().get_conditional_validators(*extra)
+
+    async def aget_conditional_validators(self, *extra):
+        if self.action == 'retrieve':
+            return validadores_objeto(await self._aobter_filme(), *extra)
+        return await super().aget_conditional_validators(*extra)
+
+    def get_conditional_queryset(self):
+        # A listagem com `include=status` depende das listas do utilizador.
+        if self.action == 'list' and self._incluir('status') and self.request.user.is_authenticated:
+            return None
+        # As facetas contam todo o catálogo: a resposta muda com qualquer filme.
+        if self.action == 'list' and self._incluir('facets'):
+            return self.get_queryset()
+        return super().get_conditional_queryset()
+
+    def get_cache_versions(self):
+        # Os filmes incluem os seus géneros, pelo que dependem também de `generos`.
+        if self.action == 'retrieve':
+            return [versao_filme(self.kwargs['slug']), VERSAO_GENEROS]
+        return [VERSAO_CATALOGO, VERSAO_GENEROS]
+
     @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
     def status(self, request, slug=None):
         user = request.user
@@ -48,40 +376,182 @@ class FilmeViewSet(viewsets.ModelViewSet):
         }
         return Response(data)
 
+    async def astatus(self, request, slug=None):
+        user = request.user
+        if not user.is_authenticated:
+            return Response({'in_watchlist': False, 'is_favorite': False})
+        filme = await self.aget_object()
+        data = {
+            'in_watchlist': await Watchlist.objects.filter(utilizador=user, filme=filme).aexists(),
+            'is_favorite': await Favorito.objects.filter(utilizador=user, filme=filme).aexists(),
+        }
+        return Response(data)
+
+    @action(detail=False, methods=['get', 'post'], url_path='bulk-status', permission_classes=[permissions.AllowAny])
+    def bulk_status(self, request):
+        """
+        Devolve o estado de watchlist/favorito de vários filmes de uma só vez.
+
+        Aceita `slugs` ou `ids` (na query string ou numa lista JSON no corpo de um
+        POST) e responde com um dicionário indexado pelos identificadores pedidos.
+        Para um utilizador autenticado são feitas apenas duas queries, uma por lista.
+        """
+        campo, chaves = 'slug', _parametro_lista(request, 'slugs')
+        if not chaves:
+            campo, chaves = 'id', _parametro_lista(request, 'ids')
+            if not all(c.isdigit() for c in chaves):
+                return Response({'detail': 'Os ids têm de ser inteiros.'}, status=status.HTTP_400_BAD_REQUEST)
+            chaves = [str(int(c)) for c in chaves]
+        if not chaves:
+            return Response({'detail': 'Indique `slugs` ou `ids`.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(chaves) > MAX_FILMES_ESTADO:
+            return Response(
+                {'detail': f'No máximo {MAX_FILMES_ESTADO} filmes por pedido.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        in_watchlist, is_favorite = set(), set()
+        user = request.user
+        if user.is_authenticated:
+            coluna = 'filme__slug' if campo == 'slug' else 'filme_id'
+            filtro = {f'{coluna}__in': chaves}
+            for modelo, destino in ((Watchlist, in_watchlist), (Favorito, is_favorite)):
+                valores = modelo.objects.filter(utilizador=user, **filtro).values_list(coluna, flat=True)
+                destino.update(str(v) for v in valores)
+
+        data = {
+            chave: {'in_watchlist': chave in in_watchlist, 'is_favorite': chave in is_favorite}
+            for chave in chaves
+        }
+        return Response(data)
+
+    def _definir_lista(self, modelo, chave: str, incluir: bool | None):
+        """
+        Adiciona (`incluir=True`), remove (`False`) ou alterna (`None`) o filme do URL
+        na lista `modelo` do utilizador. Adicionar e remover são uma só instrução
+        SQL; alternar tenta primeiro remover, pelo que ligar o filme são duas (o
+        `DELETE` sem efeito e o `INSERT`) e desligá-lo é uma.
+
+        A existência do filme só é verificada quando a escrita não alterou nada,
+        para distinguir um pedido repetido de um slug inexistente.
+        """
+        slug, user_id = self.kwargs['slug'], self.request.user.pk
+        if incluir is None:
+            incluir = not listas.remover(modelo, user_id, [slug])
+            if not incluir:
+                return Response({chave: False}, status=status.HTTP_200_OK)
+        alterado = (listas.adicionar if incluir else listas.remover)(modelo, user_id, [slug])
+        if not alterado:
+            get_object_or_404(Filme.objects.values_list('pk', flat=True), slug=slug)
+        codigo = status.HTTP_201_CREATED if incluir and alterado else status.HTTP_200_OK
+        return Response({chave: incluir}, status=codigo)
+
+    @action(detail=True, methods=['put', 'delete'], permission_classes=[permissions.IsAuthenticated])
+    def watchlist(self, request, slug=None):
+        """`PUT` adiciona o filme à watchlist e `DELETE` remove-o; ambos são idempotentes."""
+        return self._definir_lista(Watchlist, 'in_watchlist', request.method == 'PUT')
+
+    @action(detail=True, methods=['put', 'delete'], permission_classes=[permissions.IsAuthenticated])
+    def favorite(self, request, slug=None):
+        """`PUT` marca o filme como favorito e `DELETE` desmarca-o; ambos são idempotentes."""
+        return self._definir_lista(Favorito, 'is_favorite', request.method == 'PUT')
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def toggle_watchlist(self, request, slug=None):
-        filme = self.get_object()
-        user = request.user
-        watchlist_entry, created = Watchlist.objects.get_or_create(utilizador=user, filme=filme)
-        if not created:
-            watchlist_entry.delete()
-            return Response({'in_watchlist': False}, status=status.HTTP_200_OK)
-        return Response({'in_watchlist': True}, status=status.HTTP_201_CREATED)
+        return self._definir_lista(Watchlist, 'in_watchlist', None)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def toggle_favorite(self, request, slug=None):
-        filme = self.get_object()
-        user = request.user
-        favorite_entry, created = Favorito.objects.get_or_create(utilizador=user, filme=filme)
-        if not created:
-            favorite_entry.delete()
-            return Response({'is_favorite': False}, status=status.HTTP_200_OK)
-        return Response({'is_favorite': True}, status=status.HTTP_201_CREATED)
+        return self._definir_lista(Favorito, 'is_favorite', None)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def trending(self, request):
+        """
+        Os filmes em tendência (`limit`, máximo 50), com o `score` atual.
+
+        Lê o ranking pré-calculado (`TendenciaFilme`, ver `tendencias.py`) pelo
+        índice do `score`: uma query para o ranking e outra para os géneros.
+        """
+        campos = {c: F(f'filme__{c}') for c in FilmeListRapidoSerializer.campos_values() if c != 'id'}
+        linhas = list(
+            TendenciaFilme.objects.filter(score__gt=0)
+            .order_by('-score', 'filme_id')
+            .values('score', 'referencia', id=F('filme_id'), **campos)[:_limite(request, 20, MAX_RECOMENDACOES)]
+        )
+        agora = timezone.now().timestamp()
+        for linha in linhas:
+            linha['score'] = tendencias.decair(linha['score'], linha.pop('referencia'), agora)
+        return Response({'results': medir_dados(FilmeScoreRapidoSerializer(linhas, many=True))})
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def similar(self, request, slug=None):
+        """
+        Os filmes mais semelhantes a este (`limit`, máximo 50), com o `score`.
+
+        Lê os vizinhos pré-calculados pelo comando `build_recommendations`
+        (tabela `FilmeSemelhante`): uma query pelo índice e outra para os géneros.
+        """
+        linhas = list(
+            Filme.objects.filter(semelhante_de__filme__slug=slug)
+            .annotate(score=F('semelhante_de__score'))
+            .order_by('-score', 'id')
+            .values(*FilmeScoreRapidoSerializer.campos_values())[:_limite(request, 10, MAX_RECOMENDACOES)]
+        )
+        if not linhas:
+            get_object_or_404(Filme.objects.values_list('pk', flat=True), slug=slug)
+        return Response({'results': medir_dados(FilmeScoreRapidoSerializer(linhas, many=True))})
 
     @action(detail=True, methods=['get'], url_path='reviews')
     def list_reviews(self, request, slug=None):
-        filme = self.get_object()
-        reviews = filme.reviews.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        """
+        Lista as reviews de um filme, paginadas por chave.
+
+        Filtros: `spoiler=0|1`, `rating=4,5` (um ou mais valores de 1 a 5) e
+        `ordering=newest|highest`. Com `stream=1` devolve todas as reviews
+        filtradas num único array JSON gerado à medida que é enviado.
+        """
+        filme_id = get_object_or_404(Filme.objects.values_list('pk', flat=True), slug=slug)
+        reviews, paginator = self._reviews_pedidas(request, filme_id)
+        etag, ultima = calcular_validadores(reviews, *self._extra(request), filme_id)
+        nao_modificado = resposta_condicional(request, etag, ultima)
+        if nao_modificado is not None:
+            return nao_modificado
+
+        if request.query_params.get('stream') in ('1', 'true', 'True'):
+            response = stream_reviews_json(reviews.order_by(*paginator.ordering))
+        else:
+            page = paginator.paginate_queryset(reviews.select_related('autor'), request, view=self)
+            serializer = ReviewSerializer(page, many=True)
+            response = paginator.get_paginated_response(medir_dados(serializer))
+        return aplicar_validadores(response, etag, ultima)
+
+    async def alist_reviews(self, request, slug=None):
+        filme_id = await aget_object_or_404(Filme.objects.values_list('pk', flat=True), slug=slug)
+        reviews, paginator = self._reviews_pedidas(request, filme_id)
+        if request.query_params.get('stream') in ('1', 'true', 'True'):
+            raise ParseError(f"`stream` só está disponível em /api/filmes/{slug}/reviews/.")
+        etag, ultima = await acalcular_validadores(reviews, *self._extra(request), filme_id)
+        nao_modificado = resposta_condicional(request, etag, ultima)
+        if nao_modificado is not None:
+            return nao_modificado
+
+        page = await paginator.apaginate_queryset(reviews.select_related('autor'), request, view=self)
+        serializer = ReviewSerializer(page, many=True)
+        return aplicar_validadores(paginator.get_paginated_response(medir_dados(serializer)), etag, ultima)
+
+    def _reviews_pedidas(self, request, filme_id):
+        """As reviews do filme filtradas pelos parâmetros do pedido e o paginador da ordenação pedida."""
+        ordenacao = request.query_params.get('ordering', 'newest')
+        if ordenacao not in REVIEW_ORDENACOES:
+            raise ParseError(f"`ordering` tem de ser um de: {', '.join(REVIEW_ORDENACOES)}.")
+        try:
+            reviews = filtrar_reviews(Review.objects.filter(filme_id=filme_id), request.query_params)
+        except ValueError as e:
+            raise ParseError(str(e))
+        return reviews, REVIEW_ORDENACOES[ordenacao]()
 
     @action(detail=True, methods=['post'], url_path='reviews/create', permission_classes=[permissions.IsAuthenticated])
     def create_review(self, request, slug=None):
-        # --- MODO DE DEPURAÇÃO ---
-        print("--- CABEÇALHOS RECEBIDOS NO BACKEND ---")
-        print(request.headers)
-        print("------------------------------------")
-        
         filme = self.get_object()
         user = request.user
         if Review.objects.filter(filme=filme, autor=user).exists():
@@ -89,43 +559,272 @@ class FilmeViewSet(viewsets.ModelViewSet):
         serializer = ReviewSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(autor=user, filme=filme)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(medir_dados(serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
+class PessoaViewSet(VersionedCacheMixin, SerializacaoMedidaMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Pessoas (realizadores, atores, ...) com estatísticas da sua filmografia.
+
+    Só de leitura: as pessoas e os créditos são geridos no admin. Não usa GETs
+    condicionais porque as estatísticas mudam com os filmes (ex: novas reviews)
+    sem alterar o `updated_at` da pessoa; a cache depende de `pessoas` e `catalogo`.
+    """
+    queryset = Pessoa.objects.all()
+    serializer_class = PessoaEstatisticasSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = PessoaKeysetPagination
+    lookup_field = 'slug'
+
+    def get_queryset(self):
+        return anotar_estatisticas_pessoa(super().get_queryset())
+
+    def get_cache_versions(self):
+        return [VERSAO_PESSOAS, VERSAO_CATALOGO]
+
+    @action(detail=True, methods=['get'])
+    def filmografia(self, request, slug=None):
+        """
+        Os créditos da pessoa com os respetivos filmes (JOIN), paginados por chave,
+        dos filmes mais recentes para os mais antigos.
+        """
+        creditos = (
+            Elenco.objects.filter(pessoa__slug=slug)
+            .select_related('filme')
+            .annotate(ano=Coalesce('filme__ano_lancamento', 0))
+        )
+        paginator = FilmografiaKeysetPagination()
+        page = paginator.paginate_queryset(creditos, request, view=self)
+        if not page and not Pessoa.objects.filter(slug=slug).exists():
+            # Só numa página vazia se distingue "sem créditos" de "pessoa inexistente".
+            raise Http404
+        return paginator.get_paginated_response(medir_dados(FilmografiaSerializer(page, many=True)))
+
+
+class ReviewViewSet(ConditionalGetMixin, SerializacaoMedidaMixin, viewsets.ModelViewSet):
+    queryset = Review.objects.select_related('autor')
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ReviewKeysetPagination
 
     def perform_create(self, serializer):
         serializer.save(autor=self.request.user)
 
-class WatchlistViewSet(viewsets.ModelViewSet):
+class WatchlistViewSet(SerializacaoMedidaMixin, viewsets.ModelViewSet):
     serializer_class = WatchlistSerializer
     permission_classes = [permissions.IsAuthenticated]
+    model = Watchlist
 
     def get_queryset(self):
-        return Watchlist.objects.filter(utilizador=self.request.user)
+        return Watchlist.objects.filter(utilizador=self.request.user).select_related('utilizador', 'filme')
 
     def perform_create(self, serializer):
         serializer.save(utilizador=self.request.user)
 
+    @action(detail=False, methods=['post', 'delete'])
+    def bulk(self, request):
+        """
+        Adiciona (`POST`) ou remove (`DELETE`) vários filmes da lista de uma só vez.
+
+        Recebe `slugs` (lista JSON no corpo ou `?slugs=a,b`); os slugs inexistentes
+        e os filmes que já estavam (ou não estavam) na lista são ignorados.
+        """
+        slugs = _parametro_lista(request, 'slugs')
+        if not slugs:
+            return Response({'detail': 'Indique `slugs`.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(slugs) > MAX_FILMES_LISTA:
+            return Response(
+                {'detail': f'No máximo {MAX_FILMES_LISTA} filmes por pedido.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if request.method == 'POST':
+            return Response({'added': listas.adicionar(self.model, request.user.pk, slugs)})
+        return Response({'removed': listas.remover(self.model, request.user.pk, slugs)})
+
 class FavoritoViewSet(WatchlistViewSet):
     serializer_class = FavoritoSerializer
-    
+    model = Favorito
+
     def get_queryset(self):
-        return Favorito.objects.filter(utilizador=self.request.user)
+        return Favorito.objects.filter(utilizador=self.request.user).select_related('utilizador', 'filme')
+
+class SearchView(generics.GenericAPIView):
+    """
+    Pesquisa de texto integral em filmes, pessoas e reviews (`/api/search/?q=`).
+
+    Parâmetros: `q` (obrigatório), `tipo=filme,pessoa,review` e `limit` (máximo 50).
+    Os resultados dos vários tipos vêm misturados, ordenados por `score`.
+    """
+    permission_classes = [permissions.AllowAny]
+    max_limit = 50
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, required=True, description='O texto pesquisado (pelo menos 2 caracteres).'),
+            OpenApiParameter('tipo', OpenApiTypes.STR, description='Tipos a pesquisar, separados por vírgulas: filme, pessoa, review.'),
+            OpenApiParameter('limit', OpenApiTypes.INT, description='Número máximo de resultados (máximo 50).'),
+        ],
+        responses={
+            200: inline_serializer('ResultadosPesquisa', {
+                # Os campos de cada resultado dependem do `tipo` (ver `search.TIPOS`).
+                'results': serializers.ListField(child=serializers.DictField()),
+            }),
+            400: OpenApiResponse(description='Pesquisa demasiado curta ou tipos inválidos.'),
+        },
+    )
+    def get(self, request):
+        termos = request.query_params.get('q', '').strip()
+        if len(termos) < 2:
+            return Response({'detail': 'A pesquisa precisa de pelo menos 2 caracteres.'}, status=status.HTTP_400_BAD_REQUEST)
+        tipos = _parametro_lista(request, 'tipo') or list(TIPOS_PESQUISA)
+        invalidos = set(tipos) - set(TIPOS_PESQUISA)
+        if invalidos:
+            return Response(
+                {'detail': f"Tipos inválidos: {', '.join(sorted(invalidos))}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({'results': pesquisar(termos, tipos, _limite(request, 20, self.max_limit))})
+
+class RecomendacoesView(generics.GenericAPIView):
+    """
+    Recomendações personalizadas para o utilizador autenticado (`/api/recomendacoes/`).
+
+    Os filmes vêm dos vizinhos pré-calculados dos filmes de que o utilizador
+    gostou (ver `recomendacoes.recomendar`), ordenados por `score`. Sem
+    interações suficientes, devolve os filmes mais bem avaliados que ainda não
+    conhece, com `source` igual a `popular` e `score` nulo.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        parameters=[OpenApiParameter('limit', OpenApiTypes.INT, description='Número máximo de filmes (máximo 50).')],
+        responses=inline_serializer('Recomendacoes', {
+            'source': serializers.ChoiceField(choices=['similar', 'popular']),
+            'results': FilmeScoreSerializer(many=True),
+        }),
+    )
+    def get(self, request):
+        limite = _limite(request, 20, MAX_RECOMENDACOES)
+        scores = dict(recomendacoes.recomendar(request.user.pk, limite))
+        campos = FilmeListRapidoSerializer.campos_values()
+        if scores:
+            por_id = {f['id']: f for f in Filme.objects.filter(pk__in=scores).values(*campos)}
+            linhas = [{**por_id[pk], 'score': score} for pk, score in scores.items() if pk in por_id]
+            origem = 'similar'
+        else:
+            conhecidos = (
+                Q(pk__in=Review.objects.filter(autor=request.user).values('filme_id'))
+                | Q(pk__in=Watchlist.objects.filter(utilizador=request.user).values('filme_id'))
+                | Q(pk__in=Favorito.objects.filter(utilizador=request.user).values('filme_id'))
+            )
+            populares = Filme.objects.filter(reviews_count__gt=0).exclude(conhecidos).order_by('-media_rating', 'titulo', 'id')
+            linhas = [{**f, 'score': None} for f in populares.values(*campos)[:limite]]
+            origem = 'popular'
+        return Response({'source': origem, 'results': medir_dados(FilmeScoreRapidoSerializer(linhas, many=True))})
+
+class BibliotecaView(generics.GenericAPIView):
+    """
+    A biblioteca do utilizador autenticado (`/api/me/library/`).
+
+    Devolve os contadores (`counts`, mantidos em `ContadoresUtilizador`) e, para
+    cada lista pedida em `lista=watchlist,favoritos` (por defeito, as duas), uma
+    página das entradas mais recentes com o filme no formato da listagem. Cada
+    lista é paginada por chave sobre `created_at` e os seus links `next`/`previous`
+    pedem só essa lista. São quatro queries: os contadores, uma por lista (com o
+    filme por JOIN) e os géneros dos filmes de todas as listas.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('lista', OpenApiTypes.STR, description='Listas pedidas, separadas por vírgulas: watchlist, favoritos.'),
+            OpenApiParameter('cursor', OpenApiTypes.STR, description='Cursor da página (só com uma `lista`).'),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description='Número de entradas por lista.'),
+        ],
+        responses={
+            200: inline_serializer('Biblioteca', {
+                'counts': inline_serializer('ContadoresBiblioteca', {
+                    nome: serializers.IntegerField() for nome in ('watchlist', 'favoritos', 'reviews')
+                }),
+                # Só as listas pedidas em `lista`.
+                **{nome: PaginaBibliotecaSerializer(required=False) for nome in BIBLIOTECA_LISTAS},
+            }),
+            400: OpenApiResponse(description='`lista` desconhecida ou `cursor` com mais de uma lista.'),
+        },
+    )
+    def get(self, request):
+        nomes = list(dict.fromkeys(_parametro_lista(request, 'lista'))) or list(BIBLIOTECA_LISTAS)
+        desconhecidas = [n for n in nomes if n not in BIBLIOTECA_LISTAS]
+        if desconhecidas:
+            return Response(
+                {'detail': f"`lista` tem de ser um de: {', '.join(BIBLIOTECA_LISTAS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(nomes) > 1 and BibliotecaKeysetPagination.cursor_query_param in request.query_params:
+            return Response({'detail': 'O `cursor` pagina uma só lista: indique `lista`.'}, status=status.HTTP_400_BAD_REQUEST)
 
-class UserRegistrationView(generics.CreateAPIView):
+        paginas = {}
+        for nome in nomes:
+            paginator = BibliotecaKeysetPagination()
+            linhas = BIBLIOTECA_LISTAS[nome].objects.filter(utilizador=request.user).values(
+                *ItemBibliotecaRapidoSerializer.campos_values()
+            )
+            pagina = paginator.paginate_queryset(linhas, request, view=self)
+            paginator.base_url = replace_query_param(request.build_absolute_uri(), 'lista', nome)
+            paginas[nome] = (paginator, pagina)
+
+        contexto = {'generos': generos_por_filme({linha['filme_id'] for _, p in paginas.values() for linha in p})}
+        data = {'counts': biblioteca.contadores(request.user.pk)}
+        for nome, (paginator, pagina) in paginas.items():
+            itens = medir_dados(ItemBibliotecaRapidoSerializer(pagina, many=True, context=contexto))
+            data[nome] = paginator.get_paginated_response(itens).data
+        return Response(data)
+
+class UserRegistrationView(SerializacaoMedidaMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
 
-class UserMeView(generics.RetrieveUpdateAPIView):
+class UserMeView(SerializacaoMedidaMixin, generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         return self.request.user
+
+class TokenCookieObtainView(TokenObtainPairView):
+    """
+    Login: devolve os tokens como `TokenObtainPairView` e guarda também o de
+    acesso na cookie HttpOnly lida por `JWTCookieAuthentication`.
+
+    Define também a cookie CSRF (`csrftoken`): as escritas autenticadas pela
+    cookie do token têm de enviar o seu valor no cabeçalho `X-CSRFToken`.
+    """
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            definir_cookie(response, response.data['access'])
+            get_token(request)
+        return response
+
+class TokenCookieRefreshView(TokenRefreshView):
+    """Como `TokenRefreshView`, renovando também a cookie do token de acesso (e a CSRF)."""
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            definir_cookie(response, response.data['access'])
+            get_token(request)
+        return response
+
+class LogoutView(APIView):
+    """Apaga a cookie do token de acesso."""
+    authentication_classes = ()
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        apagar_cookie(response)
+        return response
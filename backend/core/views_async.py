@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Versões assíncronas dos endpoints de leitura mais usados do catálogo.
+
+As views do DRF são síncronas: sob ASGI (`backend/config/asgi.py`, ex: com o
+uvicorn), cada pedido ocupa uma thread do início ao fim, incluindo o tempo em
+que espera pela base de dados. Os ViewSets que usam `LeituraAssincronaMixin`
+têm também ações assíncronas (`alist`, `aretrieve` e, em `FilmeViewSet`,
+`alist_reviews` e `astatus`), com o ORM assíncrono do Django (`aget`,
+`aexists`, `aaggregate`, `async for`), pelo que o event loop serve outros
+pedidos enquanto as queries estão em curso.
+
+As ações assíncronas usam os mesmos métodos do ViewSet que as síncronas
+(`get_queryset`, `filter_queryset`, o serializer, a paginação, as versões da
+cache e os validadores de `VersionedCacheMixin` e `ConditionalGetMixin`), pelo
+que devolvem o mesmo JSON, com os mesmos validadores. São servidas por
+`vista_assincrona` em `/api/async/` (ver `urls.py`):
+
+- `GET /api/async/filmes/` (filtros, `include=status,facets`, cursor e `?page=`);
+- `GET /api/async/filmes/<slug>/` (com `?fields=`/`?expand=`);
+- `GET /api/async/filmes/<slug>/reviews/` (sem `stream=1`);
+- `GET /api/async/filmes/<slug>/status/`.
+
+Diferenças: a autenticação é só por JWT (`JWTCookieAuthentication`, no
+cabeçalho ou na cookie), sem sessão, e não há API navegável. As entradas na
+cache de respostas têm um `basename` próprio, porque os links de paginação
+incluem o URL. O código síncrono que resta (o total aproximado, a paginação
+por número de página, as facetas e a leitura de um utilizador que não esteja
+em cache) é executado numa thread. A comparação de débito entre WSGI e ASGI é
+feita pelo comando `loadtest_api`.
+"""
+from __future__ import annotations
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_safe
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .authentication import JWTCookieAuthentication
+from .replicas import escolher_replica, usar_replica
+
+
+class LeituraAssincronaMixin:
+    """
+    Versões assíncronas de `ListModelMixin.list` e `RetrieveModelMixin.retrieve`.
+
+    Deve ser a última das bases antes do ViewSet do DRF, como os mixins
+    `ListModelMixin`/`RetrieveModelMixin`, para que `VersionedCacheMixin` e
+    `ConditionalGetMixin` envolvam `alist`/`aretrieve` tal como envolvem
+    `list`/`retrieve`. As subclasses podem redefinir `aget_object`,
+    `aget_paginated_response` e `acontexto_serializer` quando os métodos
+    síncronos correspondentes fazem queries.
+    """
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        pagina = await self.apaginate_queryset(queryset)
+        if pagina is not None:
+            return await self.aget_paginated_response(await self._aserializar(pagina, many=True))
+        linhas = [linha async for linha in queryset]
+        return Response(await self._aserializar(linhas, many=True))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(await self._aserializar(await self.aget_object()))
+
+    async def aget_object(self):
+        """Versão assíncrona de `GenericAPIView.get_object`."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = await aget_object_or_404(
+            self.filter_queryset(self.get_queryset()), **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aget_paginated_response(self, data):
+        return self.get_paginated_response(data)
+
+    async def acontexto_serializer(self, dados) -> dict:
+        """Valores a juntar ao contexto do serializer, lidos antes da serialização."""
+        return {}
+
+    async def _aserializar(self, dados, **kwargs):
+        contexto = {**self.get_serializer_context(), **await self.acontexto_serializer(dados)}
+        return self.get_serializer(dados, context=contexto, **kwargs).data
+
+
+def vista_assincrona(viewset, acoes: dict[str, str], **initkwargs):
+    """
+    Uma view assíncrona que serve as ações `acoes` (ex: `{"get": "list"}`) de
+    `viewset` com os seus métodos assíncronos (`a<ação>`).
+
+    Faz o que `viewset.as_view(acoes)` faria (negociação do formato,
+    permissões, réplicas, tratamento de exceções), exceto a autenticação, que
+    é só por JWT, com `JWTCookieAuthentication.aauthenticate`. A resposta é
+    renderizada aqui, em vez de numa thread pelo Django.
+    """
+    renderers = [r for r in viewset.renderer_classes if not issubclass(r, BrowsableAPIRenderer)]
+    autenticacao = JWTCookieAuthentication()
+
+    @require_safe
+    async def view(request, *args, **kwargs):
+        self = viewset(renderer_classes=renderers, **initkwargs)
+        self.action_map = acoes
+        self.action = acoes["get"]
+        self.args, self.kwargs = args, kwargs
+        self.headers = self.default_response_headers
+        drf_request = self.request = self.initialize_request(request, *args, **kwargs)
+
+        replica = escolher_replica(request) if self.action in getattr(self, "replica_actions", ()) else None
+        with usar_replica(replica):
+            try:
+                autenticado = await autenticacao.aauthenticate(drf_request)
+                drf_request.user, drf_request.auth = autenticado or (AnonymousUser(), None)
+                self.initial(drf_request, *args, **kwargs)
+                response = await getattr(self, f"a{self.action}")(drf_request, *args, **kwargs)
+            except Exception as exc:
+                response = self.handle_exception(exc)
+            response = self.finalize_response(drf_request, response, *args, **kwargs)
+        return _renderizar(response)
+
+    return view
+
+
+def _renderizar(response) -> HttpResponse:
+    if not isinstance(response, Response):
+        return response
+    response.render()
+    return HttpResponse(response.content, status=response.status_code, headers=response.headers)